@@ -19,6 +19,9 @@ Configuration options in recipe
 -------------------------------
 calculate_mmm : bool, optional (default: True)
     Calculate multi-model mean ECS.
+n_jobs : int, optional (default: 1)
+    Number of processes used to calculate the anomalies of the individual
+    datasets.
 output_attributes : dict, optional
     Write additional attributes to netcdf files.
 read_external_file : str, optional
@@ -33,7 +36,7 @@ seaborn_settings : dict, optional
 import logging
 import os
 from copy import deepcopy
-from functools import partial
+from multiprocessing import get_context
 from pprint import pformat
 
 import cf_units
@@ -42,11 +45,10 @@ import iris.coord_categorisation
 import numpy as np
 import seaborn as sns
 import yaml
-from scipy import stats
 
 from esmvaltool.diag_scripts.shared import (
     ProvenanceLogger, extract_variables, get_diagnostic_filename,
-    get_plot_filename, group_metadata, io, plot, run_diagnostic,
+    get_plot_filename, group_metadata, io, plot, regression, run_diagnostic,
     select_metadata, variables_available)
 
 logger = logging.getLogger(os.path.basename(__file__))
@@ -60,31 +62,36 @@ RTMT_DATASETS = set()
 
 def _calculate_anomaly(data_4x, data_pic):
     """Calculate anomaly cube for a dataset."""
-    cube_4x = iris.load_cube(data_4x[0]['filename'])
-    iris.coord_categorisation.add_year(cube_4x, 'time')
-    cube_4x = cube_4x.aggregated_by('year', iris.analysis.MEAN)
-
-    cube_pic = iris.load_cube(data_pic[0]['filename'])
-    iris.coord_categorisation.add_year(cube_pic, 'time')
-    cube_pic = cube_pic.aggregated_by('year', iris.analysis.MEAN)
+    cube_4x = _get_annual_mean(data_4x[0]['filename'])
+    cube_pic = _get_annual_mean(data_pic[0]['filename'])
 
+    # Remove linear trend of piControl run (all grid cells at once)
     x_data = cube_pic.coord('year').points
-    y_data = _get_data_time_last(cube_pic)
-    slope = _get_slope(x_data, y_data)
-    intercept = _get_intercept(x_data, y_data)
-    for _ in range(cube_pic.ndim - 1):
-        x_data = np.expand_dims(x_data, -1)
-    new_x_data = np.broadcast_to(x_data, cube_pic.shape)
-    new_data = slope * new_x_data + intercept
+    reg = regression.linregress(x_data, _get_data_time_last(cube_pic))
+    time_dim = cube_pic.coord_dims('time')[0]
+    x_shape = [1] * cube_pic.ndim
+    x_shape[time_dim] = -1
+    new_data = (np.expand_dims(reg.slope, time_dim) * x_data.reshape(x_shape)
+                + np.expand_dims(reg.intercept, time_dim))
     cube_4x.data -= np.ma.masked_invalid(new_data)
     return cube_4x
 
 
-def _get_anomaly_data(input_data):
+def _get_annual_mean(filename):
+    """Load cube and calculate annual means."""
+    cube = iris.load_cube(filename)
+
+    # Realise data first, aggregating lazy data creates one graph per year
+    cube.data = np.ma.asarray(cube.data)
+    iris.coord_categorisation.add_year(cube, 'time')
+    return cube.aggregated_by('year', iris.analysis.MEAN)
+
+
+def _get_anomaly_data(input_data, n_jobs=1):
     """Calculate anomaly data for all variables."""
     logger.info("Calculating anomaly data")
     project = input_data[0]['project']
-    new_input_data = []
+    tasks = []
     for (var, var_data) in group_metadata(input_data, 'short_name').items():
         grouped_data = group_metadata(var_data, 'dataset')
         for (dataset_name, datasets) in grouped_data.items():
@@ -102,19 +109,30 @@ def _get_anomaly_data(input_data):
                 raise ValueError(
                     f"No 'piControl' data available for '{var}' of "
                     f"'{dataset_name}'")
+            tasks.append((data_4x, data_pic))
+
+    # Calculate anomalies (in parallel if desired), new processes are spawned
+    # since forking after the usage of dask's thread pool may deadlock
+    if n_jobs > 1:
+        logger.info("Using %i processes for %i datasets", n_jobs, len(tasks))
+        with get_context('spawn').Pool(n_jobs) as pool:
+            cubes = pool.starmap(_calculate_anomaly, tasks)
+    else:
+        cubes = [_calculate_anomaly(*task) for task in tasks]
 
-            # Calculate anomaly, extract correct years and save it
-            cube = _calculate_anomaly(data_4x, data_pic)
-            if cube.ndim != 1:
-                raise ValueError(
-                    f"This diagnostic supports only 1D (time), input data, "
-                    f"got {cube.ndim}D data")
-            new_input_data.append({
-                **data_4x[0],
-                'ancestors': [data_4x[0]['filename'], data_pic[0]['filename']],
-                'cube':
-                cube,
-            })
+    # Extract correct years and save it
+    new_input_data = []
+    for ((data_4x, data_pic), cube) in zip(tasks, cubes):
+        if cube.ndim != 1:
+            raise ValueError(
+                f"This diagnostic supports only 1D (time), input data, got "
+                f"{cube.ndim}D data")
+        new_input_data.append({
+            **data_4x[0],
+            'ancestors': [data_4x[0]['filename'], data_pic[0]['filename']],
+            'cube':
+            cube,
+        })
     return new_input_data
 
 
@@ -123,18 +141,6 @@ def _get_data_time_last(cube):
     return np.moveaxis(cube.data, cube.coord_dims('time')[0], -1)
 
 
-@partial(np.vectorize, excluded=['x_arr'], signature='(n),(n)->()')
-def _get_intercept(x_arr, y_arr):
-    """Get intercept of linear regression of two (masked) arrays."""
-    if np.ma.is_masked(y_arr):
-        x_arr = x_arr[~y_arr.mask]
-        y_arr = y_arr[~y_arr.mask]
-    if len(y_arr) < 2:
-        return np.nan
-    reg = stats.linregress(x_arr, y_arr)
-    return reg.intercept
-
-
 def _get_multi_model_mean(input_data):
     """Get multi-model mean for all variables."""
     logger.info("Calculating multi-model means")
@@ -175,16 +181,36 @@ def _get_multi_model_mean(input_data):
     return input_data
 
 
-@partial(np.vectorize, excluded=['x_arr'], signature='(n),(n)->()')
-def _get_slope(x_arr, y_arr):
-    """Get slope of linear regression of two (masked) arrays."""
-    if np.ma.is_masked(y_arr):
-        x_arr = x_arr[~y_arr.mask]
-        y_arr = y_arr[~y_arr.mask]
-    if len(y_arr) < 2:
-        return np.nan
-    reg = stats.linregress(x_arr, y_arr)
-    return reg.slope
+def _get_regressions(tas_data, rtnt_data):
+    """Perform linear regressions of rtnt vs. tas for all datasets at once."""
+    dataset_names = list(tas_data)
+    for dataset_name in dataset_names:
+        if dataset_name not in rtnt_data:
+            raise ValueError(f"No 'rtnt' data for '{dataset_name}' available")
+    if not dataset_names:
+        return {}
+    tas_cubes = [tas_data[name][0]['cube'] for name in dataset_names]
+    rtnt_cubes = [rtnt_data[name][0]['cube'] for name in dataset_names]
+
+    # Pad time series of different lengths with missing values
+    n_years = max(cube.shape[0] for cube in tas_cubes + rtnt_cubes)
+    x_data = np.full((len(dataset_names), n_years), np.nan)
+    y_data = np.full((len(dataset_names), n_years), np.nan)
+    for (idx, (tas_cube, rtnt_cube)) in enumerate(zip(tas_cubes, rtnt_cubes)):
+        if tas_cube.shape != rtnt_cube.shape:
+            raise ValueError(
+                f"Expected identical shapes for 'tas' and 'rtnt' data of "
+                f"'{dataset_names[idx]}', got {tas_cube.shape} and "
+                f"{rtnt_cube.shape}")
+        x_data[idx, :tas_cube.shape[0]] = np.ma.filled(
+            tas_cube.data.astype(np.float64), np.nan)
+        y_data[idx, :rtnt_cube.shape[0]] = np.ma.filled(
+            rtnt_cube.data.astype(np.float64), np.nan)
+    reg = regression.linregress(x_data, y_data)
+    return {
+        name: regression.LinregressResult(*[float(arr[idx]) for arr in reg])
+        for (idx, name) in enumerate(dataset_names)
+    }
 
 
 def check_input_data(cfg):
@@ -232,7 +258,7 @@ def preprocess_data(cfg):
                     RTMT_DATASETS)
 
     # Calculate anomalies for every dataset
-    input_data = _get_anomaly_data(input_data)
+    input_data = _get_anomaly_data(input_data, n_jobs=cfg.get('n_jobs', 1))
 
     # Calculate multi-model mean
     if cfg.get('calculate_mmm', True):
@@ -425,18 +451,18 @@ def main(cfg):
     all_ancestors = []
     (tas_data, rtnt_data) = preprocess_data(cfg)
 
+    # Perform linear regressions
+    regressions = _get_regressions(tas_data, rtnt_data)
+
     # Iterate over all datasets and save ECS and feedback parameter
     for dataset_name in tas_data:
         logger.info("Processing '%s'", dataset_name)
-        if dataset_name not in rtnt_data:
-            raise ValueError(f"No 'rtnt' data for '{dataset_name}' available")
         tas_cube = tas_data[dataset_name][0]['cube']
         rtnt_cube = rtnt_data[dataset_name][0]['cube']
         ancestor_files = (tas_data[dataset_name][0]['ancestors'] +
                           rtnt_data[dataset_name][0]['ancestors'])
 
-        # Perform linear regression
-        reg = stats.linregress(tas_cube.data, rtnt_cube.data)
+        reg = regressions[dataset_name]
 
         # Plot ECS regression if desired
         (path,
@@ -33,7 +33,6 @@ import cf_units
 import iris
 import iris.coord_categorisation
 import numpy as np
-from scipy import stats
 
 from esmvaltool.diag_scripts.shared import (ProvenanceLogger,
                                             get_diagnostic_filename,
@@ -43,48 +42,123 @@ from esmvaltool.diag_scripts.shared import (ProvenanceLogger,
 logger = logging.getLogger(os.path.basename(__file__))
 
 
-def calculate_psi(cube, cfg):
-    """Calculate temperature variability metric psi for a given cube."""
-    window_length = cfg.get('window_length', 55)
-    lag = cfg.get('lag', 1)
-    psi_years = []
-    psis = []
-
-    # Moving average
-    for yr_idx in range(cube.shape[0] - window_length):
-        slc = slice(yr_idx, yr_idx + window_length)
-        years = cube.coord('year').points[slc]
-        tas = np.copy(cube.data[slc])
-
-        # De-trend data
-        reg = stats.linregress(years, tas)
-        tas -= reg.slope * years + reg.intercept
-
-        # Autocorrelation
-        norm = np.sum(np.square(tas))
-        [autocorr] = np.correlate(tas[:-lag], tas[lag:], mode='valid') / norm
-
-        # Psi
-        psi_years.append(years[-1])
-        psis.append(np.std(tas) / np.sqrt(-np.log(autocorr)))
-
-    # Return new cube
-    year_coord = iris.coords.DimCoord(np.array(psi_years),
+def _window_sum(data, window_length):
+    """Moving sums along last axis using cumulative sums."""
+    cumsum = np.cumsum(data, axis=-1)
+    zeros = np.zeros(cumsum.shape[:-1] + (1, ))
+    cumsum = np.concatenate([zeros, cumsum], axis=-1)
+    return cumsum[..., window_length:] - cumsum[..., :-window_length]
+
+
+def _get_psi(years, tas, window_length, lag):
+    """Calculate psi for all windows of (multiple) time series at once.
+
+    The moving linear regressions, lag-1 autocovariances and variances are
+    calculated from moving sums of the data and their products, i.e. the
+    costs do not depend on the window length. Time is the last dimension of
+    ``tas``, all other dimensions are treated as independent time series.
+    Missing values (NaN) only give NaN for the windows which contain them.
+
+    """
+    n_windows = tas.shape[-1] - window_length
+    n_lagged = window_length - lag
+
+    # Missing values are set to zero and tracked by the number of valid
+    # points of every window
+    valid = np.isfinite(tas)
+    n_valid = np.sum(valid, axis=-1, keepdims=True)
+    tas = np.where(valid, tas, 0.0)
+
+    # Shift data to reduce round-off errors (does not change residuals)
+    x_data = np.broadcast_to(years - years[..., :1], tas.shape)
+    y_data = np.where(
+        valid,
+        tas - np.sum(tas, axis=-1, keepdims=True) / np.maximum(n_valid, 1),
+        0.0)
+
+    def wsum(data, length=window_length, offset=0):
+        """Moving sums over ``length`` elements for every window."""
+        return _window_sum(data, length)[..., offset:offset + n_windows]
+
+    # Linear regression for every window
+    s_x = wsum(x_data)
+    s_y = wsum(y_data)
+    ss_xx = wsum(x_data * x_data) - s_x * s_x / window_length
+    ss_yy = wsum(y_data * y_data) - s_y * s_y / window_length
+    ss_xy = wsum(x_data * y_data) - s_x * s_y / window_length
+    slope = ss_xy / ss_xx
+    intercept = (s_y - slope * s_x) / window_length
+
+    # Sum of squared residuals
+    norm = ss_yy - ss_xy * ss_xy / ss_xx
+
+    # Lagged sum of products of residuals
+    (x_0, x_l) = (x_data[..., :-lag], x_data[..., lag:])
+    (y_0, y_l) = (y_data[..., :-lag], y_data[..., lag:])
+    cov = (wsum(y_0 * y_l, n_lagged) -
+           intercept * (wsum(y_data, n_lagged) +
+                        wsum(y_data, n_lagged, lag)) -
+           slope * (wsum(x_0 * y_l, n_lagged) + wsum(y_0 * x_l, n_lagged)) +
+           intercept**2 * n_lagged +
+           intercept * slope * (wsum(x_data, n_lagged) +
+                                wsum(x_data, n_lagged, lag)) +
+           slope**2 * wsum(x_0 * x_l, n_lagged))
+
+    # Psi (only for windows without missing values)
+    complete = wsum(valid.astype(np.float64)) == window_length
+    norm = np.where(complete, norm, np.nan)
+    autocorr = cov / norm
+    return np.sqrt(norm / window_length) / np.sqrt(-np.log(autocorr))
+
+
+def _get_psi_cube(psi_years, psi, cfg):
+    """Create psi cube."""
+    year_coord = iris.coords.DimCoord(psi_years,
                                       var_name='year',
                                       long_name='year',
                                       units=cf_units.Unit('year'))
     psi_cube = iris.cube.Cube(
-        np.array(psis),
+        psi,
         dim_coords_and_dims=[(year_coord, 0)],
         attributes={
-            'window_length': window_length,
-            'lag': lag,
+            'window_length': cfg.get('window_length', 55),
+            'lag': cfg.get('lag', 1),
             **cfg.get('output_attributes', {}),
         },
     )
     return psi_cube
 
 
+def calculate_psi(cube, cfg):
+    """Calculate temperature variability metric psi for a given cube."""
+    return calculate_psis([cube], cfg)[0]
+
+
+def calculate_psis(cubes, cfg):
+    """Calculate temperature variability metric psi for multiple cubes.
+
+    Cubes with identical ``year`` coordinates are processed together.
+
+    """
+    window_length = cfg.get('window_length', 55)
+    lag = cfg.get('lag', 1)
+    psi_cubes = [None] * len(cubes)
+    groups = {}
+    for (idx, cube) in enumerate(cubes):
+        years = cube.coord('year').points
+        groups.setdefault(tuple(years), []).append(idx)
+    for (years, indices) in groups.items():
+        years = np.array(years)
+        tas = np.ma.filled(
+            np.ma.array([cubes[idx].data for idx in indices],
+                        dtype=np.float64), np.nan)
+        psi = _get_psi(years, tas, window_length, lag)
+        psi_years = years[window_length - 1:-1]
+        for (psi_idx, idx) in enumerate(indices):
+            psi_cubes[idx] = _get_psi_cube(psi_years, psi[psi_idx], cfg)
+    return psi_cubes
+
+
 def get_provenance_record(caption, ancestor_files):
     """Create a provenance record describing the diagnostic data and plot."""
     record = {
@@ -131,12 +205,15 @@ def main(cfg):
         'units': 'K',
     }
     grouped_data = group_metadata(input_data, 'dataset')
+    cubes = []
     for (dataset, [data]) in grouped_data.items():
-        logger.info("Processing %s", dataset)
+        logger.info("Loading %s", dataset)
         cube = iris.load_cube(data['filename'])
         iris.coord_categorisation.add_year(cube, 'time')
-        cube = cube.aggregated_by('year', iris.analysis.MEAN)
-        psi_cube = calculate_psi(cube, cfg)
+        cubes.append(cube.aggregated_by('year', iris.analysis.MEAN))
+    psi_cubes = calculate_psis(cubes, cfg)
+    for ((dataset, [data]), psi_cube) in zip(grouped_data.items(), psi_cubes):
+        logger.info("Processing %s", dataset)
         data.update(psi_attrs)
         data.pop('standard_name', '')
 
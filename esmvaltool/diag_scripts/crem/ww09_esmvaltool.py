@@ -14,7 +14,10 @@ Cloud Regime Error Metrics (CREM).
     none
 
   Optional diag_script_info attributes (diagnostic specific)
-    none
+    chunk_size: number of time steps which are read and processed at once
+                (default: 365)
+    n_jobs: number of processes used to calculate the CREM of the individual
+            datasets in parallel (default: 1)
 
   Required variable_info attributes (variable specific)
     none
@@ -46,6 +49,7 @@ Cloud Regime Error Metrics (CREM).
 import logging
 import os
 import sys
+from multiprocessing import get_context
 from pprint import pformat
 
 import matplotlib.pyplot as plt
@@ -109,8 +113,8 @@ def main(cfg):
     # create list of dataset names (plot labels)
     models = []
 
-    i = 0
     missing_vars = []
+    all_pointers = []
 
     for dataset in grouped_input_data:
         models.append(dataset)
@@ -172,9 +176,25 @@ def main(cfg):
                          "available: %s", printlist)
             raise Exception('Variables missing (see log file for details).')
 
-        # calculate CREM
+        all_pointers.append(pointers)
+
+    # calculate CREM (optionally in parallel for the individual datasets)
 
-        (crem_pd, r_crem_pd) = crem_calc(pointers)
+    chunk_size = cfg.get('chunk_size', 365)
+    n_jobs = cfg.get('n_jobs', 1)
+    if n_jobs > 1 and nummod > 1:
+        with get_context('spawn').Pool(min(n_jobs, nummod)) as pool:
+            results = pool.starmap(
+                _crem_calc_worker,
+                [(pointers, chunk_size) for pointers in all_pointers])
+    else:
+        results = [_crem_calc_worker(pointers, chunk_size)
+                   for pointers in all_pointers]
+
+    for (i, result) in enumerate(results):
+        if result is None:
+            sys.exit()
+        (crem_pd, r_crem_pd) = result
 
         crems[i] = crem_pd
 
@@ -190,8 +210,6 @@ def main(cfg):
                 k = k + 1
             j = j + 1
 
-        i = i + 1
-
     logger.info("==================================")
     logger.info("*** Cloud Regime Error Metrics ***")
     logger.info("==================================")
@@ -284,9 +302,17 @@ def main(cfg):
         provenance_logger.log(oname, provenance_record)
 
 
-def read_and_check(srcfilename, varname, lons2, lats2, time2):
+def _crem_calc_worker(pointers, chunk_size):
+    """Run :func:`crem_calc`, return ``None`` if the calculation aborted."""
+    try:
+        return crem_calc(pointers, chunk_size=chunk_size)
+    except SystemExit:
+        return None
+
+
+def open_and_check(srcfilename, varname, lons2, lats2, time2):
     """
-    Function for reading and checking for correct regridding of input data.
+    Function for opening and checking for correct regridding of input data.
 
     Parameters
     ----------
@@ -300,6 +326,11 @@ def read_and_check(srcfilename, varname, lons2, lats2, time2):
         latitudes of target grid (ISCCP)
     time2: integer
         number of time steps
+
+    Returns
+    -------
+    tuple
+        Opened :class:`netCDF4.Dataset` and its variable ``varname``.
     """
     nlon = len(lons2)
     nlat = len(lats2)
@@ -350,21 +381,39 @@ def read_and_check(srcfilename, varname, lons2, lats2, time2):
         raise Exception('Input variables are not on 2.5x2.5 deg ISCCP grid '
                         '(see log file for details).')
 
-    # read data
-    src_data = src_dataset.variables[varname]
+    return (src_dataset, src_dataset.variables[varname])
+
+
+def read_time_chunk(src_data, time_slice):
+    """
+    Function for reading a chunk of time steps of input data.
+
+    Parameters
+    ----------
+    src_data : netCDF4.Variable
+        variable containing input data
+    time_slice : slice
+        time steps to read
+
+    Returns
+    -------
+    numpy.ndarray
+        data with missing values set to 0.0
+    """
+    data = src_data[time_slice]
 
     # create mask (missing values)
     try:
-        data = np.ma.masked_equal(src_data, getattr(src_data, "_FillValue"))
+        data = np.ma.masked_equal(data, getattr(src_data, "_FillValue"))
         rgmasked = np.ma.masked_invalid(data)
     except AttributeError:
-        rgmasked = np.ma.masked_invalid(src_data)
+        rgmasked = np.ma.masked_invalid(data)
     np.ma.set_fill_value(rgmasked, 0.0)
 
     return np.ma.filled(rgmasked)
 
 
-def crem_calc(pointers):
+def crem_calc(pointers, chunk_size=365):
     """
     Main program for calculating Cloud Regime Error Metric.
 
@@ -384,6 +433,10 @@ def crem_calc(pointers):
     If snc is not available then snw can be used instead. In this case
     pointers[snc_nc] should be set to None and snw_nc set.
 
+    The input data are processed in chunks of ``chunk_size`` time steps
+    (each input file is read only once); only the number of points and the
+    sums of the cloud forcings of every regime are kept in memory.
+
     Returns
     -------
     crem_pd : float
@@ -447,44 +500,26 @@ def crem_calc(pointers):
     lons2 = np.array([z_x + d_x * (i + 1.0) for i in range(npts)])
     lats2 = np.array([z_y + d_y * (j + 1.0) for j in range(nrows)])
 
-    # Read input data
+    # Open input data
     # ---------------
     # pointers['xxx_nc'] = file name of input file
     # pointers['xxx'] = actual variable name in input file
 
-    logger.debug('Reading albisccp')
-    ntime2 = len(Dataset(pointers['albisccp_nc'], 'r').variables['time'][:])
-    albisccp_data = read_and_check(pointers['albisccp_nc'],
-                                   pointers['albisccp'], lons2, lats2, ntime2)
-    logger.debug('Reading pctisccp')
-    pctisccp_data = read_and_check(pointers['pctisccp_nc'],
-                                   pointers['pctisccp'], lons2, lats2, ntime2)
-    logger.debug('Reading cltisccp')
-    cltisccp_data = read_and_check(pointers['cltisccp_nc'],
-                                   pointers['cltisccp'], lons2, lats2, ntime2)
-    logger.debug('Reading rsut')
-    rsut_data = read_and_check(pointers['rsut_nc'],
-                               pointers['rsut'], lons2, lats2, ntime2)
-    logger.debug('Reading rsutcs')
-    rsutcs_data = read_and_check(pointers['rsutcs_nc'],
-                                 pointers['rsutcs'], lons2, lats2, ntime2)
-    logger.debug('Reading rlut')
-    rlut_data = read_and_check(pointers['rlut_nc'],
-                               pointers['rlut'], lons2, lats2, ntime2)
-    logger.debug('Reading rlutcs')
-    rlutcs_data = read_and_check(pointers['rlutcs_nc'],
-                                 pointers['rlutcs'], lons2, lats2, ntime2)
-    logger.debug('Reading sic')
-    sic_data = read_and_check(pointers['sic_nc'],
-                              pointers['sic'], lons2, lats2, ntime2)
     if not pointers['snc_nc']:
-        logger.debug('Reading snw')
-        snc_data = read_and_check(pointers['snw_nc'],
-                                  pointers['snw'], lons2, lats2, ntime2)
+        snow_var = 'snw'
     else:
-        logger.debug('Reading snc')
-        snc_data = read_and_check(pointers['snc_nc'],
-                                  pointers['snc'], lons2, lats2, ntime2)
+        snow_var = 'snc'
+    crem_vars = ('albisccp', 'pctisccp', 'cltisccp', 'rsut', 'rsutcs', 'rlut',
+                 'rlutcs', 'sic', snow_var)
+    with Dataset(pointers['albisccp_nc'], 'r') as src_dataset:
+        ntime2 = len(src_dataset.variables['time'])
+    src_datasets = []
+    src_vars = {}
+    for var in crem_vars:
+        logger.debug('Opening %s', var)
+        (src_dataset, src_vars[var]) = open_and_check(
+            pointers[var + '_nc'], pointers[var], lons2, lats2, ntime2)
+        src_datasets.append(src_dataset)
 
     # -----------------------------------------------------------
 
@@ -499,69 +534,84 @@ def crem_calc(pointers):
     model_ncf[:] = 999.9
     r_crem_pd[:] = 999.9
 
-    # Normalize data used for assignment to regimes to be in the range 0-1
-    pctisccp_data = pctisccp_data / 100000.0
-    cltisccp_data = cltisccp_data / 100.0
-
-    # Calculate cloud forcing
-    swcf_data = rsutcs_data - rsut_data
-    lwcf_data = rlutcs_data - rlut_data
-
-    # loop over 3 regions
-    # (0 = tropics, 1 = ice-free extra-tropics, 2 = snow/ice covered)
-    for idx_region, (region, regime) in enumerate(nregimes.items()):
-
-        # Set up validity mask for region
-
-        mask = pctisccp_data.copy()
-        if region == 'tropics':
-            mask[:, (lats2 < -20) | (lats2 > 20), :] = np.NAN
-        elif region == 'extra-tropics':
-            mask[:, (lats2 >= -20) & (lats2 <= 20), :] = np.NAN
-            mask[(snc_data >= 0.1) | (sic_data >= 0.1)] = np.NAN
-        elif region == 'snow-ice':
-            mask[:, (lats2 >= -20) & (lats2 <= 20), :] = np.NAN
-            mask[(snc_data < 0.1) & (sic_data < 0.1)] = np.NAN
-
-        mask[cltisccp_data == 0.0] = np.NAN
-
-        points = np.isfinite(mask)
-        npoints = len(mask[points])  # Number of valid data points in region
-
-        group = np.zeros(npoints)
-        e_d = np.zeros((npoints, regime))
-
-        swcf_data_pts = swcf_data[points]
-        lwcf_data_pts = lwcf_data[points]
-
-        # Assign model data to observed regimes
-
+    # Accumulated number of points, shortwave and longwave cloud forcing of
+    # every regime
+    counts = np.zeros((numreg, numrgm), dtype=np.int64)
+    swcf_sums = np.zeros((numreg, numrgm))
+    lwcf_sums = np.zeros((numreg, numrgm))
+
+    tropics = ((lats2 >= -20) & (lats2 <= 20))[np.newaxis, :, np.newaxis]
+
+    # loop over time chunks
+    for time_idx in range(0, ntime2, chunk_size):
+        time_slice = slice(time_idx, time_idx + chunk_size)
+        logger.debug('Processing time steps %i to %i', time_slice.start,
+                     min(time_slice.stop, ntime2) - 1)
+        chunk = {var: read_time_chunk(src_vars[var], time_slice)
+                 for var in crem_vars}
+
+        # Normalize data used for assignment to regimes to be in the range
+        # 0-1
+        albisccp_data = chunk['albisccp']
+        pctisccp_data = chunk['pctisccp'] / 100000.0
+        cltisccp_data = chunk['cltisccp'] / 100.0
+
+        # Calculate cloud forcing
+        swcf_data = chunk['rsutcs'] - chunk['rsut']
+        lwcf_data = chunk['rlutcs'] - chunk['rlut']
+
+        # Validity masks for the 3 regions
+        # (0 = tropics, 1 = ice-free extra-tropics, 2 = snow/ice covered)
+        snow_ice = (chunk[snow_var] >= 0.1) | (chunk['sic'] >= 0.1)
+        cloudy = (cltisccp_data != 0.0)
+        region_masks = (tropics & cloudy,
+                        ~tropics & ~snow_ice & cloudy,
+                        ~tropics & snow_ice & cloudy)
+
+        for (idx_region, regime) in enumerate(nregimes.values()):
+            points = region_masks[idx_region]
+            npoints = np.count_nonzero(points)
+            if npoints == 0:
+                continue
+            e_d = np.zeros((npoints, regime))
+
+            # Assign model data to observed regimes
+
+            for i in range(regime):
+                e_d[:, i] = \
+                    ((albisccp_data[points] - obs_alb[idx_region, i]) ** 2) + \
+                    ((pctisccp_data[points] - obs_pct[idx_region, i]) ** 2) + \
+                    ((cltisccp_data[points] - obs_clt[idx_region, i]) ** 2)
+
+            group = np.argmin(e_d, axis=1)
+
+            counts[idx_region, :regime] += np.bincount(group,
+                                                       minlength=regime)
+            swcf_sums[idx_region, :regime] += np.bincount(
+                group, weights=swcf_data[points], minlength=regime)
+            lwcf_sums[idx_region, :regime] += np.bincount(
+                group, weights=lwcf_data[points], minlength=regime)
+
+    for src_dataset in src_datasets:
+        src_dataset.close()
+
+    for (idx_region, regime) in enumerate(nregimes.values()):
+        npoints = counts[idx_region].sum()
         for i in range(regime):
-            e_d[:, i] = \
-                ((albisccp_data[points] - obs_alb[idx_region, i]) ** 2) + \
-                ((pctisccp_data[points] - obs_pct[idx_region, i]) ** 2) + \
-                ((cltisccp_data[points] - obs_clt[idx_region, i]) ** 2)
-
-        group[:] = np.argmin(e_d, axis=1)
-
-        for i in range(regime):
-            mem = (group == i)
-
-            count = len(group[mem])
+            count = counts[idx_region, i]
 
             if count > 0:
 
                 model_rfo[idx_region, i] = float(count) / float(npoints)
-                model_ncf[idx_region, i] = np.average(swcf_data_pts[mem]) \
-                    * solar_weights[idx_region] +                         \
-                    np.average(lwcf_data_pts[mem])
+                model_ncf[idx_region, i] = (
+                    swcf_sums[idx_region, i] / count *
+                    solar_weights[idx_region] +
+                    lwcf_sums[idx_region, i] / count)
             else:
                 logger.info("Model does not reproduce all observed cloud "
                             "regimes.")
                 logger.info("Cannot calculate CREM. Abort.")
                 sys.exit()
-                model_rfo[idx_region, i] = 0.0
-                model_ncf[idx_region, i] = 0.0
 
     # Calculation of eq 3 in WW09
     for idx_region, (region, regime) in enumerate(nregimes.items()):
@@ -22,6 +22,9 @@ Description
 
 Configuration options
 ---------------------
+n_jobs : int, optional (default: 1)
+    Number of processes used to create the regression plots of the
+    individual models.
 
 ###############################################################################
 
@@ -31,6 +34,7 @@ Configuration options
 import logging
 import os
 from collections import OrderedDict
+from multiprocessing import get_context
 from pprint import pformat
 
 import iris
@@ -545,9 +549,14 @@ def plot_slope_regression_all(cfg, data_dict, available_vars):
 
 
 def plot_rlnst_regression(cfg, dataset_name, data, variables, regs):
-    """Plot linear regression used to calculate ECS."""
+    """Plot linear regression used to calculate ECS.
+
+    Returns the diagnostic file and its provenance record, which are logged
+    by the caller (allows running this function in parallel processes).
+
+    """
     if not cfg[n.WRITE_PLOTS]:
-        return
+        return (None, None)
 
     filepath = get_plot_filename(dataset_name, cfg)
 
@@ -675,48 +684,77 @@ def plot_rlnst_regression(cfg, dataset_name, data, variables, regs):
 
     iris.save(cube_to_save_vars(list_dict), target=diagnostic_file)
 
-    logger.info("Recording provenance of %s:\n%s", diagnostic_file,
-                pformat(provenance_record))
-    with ProvenanceLogger(cfg) as provenance_logger:
-        provenance_logger.log(diagnostic_file, provenance_record)
-
-
-def substract_and_reg_deangelis2(cfg, data, var):
-    """Substract piControl from abrupt4xCO2 for all models and variables."""
-    pathlist = data.get_path_list(short_name='tas', exp=PICONTROL)
-    regressions = np.zeros((len(pathlist), 6))
-    datasets = []
+    return (diagnostic_file, provenance_record)
 
-    data_var = OrderedDict()
-    reg_var = OrderedDict()
-    varvar = var.short_names()
 
-    for iii, dataset_path in enumerate(pathlist):
+def get_anomalies(data, varvar, datasets):
+    """Substract piControl from abrupt4xCO2 for all models and variables.
 
-        # Substract piControl experiment from abrupt4xCO2 experiment
-        dataset = data.get_info(n.DATASET, dataset_path)
-        datasets.append(dataset)
+    Returns one array with shape (datasets, years) for every variable, time
+    series of different lengths are padded with missing values.
 
-        for jvar in varvar:
-            data_var[jvar] = data.get_data(short_name=jvar, exp=ABRUPT4XCO2,
-                                           dataset=dataset) - \
-                data.get_data(short_name=jvar, exp=PICONTROL,
-                              dataset=dataset)
+    """
+    anomalies = OrderedDict()
+    for jvar in varvar:
+        diffs = [
+            data.get_data(short_name=jvar, exp=ABRUPT4XCO2, dataset=dataset) -
+            data.get_data(short_name=jvar, exp=PICONTROL, dataset=dataset)
+            for dataset in datasets
+        ]
+        anomalies[jvar] = np.full((len(datasets), max(map(len, diffs))),
+                                  np.nan)
+        for (iii, diff) in enumerate(diffs):
+            anomalies[jvar][iii, :len(diff)] = np.ma.filled(diff, np.nan)
+    return anomalies
+
+
+def get_regressions(anomalies, varvar):
+    """Regress all variables against tas for all models at once."""
+    reg_vars = [jvar for jvar in varvar if jvar != 'tas']
+    reg = e.regression.linregress(
+        anomalies['tas'], np.array([anomalies[jvar] for jvar in reg_vars]))
+    return OrderedDict(
+        (jvar, e.regression.LinregressResult(*[arr[jjj] for arr in reg]))
+        for (jjj, jvar) in enumerate(reg_vars))
 
-        # Perform linear regression
-        for jvar in varvar:
-            if jvar != 'tas':
-                reg_var[jvar] = stats.linregress(data_var["tas"],
-                                                 data_var[jvar])
 
-        # Plot ECS regression if desired
-        plot_rlnst_regression(cfg, dataset, data_var, var, reg_var)
+def substract_and_reg_deangelis2(cfg, data, var):
+    """Substract piControl from abrupt4xCO2 for all models and variables."""
+    pathlist = data.get_path_list(short_name='tas', exp=PICONTROL)
+    datasets = [data.get_info(n.DATASET, path) for path in pathlist]
+    varvar = var.short_names()
 
-        # Save data
-        regressions[iii] = [reg_var["rlnst"].slope, reg_var["rsnst"].slope,
-                            reg_var["hfss"].slope, reg_var["lvp"].slope,
-                            reg_var["rlnstcs"].slope,
-                            reg_var["rsnstcs"].slope]
+    # Anomalies and linear regressions for all models at once
+    anomalies = get_anomalies(data, varvar, datasets)
+    reg_all = get_regressions(anomalies, varvar)
+    regressions = np.array([
+        reg_all[jvar].slope
+        for jvar in ('rlnst', 'rsnst', 'hfss', 'lvp', 'rlnstcs', 'rsnstcs')
+    ]).T
+
+    # Plot ECS regression if desired (in parallel if desired)
+    tasks = []
+    for (iii, dataset) in enumerate(datasets):
+        valid = ~np.isnan(anomalies['tas'][iii])
+        data_var = OrderedDict((jvar, anomalies[jvar][iii][valid])
+                               for jvar in varvar)
+        reg_var = OrderedDict(
+            (jvar, e.regression.LinregressResult(*[arr[iii] for arr in reg]))
+            for (jvar, reg) in reg_all.items())
+        tasks.append((cfg, dataset, data_var, var, reg_var))
+    n_jobs = cfg.get('n_jobs', 1)
+    if n_jobs > 1:
+        with get_context('spawn').Pool(n_jobs) as pool:
+            results = pool.starmap(plot_rlnst_regression, tasks)
+    else:
+        results = [plot_rlnst_regression(*task) for task in tasks]
+    for (diagnostic_file, provenance_record) in results:
+        if diagnostic_file is None:
+            continue
+        logger.info("Recording provenance of %s:\n%s", diagnostic_file,
+                    pformat(provenance_record))
+        with ProvenanceLogger(cfg) as provenance_logger:
+            provenance_logger.log(diagnostic_file, provenance_record)
 
     return dict([('regressions', regressions), ('datasets', datasets)])
 
@@ -20,6 +20,8 @@ Description
 
 Configuration options
 ---------------------
+n_jobs : int, optional (default: 1)
+    Number of processes used to create figure 3a for the individual models.
 
 ###############################################################################
 
@@ -29,6 +31,7 @@ Configuration options
 import logging
 import os
 from collections import OrderedDict
+from multiprocessing import get_context
 from pprint import pformat
 
 import iris
@@ -41,7 +44,7 @@ from scipy import stats
 from esmvaltool.diag_scripts.shared import (ProvenanceLogger,
                                             get_diagnostic_filename,
                                             get_plot_filename, group_metadata,
-                                            plot, run_diagnostic,
+                                            plot, regression, run_diagnostic,
                                             select_metadata,
                                             variables_available)
 
@@ -143,8 +146,8 @@ def set_grid_pw_reg_obs(cubes, meas_tub_rsnstcsnorm, meas_tub_prw):
                               data_prw_obs[kmeas_tub_prw[0]],
                               data_rsnstcsnorm_obs)
             reg_prw_obs[kmeas_tub_prw[0]] = \
-                stats.linregress(grid_pw["x"],
-                                 (grid_pw["yobs"])[kmeas_tub_prw[0]])
+                regression.linregress(grid_pw["x"],
+                                      (grid_pw["yobs"])[kmeas_tub_prw[0]])
     else:
         logger.info('No observations, only model data used')
 
@@ -266,7 +269,12 @@ def set_axx_deangelis3b(axx, x_obs, dx_obs):
 
 
 def plot_deangelis_fig3a(cfg, dataset_name, data, reg_prw, reg_obs):
-    """Plot DeAngelis Fig. 3a."""
+    """Plot DeAngelis Fig. 3a.
+
+    Returns the diagnostic file and its provenance record, which are logged
+    by the caller (allows running this function in parallel processes).
+
+    """
     reg_prw_dict = {}
     reg_prw_dict["x"] = np.linspace(0.0, 65, 2)
     reg_prw_dict["y"] = reg_prw.slope * reg_prw_dict["x"] + reg_prw.intercept
@@ -341,10 +349,7 @@ def plot_deangelis_fig3a(cfg, dataset_name, data, reg_prw, reg_obs):
 
     iris.save(cube_to_save_vars(list_dict), target=diagnostic_file)
 
-    logger.info("Recording provenance of %s:\n%s", diagnostic_file,
-                pformat(provenance_record))
-    with ProvenanceLogger(cfg) as provenance_logger:
-        provenance_logger.log(diagnostic_file, provenance_record)
+    return (diagnostic_file, provenance_record)
 
 
 def plot_deangelis_fig4(cfg, data_model, mdrsnstdts, prw):
@@ -580,13 +585,31 @@ def plot_deangelis_fig3b4(cfg, data_model, reg_prw_obs):
 
 
 def make_grid_prw(grid_pwx, data_prw_obs, data_rsnstcsnorm_obs):
-    """Grid rsnstcsnorm based on prw grid."""
-    gridded_rsnstcsnorm_obs = np.zeros(len(grid_pwx), dtype=float)
+    """Grid rsnstcsnorm based on prw grid.
 
-    for jjj, bincenter in enumerate(grid_pwx):
-        index_obs = np.where((data_prw_obs >= bincenter - 1.0) &
-                             (data_prw_obs < bincenter + 1.0))
-        gridded_rsnstcsnorm_obs[jjj] = np.mean(data_rsnstcsnorm_obs[index_obs])
+    All bins [bincenter - 1, bincenter + 1) are filled in a single pass over
+    the data, missing values are ignored.
+
+    """
+    lower = grid_pwx - 1.0
+    upper = grid_pwx + 1.0
+    prw = np.ma.filled(np.ma.asarray(data_prw_obs, dtype=float), np.nan)
+    rsnstcsnorm = np.ma.filled(
+        np.ma.asarray(data_rsnstcsnorm_obs, dtype=float), np.nan)
+    valid = ~(np.isnan(prw) | np.isnan(rsnstcsnorm))
+    prw = prw[valid]
+    rsnstcsnorm = rsnstcsnorm[valid]
+
+    # Index of the bin for every point (bins must not overlap)
+    bin_idx = np.searchsorted(lower, prw, side='right') - 1
+    in_bin = bin_idx >= 0
+    in_bin[in_bin] = prw[in_bin] < upper[bin_idx[in_bin]]
+    sums = np.bincount(bin_idx[in_bin],
+                       weights=rsnstcsnorm[in_bin],
+                       minlength=len(grid_pwx))
+    counts = np.bincount(bin_idx[in_bin], minlength=len(grid_pwx))
+    with np.errstate(invalid='ignore'):
+        gridded_rsnstcsnorm_obs = sums / counts
 
     return gridded_rsnstcsnorm_obs
 
@@ -654,38 +677,47 @@ def substract_and_reg_deangelis(cfg, cubes, grid_pw,
     """Substract piControl from abrupt4xCO2 for all models and variables."""
     data_model = OrderedDict()
 
-    model_tub_tas_pi = []
-
-    for tub in cubes.keys():
-        if tub[2] == 'piControl':
-            if tub[1] == 'tas':
-                model_tub_tas_pi.append(tub)
-
-    # Models
-    for model_run in model_tub_tas_pi:
-        # Substract piControl experiment from abrupt4xCO2 experiment
-        data_prw_pic = (cubes[(model_run[0], 'prw', model_run[2])])
-        data_rsnstcsnorm_pic = (cubes[(model_run[0],
-                                       'rsnstcsnorm', model_run[2])])
-        data_tas = (cubes[(model_run[0],
-                           model_run[1], 'abrupt4xCO2')]).data - \
-            (cubes[model_run])
-        data_rsnstcs = (cubes[(model_run[0], 'rsnstcs', 'abrupt4xCO2')]) - \
-            (cubes[(model_run[0], 'rsnstcs', model_run[2])])
-
-        grid_pw["ypic"] = make_grid_prw(grid_pw["x"], data_prw_pic,
-                                        data_rsnstcsnorm_pic)
-
-        reg6 = stats.linregress(data_tas, data_rsnstcs)
-
-        reg_prw = stats.linregress(grid_pw["x"], grid_pw["ypic"])
-
-        data_model[model_run[0]] = [reg6.slope, reg6.stderr, reg_prw.slope,
-                                    reg_prw.stderr]
-
-        plot_deangelis_fig3a(cfg, model_run[0],
-                             grid_pw, reg_prw,
-                             reg_prw_obs)
+    models = [tub[0] for tub in cubes.keys() if
+              tub[2] == 'piControl' and tub[1] == 'tas']
+
+    # Substract piControl experiment from abrupt4xCO2 experiment
+    anomalies = {}
+    for var in ('tas', 'rsnstcs'):
+        diffs = [cubes[(model, var, 'abrupt4xCO2')] -
+                 cubes[(model, var, 'piControl')] for model in models]
+        anomalies[var] = np.full((len(models), max(map(len, diffs))), np.nan)
+        for (iii, diff) in enumerate(diffs):
+            anomalies[var][iii, :len(diff)] = np.ma.filled(diff, np.nan)
+    ypic = np.array([
+        make_grid_prw(grid_pw["x"], cubes[(model, 'prw', 'piControl')],
+                      cubes[(model, 'rsnstcsnorm', 'piControl')])
+        for model in models
+    ]).reshape(len(models), len(grid_pw["x"]))
+
+    # Linear regressions for all models at once
+    reg6 = regression.linregress(anomalies['tas'], anomalies['rsnstcs'])
+    reg_prw = regression.linregress(grid_pw["x"], ypic)
+    for (iii, model) in enumerate(models):
+        data_model[model] = [reg6.slope[iii], reg6.stderr[iii],
+                             reg_prw.slope[iii], reg_prw.stderr[iii]]
+
+    # Plots (in parallel if desired)
+    tasks = []
+    for (iii, model) in enumerate(models):
+        tasks.append((cfg, model, {**grid_pw, 'ypic': ypic[iii]},
+                      regression.LinregressResult(
+                          *[arr[iii] for arr in reg_prw]), reg_prw_obs))
+    n_jobs = cfg.get('n_jobs', 1)
+    if n_jobs > 1:
+        with get_context('spawn').Pool(n_jobs) as pool:
+            results = pool.starmap(plot_deangelis_fig3a, tasks)
+    else:
+        results = [plot_deangelis_fig3a(*task) for task in tasks]
+    for (diagnostic_file, provenance_record) in results:
+        logger.info("Recording provenance of %s:\n%s", diagnostic_file,
+                    pformat(provenance_record))
+        with ProvenanceLogger(cfg) as provenance_logger:
+            provenance_logger.log(diagnostic_file, provenance_record)
 
     return data_model
 
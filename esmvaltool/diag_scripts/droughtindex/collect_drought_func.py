@@ -27,6 +27,7 @@ Configuration options
 import logging
 import os
 from pprint import pformat
+import dask.array as da
 import numpy as np
 import iris
 from iris.analysis import Aggregator
@@ -40,25 +41,14 @@ from esmvaltool.diag_scripts.shared import (ProvenanceLogger,
 logger = logging.getLogger(os.path.basename(__file__))
 
 
-def _get_data_hlp(axis, data, ilat, ilon):
-    """Get data_help dependend on axis."""
-    if axis == 0:
-        data_help = (data[:, ilat, ilon])[:, 0]
-    elif axis == 1:
-        data_help = (data[ilat, :, ilon])[:, 0]
-    elif axis == 2:
-        data_help = data[ilat, ilon, :]
-
-    return data_help
-
-
 def _get_drought_data(cfg, cube):
     """Prepare data and calculate characteristics."""
     # make a new cube to increase the size of the data array
     # Make an aggregator from the user function.
     spell_no = Aggregator('spell_count',
                           count_spells,
-                          units_func=lambda units: 1)
+                          units_func=lambda units: 1,
+                          lazy_func=lazy_count_spells)
     new_cube = _make_new_cube(cube)
 
     # calculate the number of drought events and their average duration
@@ -226,8 +216,7 @@ def get_provenance_record(ancestor_files, caption,
 
 def _make_new_cube(cube):
     """Make a new cube with an extra dimension for result of spell count."""
-    new_shape = cube.shape + (4,)
-    new_data = iris.util.broadcast_to_shape(cube.data, new_shape, [0, 1, 2])
+    new_data = da.stack([cube.lazy_data()] * 4, axis=-1)
     new_cube = iris.cube.Cube(new_data)
     new_cube.add_dim_coord(iris.coords.DimCoord(
         cube.coord('time').points, long_name='time'), 0)
@@ -372,19 +361,57 @@ def _plot_single_maps(cfg, cube2, drought_show, tstype, input_filenames):
     plot_map_spei(cfg, cube2, np.arange(-2.8, -1.8, 0.2), name_dict)
 
 
-def runs_of_ones_array_spei(bits, spei):
-    """Set 1 at beginning ond -1 at the end of events."""
-    # make sure all runs of ones are well-bounded
-    bounded = np.hstack(([0], bits, [0]))
-    # get 1 at run starts and -1 at run ends
-    difs = np.diff(bounded)
-    run_starts, = np.where(difs > 0)
-    run_ends, = np.where(difs < 0)
-    spei_sum = np.full(len(run_starts), 0.5)
-    for iii, indexs in enumerate(run_starts):
-        spei_sum[iii] = np.sum(spei[indexs:run_ends[iii]])
-
-    return [run_ends - run_starts, spei_sum]
+def _get_spell_statistics(data, threshold):
+    """Calculate drought characteristics along the last axis of ``data``.
+
+    Drought events are runs of consecutive time steps with values below
+    ``threshold`` (missing values are no hits). The runs of all points are
+    detected at once from the differences of the zero-padded hit array. The
+    last dimension of the returned array contains the number of events, their
+    mean duration, their mean severity index and their mean intensity.
+    """
+    data = np.ma.asarray(data)
+    out_shape = data.shape[:-1] + (4, )
+    n_time = data.shape[-1]
+    data = data.reshape(-1, n_time)
+    n_points = data.shape[0]
+    valid = ~np.ma.getmaskarray(data)
+    values = np.where(valid, np.ma.getdata(data), 0.0)
+    hits = valid & (values < threshold)
+
+    # Get 1 at run starts and -1 at run ends (runs are well-bounded)
+    bounded = np.zeros((n_points, n_time + 2), dtype=np.int8)
+    bounded[:, 1:-1] = hits
+    difs = np.diff(bounded, axis=1)
+    (points, run_starts) = np.nonzero(difs > 0)
+    run_ends = np.nonzero(difs < 0)[1]
+    events = run_ends - run_starts
+
+    # Sum of values for every event (one extra column separates the points)
+    padded = np.zeros((n_points, n_time + 1))
+    padded[:, :-1] = values
+    spei_sum = np.zeros(len(events))
+    if len(events):
+        offsets = points * (n_time + 1)
+        indices = np.stack([run_starts + offsets, run_ends + offsets], axis=1)
+        spei_sum = np.add.reduceat(padded.ravel(), indices.ravel())[::2]
+
+    # Statistics for every point
+    n_events = np.bincount(points, minlength=n_points)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_events = np.bincount(points, weights=events,
+                                  minlength=n_points) / n_events
+        mean_hits = (np.sum(values * hits, axis=1) /
+                     np.count_nonzero(hits, axis=1))
+        severity = (np.bincount(points, weights=spei_sum * events,
+                                minlength=n_points) / n_events /
+                    (mean_hits * mean_events))
+        intensity = np.bincount(points, weights=spei_sum / events,
+                                minlength=n_points) / n_events
+    return_var = np.stack([n_events, mean_events, severity, intensity],
+                          axis=-1)
+    return_var[~valid.any(axis=1)] = np.nan
+    return return_var.reshape(out_shape)
 
 
 def count_spells(data, threshold, axis):
@@ -395,40 +422,21 @@ def count_spells(data, threshold, axis):
     data = data[:, :, 0, :]
     if axis > 2:
         axis = axis - 1
+    return _get_spell_statistics(np.moveaxis(data, axis, -1), threshold)
 
-    listshape = []
-    inoax = []
-    for iii, ishape in enumerate(data.shape):
-        if iii != axis:
-            listshape.append(ishape)
-            inoax.append(iii)
-
-    listshape.append(4)
-    return_var = np.zeros(tuple(listshape))
-
-    for ilat in range(listshape[0]):
-        for ilon in range(listshape[1]):
-            data_help = _get_data_hlp(axis, data, ilat, ilon)
-
-            if data_help.count() == 0:
-                return_var[ilat, ilon, 0] = data_help[0]
-                return_var[ilat, ilon, 1] = data_help[0]
-                return_var[ilat, ilon, 2] = data_help[0]
-                return_var[ilat, ilon, 3] = data_help[0]
-            else:
-                data_hits = data_help < threshold
-                [events, spei_sum] = runs_of_ones_array_spei(data_hits,
-                                                             data_help)
-
-                return_var[ilat, ilon, 0] = np.count_nonzero(events)
-                return_var[ilat, ilon, 1] = np.mean(events)
-                return_var[ilat, ilon, 2] = np.mean((spei_sum * events) /
-                                                    (np.mean(data_help
-                                                             [data_hits])
-                                                     * np.mean(events)))
-                return_var[ilat, ilon, 3] = np.mean(spei_sum / events)
-
-    return return_var
+
+def lazy_count_spells(data, threshold, axis):
+    """Lazy version of :func:`count_spells` (parallel over spatial chunks)."""
+    if axis < 0:
+        axis += data.ndim
+    # Remove extra dimension for the result (last dimension of the cube)
+    data = da.moveaxis(data[..., 0], axis, -1)
+    chunks = {dim: 'auto' for dim in range(data.ndim - 1)}
+    chunks[data.ndim - 1] = -1
+    data = data.rechunk(chunks)
+    return da.map_blocks(_get_spell_statistics, data, threshold,
+                         dtype=np.float64,
+                         chunks=data.chunks[:-1] + ((4, ), ))
 
 
 def get_latlon_index(coords, lim1, lim2):
@@ -2,16 +2,20 @@
 import logging
 import os
 from copy import deepcopy
+from multiprocessing import get_context
 from pprint import pformat
 
 import iris
 import iris.pandas
+import iris.std_names
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 import yaml
-from scipy import integrate
+from cf_units import Unit
+from netCDF4 import Dataset, chartostring
+from scipy import linalg
 from scipy.stats import linregress, multivariate_normal
 from sklearn.linear_model import LinearRegression
 
@@ -30,6 +34,11 @@ LEGEND_KWARGS = {
     'borderaxespad': 0.0,
 }
 PANDAS_PRINT_OPTIONS = ['display.max_rows', None, 'display.max_colwidth', -1]
+NETCDF_CF_ATTRIBUTES = ('_FillValue', 'missing_value', 'units', 'long_name',
+                        'standard_name', 'coordinates', 'cell_methods',
+                        'valid_min', 'valid_max', 'valid_range')
+GAUSSIAN_PDF_X_POINTS = 401
+GAUSSIAN_PDF_CHUNK_SIZE = 2_000_000
 
 
 def _check_feature_array(x_array, single_sample=False):
@@ -96,6 +105,37 @@ def _check_prediction_arrays(x_new, x_train=None, x_cov=None):
     return (x_new, x_cov)
 
 
+def _get_constraint_from_pdf(y_lin, y_pdf, confidence_level):
+    """Get confidence range and best estimate from (batched) PDFs."""
+    y_cdf = cdf(y_lin, y_pdf)
+    y_mean = np.take_along_axis(y_lin,
+                                np.argmax(y_pdf, axis=-1)[..., np.newaxis],
+                                axis=-1)[..., 0]
+    in_range = ((y_cdf >= (1.0 - confidence_level) / 2.0) &
+                (y_cdf <= (1.0 + confidence_level) / 2.0))
+    y_lower = np.min(np.where(in_range, y_lin, np.inf), axis=-1)
+    y_upper = np.max(np.where(in_range, y_lin, -np.inf), axis=-1)
+    constraints = np.stack([y_lower, y_mean, y_upper], axis=-1)
+    constraints[~np.any(in_range, axis=-1)] = np.nan
+    return constraints
+
+
+def _get_x_grid(obs_mean, obs_cov, n_points):
+    """Get integration grid and Simpson weights for the predictors."""
+    n_points += 1 - n_points % 2
+    simpson = np.ones(n_points)
+    simpson[1:-1:2] = 4.0
+    simpson[2:-1:2] = 2.0
+    x_lins = []
+    weights = np.ones(1)
+    for (x_min, x_max) in _get_x_ranges(obs_mean, obs_cov):
+        x_lins.append(np.linspace(x_min, x_max, n_points))
+        step = (x_max - x_min) / (n_points - 1)
+        weights = np.outer(weights, simpson * step / 3.0).ravel()
+    x_grid = np.stack(np.meshgrid(*x_lins, indexing='ij'), axis=-1)
+    return (x_grid.reshape(-1, len(x_lins)), weights)
+
+
 def _get_x_ranges(obs_mean, obs_cov):
     """Get integration limits (8 sigma interval, includes > 99.99% of area)."""
     x_ranges = []
@@ -106,26 +146,6 @@ def _get_x_ranges(obs_mean, obs_cov):
     return x_ranges
 
 
-def _add_column(data_frame, series, column_name):
-    """Add column to :class:`pandas.DataFrame` (expands index if necessary)."""
-    for row in series.index.difference(data_frame.index):
-        data_frame = data_frame.append(pd.Series(name=row))
-    if column_name in data_frame.columns:
-        for row in series.index:
-            if np.isnan(data_frame.loc[row, column_name]):
-                data_frame.loc[row, column_name] = series.loc[row]
-            else:
-                if not np.isclose(data_frame.loc[row, column_name],
-                                  series.loc[row]):
-                    raise ValueError(
-                        f"Got duplicate data for tag '{column_name}' of "
-                        f"'{row}': {series.loc[row]:e} and "
-                        f"{data_frame.loc[row, column_name]:e}")
-    else:
-        data_frame[column_name] = series
-    return data_frame
-
-
 def _crop_data_frame(data_frame, ref_data_frame, data_name, ref_data_name):
     """Crop columns of a data_frame so that it matches a given reference."""
     diff_not_in_data_frame = list(ref_data_frame.columns.difference(
@@ -308,25 +328,70 @@ def _get_external_file(filepath, auxiliary_data_dir):
 
 
 def _get_data_frame(var_type, cubes, label_all_data, group_by=None):
-    """Extract :class:`pandas.DataFrame` for a given ``var_type``."""
-    data_frame = pd.DataFrame()
+    """Extract :class:`pandas.DataFrame` for a given ``var_type``.
+
+    All values are first collected in flat columns (index, tag, value) and the
+    :class:`pandas.DataFrame` is constructed only once at the end.
+
+    """
+    (groups, datasets, tags, values) = ([], [], [], [])
     for cube in cubes:
         cube_attrs = cube.attributes
         if var_type != cube_attrs['var_type']:
             continue
+        cube_datasets = np.ravel(cube.coord('dataset').points)
+        cube_values = np.ravel(np.ma.filled(
+            np.ma.asarray(cube.data, dtype=np.float64), np.nan))
         if var_type in ('feature', 'label'):
             if group_by is not None and group_by not in cube_attrs:
                 raise AttributeError(
                     f"Group attribute '{group_by}' not available in input "
                     f"file '{cube_attrs['filename']}'")
-            group = cube_attrs.get(group_by, label_all_data)
-            index = pd.MultiIndex.from_product([[group],
-                                                cube.coord('dataset').points],
-                                               names=[group_by, 'dataset'])
-        else:
-            index = cube.coord('dataset').points
-        series = pd.Series(data=cube.data, index=index)
-        data_frame = _add_column(data_frame, series, cube_attrs['tag'])
+            groups.extend([cube_attrs.get(group_by, label_all_data)] *
+                          len(cube_datasets))
+        datasets.extend(cube_datasets)
+        tags.extend([cube_attrs['tag']] * len(cube_datasets))
+        values.append(cube_values)
+
+    # Index
+    if var_type in ('feature', 'label'):
+        index = pd.MultiIndex.from_arrays([groups, datasets],
+                                          names=[group_by, 'dataset'])
+    else:
+        index = pd.Index(datasets)
+    if not tags:
+        return pd.DataFrame(index=index)
+    values = np.concatenate(values)
+    columns = pd.DataFrame({'tag': tags, 'value': values})
+    columns.index = index
+    return _columns_to_data_frame(columns)
+
+
+def _columns_to_data_frame(columns):
+    """Convert flat columns (index, tag, value) to :class:`pandas.DataFrame`.
+
+    Duplicate entries for the same index and tag are allowed if they are
+    identical (or missing).
+
+    """
+    rows = columns.index.unique()
+    keys = [f'level_{idx:d}' for idx in range(columns.index.nlevels)]
+    columns.index.names = keys
+    columns = columns.reset_index()
+    columns = columns.dropna(subset=['value'])
+    first = columns.groupby(keys + ['tag'])['value'].transform('first')
+    duplicates = ~np.isclose(columns['value'].values, first.values)
+    if duplicates.any():
+        invalid = columns[duplicates].iloc[0]
+        row = tuple(invalid[keys])
+        row = row[0] if len(row) == 1 else row
+        raise ValueError(
+            f"Got duplicate data for tag '{invalid['tag']}' of '{row}': "
+            f"{invalid['value']:e} and {first[duplicates].iloc[0]:e}")
+    columns = columns.drop_duplicates(subset=keys + ['tag'])
+    data_frame = columns.set_index(keys + ['tag'])['value'].unstack('tag')
+    data_frame = data_frame.reindex(index=rows)
+    data_frame.columns.name = None
     return data_frame
 
 
@@ -419,14 +484,91 @@ def _get_first_cube_with_coord(cubes, accepted_coord_names):
     return (returned_cube, returned_coord)
 
 
+def _load_scalar_cube(filename, accepted_coord_names):
+    """Load 1D cube with ``dataset``-like coordinate without :mod:`iris`.
+
+    Fast path for files containing a single 0D or 1D variable whose only
+    coordinate is a ``dataset``-like auxiliary coordinate (e.g. files written
+    by :func:`esmvaltool.diag_scripts.shared.io.save_scalar_data` without
+    ``aux_coord``). Returns ``None`` if the file has a different structure,
+    e.g. additional coordinates. Global and variable attributes are merged
+    into :attr:`iris.cube.Cube.attributes`, with the variable attributes
+    taking precedence.
+
+    """
+    with Dataset(filename) as nc_file:
+        variables = nc_file.variables
+        coord_names = set(nc_file.dimensions)
+        for var in variables.values():
+            coord_names.update(getattr(var, 'coordinates', '').split())
+            coord_names.update(getattr(var, 'bounds', '').split())
+        data_vars = [var for (name, var) in variables.items() if
+                     name not in coord_names]
+        if len(data_vars) != 1 or data_vars[0].ndim > 1:
+            return None
+        var = data_vars[0]
+        dataset_names = [name for name in
+                         getattr(var, 'coordinates', '').split() if
+                         name in accepted_coord_names]
+        if len(dataset_names) != 1:
+            return None
+        if len(getattr(var, 'coordinates', '').split()) > 1:
+            return None
+        if any(dim in variables for dim in var.dimensions):
+            return None
+        if any(hasattr(var, attr) for attr in ('ancillary_variables',
+                                               'cell_measures')):
+            return None
+        dataset_var = variables[dataset_names[0]]
+        dataset_var.set_auto_chartostring(False)
+        datasets = np.ma.filled(dataset_var[:], b'')
+        if datasets.dtype.kind == 'S':
+            datasets = chartostring(datasets).astype(str)
+        datasets = np.char.strip(np.atleast_1d(datasets).astype(str))
+        if datasets.shape != var.shape and var.ndim == 1:
+            return None
+        attributes = {attr: nc_file.getncattr(attr) for attr in
+                      nc_file.ncattrs()}
+        attributes.update({
+            attr: var.getncattr(attr) for attr in var.ncattrs() if attr not in
+            NETCDF_CF_ATTRIBUTES
+        })
+        try:
+            units = Unit(getattr(var, 'units', 'unknown'))
+        except ValueError:
+            return None
+        standard_name = getattr(var, 'standard_name', None)
+        if standard_name not in iris.std_names.STD_NAMES:
+            standard_name = None
+        (var_name, ndim) = (var.name, var.ndim)
+        long_name = getattr(var, 'long_name', None)
+        data = np.ma.asarray(var[:])
+    aux_coord = iris.coords.AuxCoord(datasets if ndim else datasets[0],
+                                     var_name='dataset',
+                                     long_name='dataset')
+    return iris.cube.Cube(data,
+                          var_name=var_name,
+                          standard_name=standard_name,
+                          long_name=long_name,
+                          units=units,
+                          attributes=attributes,
+                          aux_coords_and_dims=[(aux_coord,
+                                                0 if ndim else ())])
+
+
 def _load_cube_with_dataset_coord(filename):
     """Load cube with single ``dataset``-like coordinate.
 
     Files created by NCL cannot be read using a simple :func:`iris.load_cube`.
+    Simple files containing only a single variable are read without building
+    the full :class:`iris.cube.CubeList` first.
 
     """
-    cubes = iris.load(filename)
     accepted_coord_names = ('dataset', 'model')
+    cube = _load_scalar_cube(filename, accepted_coord_names)
+    if cube is not None:
+        return cube
+    cubes = iris.load(filename)
 
     # Handle single cube
     if len(cubes) == 1:
@@ -698,10 +840,9 @@ def get_input_data(cfg):
                                      label_all_data, group_by)
 
     # Unify indices of features and label
-    for row in features.index.difference(label.index):
-        label = label.append(pd.Series(name=row))
-    for row in label.index.difference(features.index):
-        features = features.append(pd.Series(name=row))
+    index = features.index.union(label.index)
+    features = features.reindex(index=index)
+    label = label.reindex(index=index)
 
     # Sort data frames
     for data_frame in (features, label, pred_input,
@@ -1151,11 +1292,26 @@ def export_csv(data_frame, attributes, basename, cfg, tags=None):
     return csv_path
 
 
-def standard_prediction_error(x_data, y_data):
+def _check_sample_weight(sample_weight, y_data):
+    """Ensure that the sample weights have correct shape."""
+    if sample_weight is None:
+        return np.ones(y_data.shape[0], dtype=np.float64)
+    sample_weight = np.array(sample_weight, dtype=np.float64)
+    if sample_weight.shape != y_data.shape:
+        raise ValueError(
+            f"Expected sample weights with shape {y_data.shape} (number of "
+            f"observations), got {sample_weight.shape}")
+    return sample_weight
+
+
+def standard_prediction_error(x_data, y_data, sample_weight=None):
     """Return function to calculate standard prediction error.
 
     The standard prediction error of a (multivariate) linear regression is the
-    error when predicting a new value which is not in the original data.
+    error when predicting a new value which is not in the original data. The
+    Cholesky factor of the (weighted) normal matrix is computed only once, the
+    returned function evaluates the error for arbitrary many new points at
+    once.
 
     Parameters
     ----------
@@ -1163,40 +1319,59 @@ def standard_prediction_error(x_data, y_data):
         Independent observations of predictors.
     y_data : numpy.ndarray
         Independent observations of the target variable.
+    sample_weight : numpy.ndarray, optional
+        Weights for the individual observations (weighted least squares).
 
     Returns
     -------
     callable
-        Standard prediction error function for new observation of the
-        predictors.
+        Standard prediction error function for new observation(s) of the
+        predictors. The last dimension of the input has to correspond to the
+        predictors, the output has the shape of the remaining dimensions.
+
+    Raises
+    ------
+    numpy.linalg.LinAlgError
+        Normal matrix of the regression is singular.
 
     """
     (x_data, y_data) = _check_training_arrays(x_data, y_data)
+    sample_weight = _check_sample_weight(sample_weight, y_data)
     lin = LinearRegression()
-    lin.fit(x_data, y_data)
+    lin.fit(x_data, y_data, sample_weight=sample_weight)
 
     # Standard error of estimates
     dof = x_data.shape[0] - x_data.shape[1]
     y_pred = lin.predict(x_data)
-    see = np.sqrt(np.sum(np.square(y_data - y_pred)) / dof)
+    see = np.sqrt(np.sum(sample_weight * np.square(y_data - y_pred)) / dof)
 
-    # Get design matrix
+    # Cholesky factor of (weighted) normal matrix
     ones = np.ones((x_data.shape[0], 1), dtype=x_data.dtype)
     x_design = np.hstack([ones, x_data])
+    chol = np.linalg.cholesky(
+        x_design.T @ (sample_weight[:, np.newaxis] * x_design))
+    chol_inv = linalg.solve_triangular(chol,
+                                       np.identity(chol.shape[0]),
+                                       lower=True)
 
     # Standard prediction error for new input
     def spe(x_new):
         """Return standard prediction error."""
-        x_new = _check_prediction_arrays(x_new, x_train=x_data)
-        one = np.ones((1, 1), dtype=x_new.dtype)
-        x_new = np.hstack([one, x_new])
-        return see * (1.0 +
-                      x_new @ np.linalg.inv(x_design.T @ x_design) @ x_new.T)
+        x_new = np.array(x_new, dtype=np.float64)
+        if x_new.ndim == 0:
+            x_new = x_new.reshape(1)
+        if x_new.shape[-1] != x_data.shape[1]:
+            raise ValueError(
+                f"Expected identical number of predictors for training and "
+                f"prediction data, got {x_data.shape[1]:d} and "
+                f"{x_new.shape[-1]:d}, respectively")
+        x_new = x_new @ chol_inv[:, 1:].T + chol_inv[:, 0]
+        return see * (1.0 + np.sum(np.square(x_new), axis=-1))
 
-    return np.vectorize(spe, signature='(n)->()')
+    return spe
 
 
-def regression_surface(x_data, y_data, n_points=50):
+def regression_surface(x_data, y_data, n_points=50, sample_weight=None):
     """Return points of the regression surface (mean and error).
 
     Parameters
@@ -1207,6 +1382,8 @@ def regression_surface(x_data, y_data, n_points=50):
         Independent observations of the target variable.
     n_points : int, optional (default: 50)
         Number of sampled points per predictor.
+    sample_weight : numpy.ndarray, optional
+        Weights for the individual observations (weighted least squares).
 
     Returns
     -------
@@ -1217,10 +1394,12 @@ def regression_surface(x_data, y_data, n_points=50):
 
     """
     (x_data, y_data) = _check_training_arrays(x_data, y_data)
+    sample_weight = _check_sample_weight(sample_weight, y_data)
     out = {}
     lin = LinearRegression()
-    lin.fit(x_data, y_data)
-    spe = standard_prediction_error(x_data, y_data)
+    lin.fit(x_data, y_data, sample_weight=sample_weight)
+    spe = standard_prediction_error(x_data, y_data,
+                                    sample_weight=sample_weight)
     x_max = np.max(x_data, axis=0)
     x_min = np.min(x_data, axis=0)
     x_range = x_max - x_min
@@ -1230,14 +1409,14 @@ def regression_surface(x_data, y_data, n_points=50):
     ]
     x_lin = np.array(np.mgrid[slices])
     x_lin = x_lin.reshape(-1, np.prod(x_lin.shape[1:], dtype=int)).T
+    y_err = spe(x_lin)
     out['x'] = x_lin
     out['y'] = lin.predict(x_lin)
-    out['y_minus_err'] = out['y'] - spe(x_lin)
-    out['y_plus_err'] = out['y'] + spe(x_lin)
-    out['x'] = x_lin
+    out['y_minus_err'] = out['y'] - y_err
+    out['y_plus_err'] = out['y'] + y_err
     out['coef'] = lin.coef_
     out['intercept'] = lin.intercept_
-    out['R2'] = lin.score(x_data, y_data)
+    out['R2'] = lin.score(x_data, y_data, sample_weight=sample_weight)
 
     return out
 
@@ -1265,37 +1444,115 @@ def gaussian_pdf(x_data, y_data, obs_mean, obs_cov, n_points=1000):
 
     """
     (x_data, y_data) = _check_training_arrays(x_data, y_data)
+    (y_lin, y_pdf) = gaussian_pdfs(x_data[np.newaxis],
+                                   y_data[np.newaxis],
+                                   obs_mean,
+                                   obs_cov,
+                                   n_points=n_points)
+    return (y_lin[0], y_pdf[0])
+
+
+def gaussian_pdfs(x_data, y_data, obs_mean, obs_cov, n_points=1000,
+                  n_points_x=GAUSSIAN_PDF_X_POINTS):
+    """Calculate Gaussian PDFs of the target variable for many training sets.
+
+    All training sets (e.g. bootstrap resamples of the model ensemble) are
+    evaluated at once. The joint PDF of predictors and target variable is
+    integrated over a fixed grid of the predictors (covering 8 standard
+    deviations of the observations) with Simpson's rule.
+
+    Parameters
+    ----------
+    x_data : numpy.ndarray
+        Independent observations of predictors for every training set, shape
+        (n_sets, n_samples) or (n_sets, n_samples, n_features).
+    y_data : numpy.ndarray
+        Independent observations of the target variable for every training
+        set, shape (n_sets, n_samples).
+    obs_mean : numpy.ndarray
+        Mean of observational data.
+    obs_cov : numpy.ndarray
+        Covariance matrix of observational data.
+    n_points : int, optional (default: 1000)
+        Number of sampled points for target variable for PDF.
+    n_points_x : int, optional
+        Number of sampled points per predictor for the integration (rounded
+        up to an odd number).
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        x and y values for the PDFs, both with shape (n_sets, n_points).
+
+    """
+    x_data = np.array(x_data, dtype=float)
+    y_data = np.array(y_data, dtype=float)
+    if x_data.ndim == 2:
+        x_data = x_data[..., np.newaxis]
+    if x_data.ndim != 3 or y_data.ndim != 2:
+        raise ValueError(
+            f"Expected 2D or 3D array for X and 2D array for Y, got "
+            f"{x_data.ndim:d}D and {y_data.ndim:d}D arrays")
+    if x_data.shape[:2] != y_data.shape:
+        raise ValueError(
+            f"Expected X and Y arrays with identical first two dimensions, "
+            f"got shapes {x_data.shape} and {y_data.shape}")
     (obs_mean, obs_cov) = _check_prediction_arrays(obs_mean,
-                                                   x_train=x_data,
+                                                   x_train=x_data[0],
                                                    x_cov=obs_cov)
-    lin = LinearRegression()
-    lin.fit(x_data, y_data)
-    spe = standard_prediction_error(x_data, y_data)
-
-    def obs_pdf(x_new):
-        """Return PDF of observations P(x)."""
-        gaussian = multivariate_normal(mean=obs_mean.squeeze(),
-                                       cov=obs_cov.squeeze())
-        return gaussian.pdf(x_new)
-
-    def cond_pdf(x_new, y_new):
-        """Return conditional PDF P(y|x)."""
-        y_pred = lin.predict(x_new.reshape(1, -1))
-        gaussian = multivariate_normal(mean=y_pred, cov=spe(x_new)**2)
-        return gaussian.pdf(y_new)
-
-    def comb_pdf(*args):
-        """Return combined PDF P(y,x)."""
-        x_new = np.array(args[:-1])
-        y_new = args[-1]
-        return obs_pdf(x_new) * cond_pdf(x_new, y_new)
-
-    # Calculate PDF of target variable P(y)
-    x_ranges = _get_x_ranges(obs_mean, obs_cov)
-    y_range = max(y_data) - min(y_data)
-    y_lin = np.linspace(min(y_data) - y_range, max(y_data) + y_range, n_points)
-    y_pdf = [integrate.nquad(comb_pdf, x_ranges, args=(y, ))[0] for y in y_lin]
-    return (y_lin, np.array(y_pdf))
+    x_design = np.concatenate(
+        [np.ones(x_data.shape[:2] + (1, )), x_data], axis=-1)
+    return _gaussian_pdfs(x_design, y_data, obs_mean, obs_cov, n_points,
+                          n_points_x)
+
+
+def _gaussian_pdfs(x_design, y_data, obs_mean, obs_cov, n_points,
+                   n_points_x):
+    """Calculate Gaussian PDFs from (batched) design matrices.
+
+    Training sets for which the PDF is not defined give NaN, i.e. sets
+    whose design matrix does not have full rank (e.g. bootstrap resamples
+    containing a single distinct model), sets without residual degrees of
+    freedom and sets which are fitted perfectly (vanishing standard error
+    of estimate, e.g. resamples containing only two distinct models).
+
+    """
+    # Linear regressions and standard prediction errors on integration grid
+    (x_grid, x_weights) = _get_x_grid(obs_mean, obs_cov, n_points_x)
+    valid = np.linalg.matrix_rank(x_design) == x_design.shape[-1]
+    xtx = np.swapaxes(x_design, -1, -2) @ x_design
+    xtx[~valid] = np.identity(x_design.shape[-1])
+    xtx_inv = np.linalg.inv(xtx)
+    coef = xtx_inv @ (np.swapaxes(x_design, -1, -2) @ y_data[..., np.newaxis])
+    dof = x_design.shape[1] - x_design.shape[2] + 1
+    see = np.sqrt(
+        np.sum(np.square(y_data - (x_design @ coef)[..., 0]), axis=-1) /
+        max(dof, 1))
+    valid &= (dof > 0) & (see > np.sqrt(np.finfo(float).eps) *
+                          np.max(np.abs(y_data), axis=-1))
+    see[~valid] = 1.0
+    grid_design = np.hstack([np.ones((x_grid.shape[0], 1)), x_grid])
+    y_pred = (grid_design @ coef)[..., 0]
+    spe = see[:, np.newaxis] * (1.0 + np.einsum(
+        'gi,sij,gj->sg', grid_design, xtx_inv, grid_design))
+    obs_weights = x_weights * multivariate_normal(
+        mean=obs_mean.squeeze(axis=0), cov=obs_cov).pdf(x_grid)
+
+    # Calculate PDFs of target variable P(y) = int P(x) P(y|x) dx
+    y_min = np.min(y_data, axis=1)
+    y_max = np.max(y_data, axis=1)
+    y_range = y_max - y_min
+    y_lin = np.linspace(y_min - y_range, y_max + y_range, n_points, axis=-1)
+    y_pdf = np.empty_like(y_lin)
+    chunk = max(1, GAUSSIAN_PDF_CHUNK_SIZE // (x_grid.shape[0] * len(y_lin)))
+    for idx in range(0, n_points, chunk):
+        y_chunk = y_lin[:, idx:idx + chunk, np.newaxis]
+        norm = (y_chunk - y_pred[:, np.newaxis, :]) / spe[:, np.newaxis, :]
+        cond_pdf = (np.exp(-0.5 * np.square(norm)) /
+                    (np.sqrt(2.0 * np.pi) * spe[:, np.newaxis, :]))
+        y_pdf[:, idx:idx + chunk] = cond_pdf @ obs_weights
+    y_pdf[~valid] = np.nan
+    return (y_lin, y_pdf)
 
 
 def cdf(data, pdf):
@@ -1304,7 +1561,8 @@ def cdf(data, pdf):
     Parameters
     ----------
     data : numpy.ndarray
-        Data points (1D array).
+        Data points (1D array, or array with the data points in the last
+        dimension).
     pdf : numpy.ndarray
         Corresponding probability density function (PDF).
 
@@ -1314,35 +1572,45 @@ def cdf(data, pdf):
         Corresponding cumulative distribution function (CDF).
 
     """
-    idx_range = range(1, len(data) + 1)
-    cum_dens = [integrate.simps(pdf[:idx], data[:idx]) for idx in idx_range]
-    return np.array(cum_dens)
+    data = np.asarray(data)
+    pdf = np.asarray(pdf)
+    areas = 0.5 * (pdf[..., 1:] + pdf[..., :-1]) * np.diff(data, axis=-1)
+    cum_dens = np.zeros(np.broadcast(data, pdf).shape)
+    cum_dens[..., 1:] = np.cumsum(areas, axis=-1)
+    return cum_dens
 
 
-def get_constraint(training_data, pred_input_data, confidence_level):
-    """Get constraint on target variable.
+def get_constraints(x_data, y_data, obs_mean, obs_cov, confidence_level):
+    """Get constraints on target variable for many training sets at once.
 
     Parameters
     ----------
-    training_data : pandas.DataFrame
-        Training data (features, label).
-    pred_input_data : pandas.DataFrame
-        Prediction input data (mean and error).
+    x_data : numpy.ndarray
+        Independent observations of predictors for every training set, shape
+        (n_sets, n_samples) or (n_sets, n_samples, n_features).
+    y_data : numpy.ndarray
+        Independent observations of the target variable for every training
+        set, shape (n_sets, n_samples).
+    obs_mean : numpy.ndarray
+        Mean of observational data.
+    obs_cov : numpy.ndarray
+        Covariance matrix of observational data.
     confidence_level : float
         Confindence level to estimate the range of the target variable.
 
     Returns
     -------
-    tuple of float
+    numpy.ndarray
         Lower confidence limit, best estimate and upper confidence limit of
-        target variable.
-
-    Raises
-    ------
-    ValueError
-        Input data has not the correct shape.
+        target variable for every training set, shape (n_sets, 3).
 
     """
+    (y_lin, y_pdf) = gaussian_pdfs(x_data, y_data, obs_mean, obs_cov)
+    return _get_constraint_from_pdf(y_lin, y_pdf, confidence_level)
+
+
+def _get_constraint_input(training_data, pred_input_data):
+    """Extract label, training data and prediction input for constraint."""
     if len(training_data.columns) != 2:
         raise ValueError(
             f"Expected exactly two columns for training data (feature and "
@@ -1351,8 +1619,6 @@ def get_constraint(training_data, pred_input_data, confidence_level):
         raise ValueError(
             f"Expected exactly two columns for prediction input data (mean "
             f"and error, got {len(pred_input_data.columns):d}")
-
-    # Extract data
     label = training_data.y.columns[0]
     feature = training_data.x.columns[0]
     (x_data, y_data) = get_xy_data_without_nans(training_data, feature, label)
@@ -1361,6 +1627,45 @@ def get_constraint(training_data, pred_input_data, confidence_level):
     pred_input_error = pred_input_data['error'][feature].values[0]
     (pred_input_mean, pred_input_error) = _check_prediction_arrays(
         pred_input_mean, x_data, pred_input_error)
+    return (label, x_data, y_data, pred_input_mean, pred_input_error)
+
+
+def _get_constraints_from_design(x_design, y_data, obs_mean, obs_cov,
+                                 confidence_level):
+    """Get constraints from (batched) design matrices."""
+    (y_lin, y_pdf) = _gaussian_pdfs(x_design, y_data, obs_mean, obs_cov,
+                                    1000, GAUSSIAN_PDF_X_POINTS)
+    constraints = _get_constraint_from_pdf(y_lin, y_pdf, confidence_level)
+    constraints[np.isnan(y_pdf[:, 0])] = np.nan
+    return constraints
+
+
+def get_constraint(training_data, pred_input_data, confidence_level):
+    """Get constraint on target variable.
+
+    Parameters
+    ----------
+    training_data : pandas.DataFrame
+        Training data (features, label).
+    pred_input_data : pandas.DataFrame
+        Prediction input data (mean and error).
+    confidence_level : float
+        Confindence level to estimate the range of the target variable.
+
+    Returns
+    -------
+    tuple of float
+        Lower confidence limit, best estimate and upper confidence limit of
+        target variable.
+
+    Raises
+    ------
+    ValueError
+        Input data has not the correct shape.
+
+    """
+    (label, x_data, y_data, pred_input_mean,
+     pred_input_error) = _get_constraint_input(training_data, pred_input_data)
 
     # Calculate constraint
     logger.info(
@@ -1368,9 +1673,110 @@ def get_constraint(training_data, pred_input_data, confidence_level):
         label, 100.0 * confidence_level)
     (y_lin, y_pdf) = gaussian_pdf(x_data, y_data, pred_input_mean,
                                   pred_input_error**2)
-    y_cdf = cdf(y_lin, y_pdf)
-    y_mean = y_lin[np.argmax(y_pdf)]
-    y_index_range = np.nonzero((y_cdf >= (1.0 - confidence_level) / 2.0) &
-                               (y_cdf <= (1.0 + confidence_level) / 2.0))
-    y_range = y_lin[y_index_range]
-    return (y_range.min(), y_mean, y_range.max())
+    return tuple(_get_constraint_from_pdf(y_lin, y_pdf, confidence_level))
+
+
+def get_resampling_indices(n_data, method='bootstrap', n_resamples=1000,
+                           random_state=None):
+    """Get indices to resample the training data.
+
+    Parameters
+    ----------
+    n_data : int
+        Number of training samples (e.g. models).
+    method : str, optional (default: 'bootstrap')
+        Resampling method, either ``'bootstrap'`` (draw ``n_data`` samples
+        with replacement) or ``'leave_one_out'`` (leave out every sample
+        once).
+    n_resamples : int, optional (default: 1000)
+        Number of resamples (only relevant for ``'bootstrap'``).
+    random_state : int, optional
+        Seed for the random number generator (only relevant for
+        ``'bootstrap'``).
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices of the resamples, shape ``(n_resamples, n_data)`` for
+        ``'bootstrap'`` and ``(n_data, n_data - 1)`` for
+        ``'leave_one_out'``.
+
+    Raises
+    ------
+    ValueError
+        Invalid ``method`` given.
+
+    """
+    if method == 'bootstrap':
+        rng = np.random.RandomState(random_state)
+        return rng.randint(0, n_data, size=(n_resamples, n_data))
+    if method == 'leave_one_out':
+        return np.nonzero(~np.identity(n_data, dtype=bool))[1].reshape(
+            n_data, n_data - 1)
+    raise ValueError(
+        f"Expected 'bootstrap' or 'leave_one_out' for resampling method, got "
+        f"'{method}'")
+
+
+def get_constraint_distribution(training_data, pred_input_data,
+                                confidence_level, method='bootstrap',
+                                n_resamples=1000, n_jobs=1,
+                                random_state=None):
+    """Get distribution of constraints on target variable from resampling.
+
+    The training data (i.e. the model ensemble) is resampled with
+    :func:`get_resampling_indices`. The design matrix of the regression is
+    calculated once and the regressions and constraints of all resamples are
+    calculated with batched linear algebra, optionally distributed over
+    several processes.
+
+    Parameters
+    ----------
+    training_data : pandas.DataFrame
+        Training data (features, label).
+    pred_input_data : pandas.DataFrame
+        Prediction input data (mean and error).
+    confidence_level : float
+        Confindence level to estimate the range of the target variable.
+    method : str, optional (default: 'bootstrap')
+        Resampling method, either ``'bootstrap'`` or ``'leave_one_out'``.
+    n_resamples : int, optional (default: 1000)
+        Number of resamples (only relevant for ``'bootstrap'``).
+    n_jobs : int, optional (default: 1)
+        Number of processes.
+    random_state : int, optional
+        Seed for the random number generator (only relevant for
+        ``'bootstrap'``).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Lower confidence limit, best estimate and upper confidence limit of
+        target variable (columns) for every resample (index). Resamples for
+        which no regression is possible contain missing values.
+
+    """
+    (label, x_data, y_data, pred_input_mean,
+     pred_input_error) = _get_constraint_input(training_data, pred_input_data)
+    indices = get_resampling_indices(len(y_data),
+                                     method=method,
+                                     n_resamples=n_resamples,
+                                     random_state=random_state)
+    logger.info(
+        "Calculating %i constraints on '%s' using %s resampling with %i "
+        "process(es)", len(indices), label, method, n_jobs)
+    x_design = np.hstack([np.ones((x_data.shape[0], 1)), x_data])
+    n_chunks = min(len(indices),
+                   max(n_jobs, int(np.ceil(len(indices) / 100.0))))
+    args = [(x_design[idx], y_data[idx], pred_input_mean,
+             pred_input_error**2, confidence_level)
+            for idx in np.array_split(indices, n_chunks)]
+    if n_jobs > 1:
+        with get_context('spawn').Pool(n_jobs) as pool:
+            constraints = pool.starmap(_get_constraints_from_design, args)
+    else:
+        constraints = [_get_constraints_from_design(*arg) for arg in args]
+    data_frame = pd.DataFrame(np.concatenate(constraints),
+                              columns=['lower', 'best_estimate', 'upper'])
+    data_frame.index.name = 'resample'
+    return data_frame
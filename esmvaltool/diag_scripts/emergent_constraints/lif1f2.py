@@ -38,7 +38,7 @@ import esmvaltool.diag_scripts.shared.names as n
 from esmvaltool.diag_scripts.shared import (ProvenanceLogger,
                                             get_diagnostic_filename,
                                             get_plot_filename, group_metadata,
-                                            select_metadata)
+                                            regression, select_metadata)
 
 logger = logging.getLogger(os.path.basename(__file__))
 
@@ -618,16 +618,17 @@ def plot_reg_li2(cfg, datasets, mdiff_ism, mdiff_ism_cor, hist_ism):
 
 def get_reg_2d_li(mism_diff_rain, ar_hist_rain, lats, lons):
     """Linear regression of 1D and 2D array, returns 2D array of p and r."""
-    reg2d = np.zeros((len(lats), len(lons), 4))
-    for iii in range(len(lats)):
-        for jjj in range(len(lons)):
-            reg = stats.linregress(mism_diff_rain, ar_hist_rain[iii, jjj, :])
-            reg2d[iii, jjj, 0] = reg.rvalue
-            reg2d[iii, jjj, 1] = reg.pvalue
-            reg2d[iii, jjj, 2] = reg.slope
-            reg2d[iii, jjj, 3] = reg.intercept
+    reg = regression.linregress(mism_diff_rain, ar_hist_rain, axis=-1)
+    reg2d = np.stack([reg.rvalue, reg.pvalue, reg.slope, reg.intercept],
+                     axis=-1)
+    return reg2d.reshape(len(lats), len(lons), 4)
 
-    return reg2d
+
+def get_box_mean_li(ar_data, lats, lons, lat_lim, lon_lim):
+    """Mean over a lat-lon box for all datasets (last dimension) at once."""
+    box = ar_data[np.ix_(get_latlon_index(lats, *lat_lim),
+                         get_latlon_index(lons, *lon_lim))]
+    return np.mean(box, axis=(0, 1))
 
 
 def substract_li(cfg, data, lats, lons, future_exp):
@@ -635,8 +636,6 @@ def substract_li(cfg, data, lats, lons, future_exp):
     pathlist = data.get_path_list(short_name='pr', exp='historical')
 
     ar_diff_rain = np.zeros((len(lats), len(lons), len(pathlist)))
-    mism_diff_rain = np.zeros(len(pathlist))
-    mwp_hist_rain = np.zeros(len(pathlist))
     ar_hist_rain = np.zeros((len(lats), len(lons), len(pathlist)))
     ar_diff_ua = np.zeros((len(lats), len(lons), len(pathlist)))
     ar_diff_va = np.zeros((len(lats), len(lons), len(pathlist)))
@@ -655,18 +654,8 @@ def substract_li(cfg, data, lats, lons, future_exp):
                            exp=future_exp, dataset=datasets[iii]) -
              data.get_data(short_name='ts',
                            exp='historical', dataset=datasets[iii]))
-        # ISM (60◦ –95◦ E, 10◦ –30◦ N)
-        mism_diff_rain[iii] = \
-            np.mean((ar_diff_rain[:,
-                                  get_latlon_index(lons, 60, 95),
-                                  iii])[get_latlon_index(lats, 10, 30), :])
         ar_hist_rain[:, :, iii] = data.get_data(
             short_name='pr', exp='historical', dataset=datasets[iii])
-        # Western pacific (140◦ E–170◦ W, 12◦ S–12◦ N)
-        mwp_hist_rain[iii] = \
-            np.mean((ar_hist_rain[:,
-                                  get_latlon_index(lons, 140, 170),
-                                  iii])[get_latlon_index(lats, -12, 12), :])
 
         ar_diff_ua[:, :, iii] = (data.get_data(short_name='ua',
                                                exp=future_exp,
@@ -696,6 +685,13 @@ def substract_li(cfg, data, lats, lons, future_exp):
                             'ar_diff_va': ar_diff_va[:, :, iii],
                             'lats': lats, 'lons': lons}, future_exp)
 
+    # ISM (60◦ –95◦ E, 10◦ –30◦ N)
+    mism_diff_rain = get_box_mean_li(ar_diff_rain, lats, lons, (10, 30),
+                                     (60, 95))
+    # Western pacific (140◦ E–170◦ W, 12◦ S–12◦ N)
+    mwp_hist_rain = get_box_mean_li(ar_hist_rain, lats, lons, (-12, 12),
+                                    (140, 170))
+
     return {
         "datasets": datasets,
         "ar_diff_rain": ar_diff_rain,
@@ -712,29 +708,15 @@ def correct_li(data, lats, lons, reg):
     # Prec bias for each model
     mwp_hist_cor = data["mwp_hist_rain"] - 6.0
 
-    proj_err = np.zeros((len(lats), len(lons), len(data["datasets"])))
-    ar_diff_cor = np.zeros((len(lats), len(lons), len(data["datasets"])))
-    mism_hist_rain = np.zeros((len(data["datasets"])))
-    mism_diff_cor = np.zeros((len(data["datasets"])))
-
-    for iii in range(0, len(data["datasets"])):
-
-        # Errors of climate projection
-        proj_err[:, :, iii] = mwp_hist_cor[iii] * reg[:, :, 2]
-
-        # Correction for prec difference
-        ar_diff_cor[:, :, iii] = data["ar_diff_rain"][:, :, iii] - \
-            proj_err[:, :, iii]
-        mism_hist_rain[iii] = \
-            np.mean((data["ar_hist_rain"][:,
-                                          get_latlon_index(lons, 60, 95),
-                                          iii])[get_latlon_index(lats,
-                                                                 10, 30),
-                                                :])
-        mism_diff_cor[iii] = \
-            np.mean((ar_diff_cor[:,
-                                 get_latlon_index(lons, 60, 95),
-                                 iii])[get_latlon_index(lats, 10, 30), :])
+    # Errors of climate projection
+    proj_err = reg[:, :, 2, np.newaxis] * mwp_hist_cor
+
+    # Correction for prec difference
+    ar_diff_cor = data["ar_diff_rain"] - proj_err
+    mism_hist_rain = get_box_mean_li(data["ar_hist_rain"], lats, lons,
+                                     (10, 30), (60, 95))
+    mism_diff_cor = get_box_mean_li(ar_diff_cor, lats, lons, (10, 30),
+                                    (60, 95))
 
     return {
         "datasets": data["datasets"],
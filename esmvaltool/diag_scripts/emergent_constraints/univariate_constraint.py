@@ -38,14 +38,26 @@ ignore_patterns : list of str, optional
     Patterns matched against ancestor files. Those files are ignored.
 merge_identical_pred_input : bool, optional (default: True)
     Use identical prediction_input values as single value.
+n_jobs : int, optional (default: 1)
+    Number of processes used to calculate the constraints of the resampled
+    model ensembles (only relevant if ``resampling`` is given).
+n_resamples : int, optional (default: 1000)
+    Number of bootstrap resamples (only relevant if ``resampling`` is
+    ``'bootstrap'``).
 numbers_as_markers : bool, optional (default: False)
     Use numbers as markers in scatterplots.
 patterns : list of str, optional
     Patterns matched against ancestor files.
+random_seed : int, optional
+    Seed for the bootstrap resampling.
 read_external_file : str, optional
     Read input datasets from external file given as absolute path or relative
     path. In the latter case, ``'auxiliary_data_dir'`` from the user
     configuration file is used as base directory.
+resampling : str, optional
+    Estimate the uncertainty of the constraint by resampling the model
+    ensemble. Must be one of ``'bootstrap'`` or ``'leave_one_out'``. The
+    distribution of the constraints is written to a NetCDF and a CSV file.
 savefig_kwargs : dict, optional
     Keyword arguments for :func:`matplotlib.pyplot.savefig`.
 seaborn_settings : dict, optional
@@ -57,11 +69,14 @@ seaborn_settings : dict, optional
 import logging
 import os
 
+import iris
 import pandas as pd
 import seaborn as sns
 
 import esmvaltool.diag_scripts.emergent_constraints as ec
-from esmvaltool.diag_scripts.shared import run_diagnostic
+from esmvaltool.diag_scripts.shared import (ProvenanceLogger,
+                                            get_diagnostic_filename, io,
+                                            run_diagnostic)
 
 logger = logging.getLogger(os.path.basename(__file__))
 
@@ -80,6 +95,8 @@ def get_default_settings(cfg):
     cfg.setdefault('all_data_label', 'all')
     cfg.setdefault('confidence_level', 0.66)
     cfg.setdefault('merge_identical_pred_input', True)
+    cfg.setdefault('n_jobs', 1)
+    cfg.setdefault('n_resamples', 1000)
     cfg.setdefault('savefig_kwargs', {
         'bbox_inches': 'tight',
         'dpi': 600,
@@ -89,6 +106,39 @@ def get_default_settings(cfg):
     return cfg
 
 
+def write_constraint_distribution(training_data, prediction_data, attributes,
+                                  cfg):
+    """Calculate and write distribution of constraints from resampling."""
+    method = cfg['resampling']
+    label = training_data.y.columns[0]
+    feature = training_data.x.columns[0]
+    units = attributes[label]['units']
+    distribution = ec.get_constraint_distribution(
+        training_data, prediction_data, cfg['confidence_level'],
+        method=method, n_resamples=cfg['n_resamples'], n_jobs=cfg['n_jobs'],
+        random_state=cfg.get('random_seed'))
+    with pd.option_context(*ec.PANDAS_PRINT_OPTIONS):
+        logger.info(
+            "Distribution of constraints on target variable '%s' (%s, %s):\n"
+            "%s", label, method, units, distribution.describe())
+
+    # Export NetCDF and CSV
+    basename = f'constraint_{method}'
+    cube = ec.pandas_object_to_cube(
+        distribution, var_name=label,
+        long_name=attributes[label]['plot_ylabel'], units=units)
+    netcdf_path = get_diagnostic_filename(basename, cfg)
+    io.iris_save(iris.cube.CubeList([cube]), netcdf_path)
+    provenance_record = ec.get_provenance_record(
+        attributes, [feature, label],
+        caption=f"Distribution of the constraints on {label} from {method} "
+        f"resampling of the model ensemble.")
+    with ProvenanceLogger(cfg) as provenance_logger:
+        provenance_logger.log(netcdf_path, provenance_record)
+    ec.export_csv(distribution, attributes, basename, cfg,
+                  tags=[feature, label])
+
+
 def main(cfg):
     """Run the diagnostic."""
     cfg = get_default_settings(cfg)
@@ -128,6 +178,11 @@ def main(cfg):
         "estimate %.2f %s", label, constrained_target[0],
         constrained_target[2], units, constrained_target[1], units)
 
+    # Uncertainty of constraint from resampling
+    if cfg.get('resampling') is not None:
+        write_constraint_distribution(training_data, prediction_data,
+                                      attributes, cfg)
+
 
 if __name__ == '__main__':
     with run_diagnostic() as config:
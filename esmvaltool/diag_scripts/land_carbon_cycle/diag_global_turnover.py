@@ -1,6 +1,7 @@
 """Function to compare global distributions of turnover time."""
 
 import os.path
+import dask
 import iris
 import cartopy.crs as ccrs
 import matplotlib.pyplot as plt
@@ -226,12 +227,14 @@ def _get_obs_data(diag_config):
                             **diag_config['obs_info']))
         input_files = np.append(input_files,
                                 os.path.join(obs_dir, obs_filename))
+    # read all observation files only once
+    all_cubes = iris.load(input_files.tolist())
     nvars = len(var_list)
     for v_ind in range(nvars):
         var_obs = var_list[v_ind]
         all_data['coords'] = {}
         variable_constraint = _var_name_constraint(var_obs)
-        cube = iris.load_cube(input_files, constraint=variable_constraint)
+        cube = all_cubes.extract_strict(variable_constraint)
         all_data['grid'][var_obs] = cube
         all_data['global'][var_obs] = fig_config['obs_global']
     for coord in cube.coords():
@@ -267,6 +270,56 @@ def _calc_turnover(ctotal, gpp, _model):
     return tau_ctotal
 
 
+def _get_model_data(model_data_dict):
+    """
+    Load the model data and calculate the turnover times in a single pass.
+
+    The data of all models are kept lazy until the gridded and global
+    turnover times of all models are computed together in one dask graph, so
+    that every file is read only once.
+
+    Argument:
+    --------
+        model_data_dict - dictionary of metadata grouped by model name
+
+    Return:
+    ------
+        dictionary with gridded (key 'grid', iris cubes) and global (key
+        'global', float) turnover time of all models
+    """
+    global_tau_mod = {}
+    global_tau_mod['grid'] = {}
+    global_tau_mod['global'] = {}
+    tau_global_cubes = {}
+
+    for model_name, model_dataset in model_data_dict.items():
+        # load the data
+        ctotal = _load_variable(model_dataset, 'ctotal')
+        gpp = _load_variable(model_dataset, 'gpp')
+        global_tau_mod['grid'][model_name] = _calc_turnover(
+            ctotal, gpp, model_name)
+
+        # apply the GPP threshold and set the data in dictionary
+        gpp_global = gpp.collapsed(['latitude', 'longitude'],
+                                   iris.analysis.SUM)
+        ctotal_global = ctotal.collapsed(['latitude', 'longitude'],
+                                         iris.analysis.SUM)
+        tau_global = ctotal_global / gpp_global
+        tau_global.convert_units('yr')
+        tau_global_cubes[model_name] = tau_global
+
+    # compute all models at once
+    cubes = (list(global_tau_mod['grid'].values()) +
+             list(tau_global_cubes.values()))
+    all_data = dask.compute(*[cube.core_data() for cube in cubes])
+    for (cube, data) in zip(cubes, all_data):
+        cube.data = data
+    for (model_name, tau_global) in tau_global_cubes.items():
+        global_tau_mod['global'][model_name] = float(tau_global.data)
+
+    return global_tau_mod
+
+
 def _fix_map(axis_obj):
     """
     Beautify map object.
@@ -713,9 +766,8 @@ def main(diag_config):
                      source_label=diag_config['obs_info']['source_label'],
                      grid_label=diag_config['obs_info']['grid_label']))
 
-    global_tau_mod = {}
-    global_tau_mod['grid'] = {}
-    global_tau_mod['global'] = {}
+    # get the data from all models
+    global_tau_mod = _get_model_data(model_data_dict)
 
     provenance_record_matrix = _get_provenance_record(
         "Matrix Comparison of global distributions of turnover time of carbon",
@@ -728,25 +780,10 @@ def main(diag_config):
         ['mean', 'perc'], ['global'],
         _get_ancestor_files(diag_config, 'tau_ctotal'))
 
-    for model_name, model_dataset in model_data_dict.items():
-        global_tau_mod[model_name] = {}
-
-        # load the data
-        ctotal = _load_variable(model_dataset, 'ctotal')
-        gpp = _load_variable(model_dataset, 'gpp')
-        tau_ctotal = _calc_turnover(ctotal, gpp, model_name)
-        global_tau_mod['grid'][model_name] = tau_ctotal
-
-        # apply the GPP threshold and set the data in dictionary
-        gpp_global = gpp.collapsed(['latitude', 'longitude'],
-                                   iris.analysis.SUM)
-        ctotal_global = ctotal.collapsed(['latitude', 'longitude'],
-                                         iris.analysis.SUM)
-        tau_global = ctotal_global / gpp_global
-        tau_global.convert_units('yr')
-
-        global_tau_mod['global'][model_name] = np.float(tau_global
-                                                        .core_data())
+    model_names = list(model_data_dict)
+    for (idx, model_name) in enumerate(model_names):
+        model_dataset = model_data_dict[model_name]
+        tau_ctotal = global_tau_mod['grid'][model_name]
 
         if diag_config['write_plots']:
             base_name_mod = (
@@ -769,8 +806,7 @@ def main(diag_config):
                              diag_config)
         if diag_config['write_netcdf']:
             model_cubes = [
-                c for c in global_tau_mod['grid'].values()
-                if isinstance(c, iris.cube.Cube)
+                global_tau_mod['grid'][name] for name in model_names[:idx + 1]
             ]
             obs_cubes = [
                 c for c in global_tau_obs['grid'].values()
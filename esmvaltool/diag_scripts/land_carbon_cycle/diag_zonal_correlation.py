@@ -21,7 +21,6 @@ from esmvaltool.diag_scripts.shared import (
 
 import esmvaltool.diag_scripts.land_carbon_cycle.plot_utils as plut
 from esmvaltool.diag_scripts.land_carbon_cycle.shared import (
-    _apply_common_mask,
     _get_obs_data_zonal,
     _load_variable,
     _remove_invalid,
@@ -62,43 +61,116 @@ def _get_fig_config(diag_config):
     return fig_config
 
 
-def partial_corr(dat_columns, fig_config):
+def _get_window_sums(dat, window_size):
+    """
+    Sum the data in all sliding latitude windows.
+
+    The windows cover the latitudes [i - window_size, i + window_size]
+    (truncated at the poles) and all longitudes. The sums of all windows are
+    calculated at once from cumulative sums of the zonal sums.
+
+    Argument:
+    --------
+        dat - data with latitude and longitude as last two dimensions
+        window_size - half size of the sliding window (number of latitudes)
+
+    Return:
+    ------
+        window sums with latitude as last dimension
+    """
+    n_lat = dat.shape[-2]
+    cum_sums = np.zeros(dat.shape[:-2] + (n_lat + 1, ))
+    cum_sums[..., 1:] = np.cumsum(np.sum(dat, axis=-1), axis=-1)
+    lat_index = np.arange(n_lat)
+    istart = np.clip(lat_index - window_size, 0, n_lat)
+    iend = np.clip(lat_index + window_size + 1, 0, n_lat)
+    return cum_sums[..., iend] - cum_sums[..., istart]
+
+
+def _get_window_ranks(dat, valid, window_size):
+    """
+    Rank the data within all sliding latitude windows.
+
+    Invalid data points are ranked last and set to nan afterwards, ties are
+    assigned the average of their ranks (as in scipy.stats.spearmanr).
+
+    Argument:
+    --------
+        dat - data with latitude and longitude as last two dimensions
+        valid - boolean mask of the valid data points
+        window_size - half size of the sliding window (number of latitudes)
+
+    Return:
+    ------
+        ranks with latitude as second-to-last and all points of the window as
+        last dimension
+    """
+    n_lat = dat.shape[-2]
+    pad_width = [(0, 0)] * (dat.ndim - 2) + [(window_size, window_size),
+                                             (0, 0)]
+    dat = np.pad(np.where(valid, dat, np.inf), pad_width,
+                 constant_values=np.inf)
+    rows = (np.arange(n_lat)[:, np.newaxis] +
+            np.arange(2 * window_size + 1)[np.newaxis, :])
+    windows = dat[..., rows, :].reshape(dat.shape[:-2] + (n_lat, -1))
+    ranks = stats.rankdata(windows, axis=-1)
+    ranks[np.isinf(windows)] = np.nan
+    return ranks
+
+
+def _get_correlations(dat_x, dat_y, dat_z, valid, sum_func):
+    """
+    Calculate the pairwise pearson correlations of three variables.
+
+    Argument:
+    --------
+        dat_x, dat_y, dat_z - data of the three variables
+        valid - boolean mask of the common valid data points
+        sum_func - function that sums the data of every sample
+
+    Return:
+    ------
+        number of valid points and the correlations r12, r13 and r23
+    """
+    num_valid_points = sum_func(valid.astype(float))
+    dats = [np.where(valid, dat, 0.0) for dat in (dat_x, dat_y, dat_z)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = [sum_func(dat) / num_valid_points for dat in dats]
+        covs = {}
+        for (idx_1, idx_2) in ((0, 0), (1, 1), (2, 2), (0, 1), (0, 2),
+                               (1, 2)):
+            covs[(idx_1, idx_2)] = (
+                sum_func(dats[idx_1] * dats[idx_2]) / num_valid_points -
+                means[idx_1] * means[idx_2])
+        corrs = []
+        for (idx_1, idx_2) in ((0, 1), (0, 2), (1, 2)):
+            corr = covs[(idx_1, idx_2)] / np.sqrt(covs[(idx_1, idx_1)] *
+                                                  covs[(idx_2, idx_2)])
+            corrs.append(np.clip(corr, -1.0, 1.0))
+    return (num_valid_points, *corrs)
+
+
+def partial_corr(r12, r13, r23):
     """
     Calculate the linear partial correlation.
 
-    The correlation between variables in the first and second column of
-    dat_columns is controlled for the covariation with that in the third
-    column.
+    The correlation between variables 1 and 2 is controlled for the
+    covariation with variable 3.
 
     Argument:
     --------
-        dat_columns - an array with different variables in different columns
-        fig_config - configuration with correlation_method. Uses the scipy
-        stats module to calculate correlation using either pearsons linear
-        (http://tiny.cc/pearsonr) or spearmans rank (http://tiny.cc/spearmanr)
-        correlation coefficients.
+        r12, r13, r23 - pairwise correlations between the three variables
+        (arrays of arbitrary shape)
 
     Return:
     ------
         r123 - correlation between variables 1 and 2 controlled for 3
     """
-    dat_x = dat_columns[:, 0]
-    dat_y = dat_columns[:, 1]
-    dat_z = dat_columns[:, 2]
-    if fig_config['correlation_method'] == 'pearson':
-        r12 = stats.pearsonr(dat_x, dat_y)[0]
-        r13 = stats.pearsonr(dat_x, dat_z)[0]
-        r23 = stats.pearsonr(dat_y, dat_z)[0]
-    elif fig_config['correlation_method'] == 'spearman':
-        r12 = stats.spearmanr(dat_x, dat_y)[0]
-        r13 = stats.spearmanr(dat_x, dat_z)[0]
-        r23 = stats.spearmanr(dat_y, dat_z)[0]
-    else:
-        sys.exit('set a valid correlation_method [pearson/spearman]')
     # calculate the partial correlation coefficient as,
     # rxy,z = (rxy - rxz * ryz) / sqrt((1 - rxz^2) * (1 - ryz^2))
     # https://en.wikipedia.org/wiki/Partial_correlation
-    r123 = (r12 - r13 * r23) / np.sqrt((1 - r13**2) * (1 - r23**2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r123 = (r12 - r13 * r23) / np.sqrt((1 - r13**2) * (1 - r23**2))
     return r123
 
 
@@ -106,6 +178,11 @@ def _calc_zonal_correlation(dat_tau, dat_pr, dat_tas, dat_lats, fig_config):
     """
     Calculate zonal partial correlations for sliding windows.
 
+    The correlations of all windows (and all leading dimensions, e.g. stacked
+    models on the same grid) are calculated at once. The correlation_method
+    in fig_config is either pearsons linear (http://tiny.cc/pearsonr) or
+    spearmans rank (http://tiny.cc/spearmanr) correlation.
+
     Argument:
     --------
         dat_tau - data of global tau
@@ -116,33 +193,49 @@ def _calc_zonal_correlation(dat_tau, dat_pr, dat_tas, dat_lats, fig_config):
 
     Return:
     ------
-        corr_dat zonal correlations
+        corr_dat zonal correlations (last dimension: partial correlation of
+        tau and tas controlled for pr, partial correlation of tau and pr
+        controlled for tas)
     """
     # get the interval of latitude and create array for partial correlation
     lat_int = abs(dat_lats[1] - dat_lats[0])
-    corr_dat = np.ones((np.shape(dat_tau)[0], 2)) * np.nan
+    corr_dat = np.ones(np.shape(dat_tau)[:-1] + (2, )) * np.nan
 
     # get the size of the sliding window based on the bandsize in degrees
-    window_size = round(fig_config['bandsize'] / (lat_int * 2.))
+    window_size = int(round(fig_config['bandsize'] / (lat_int * 2.)))
+
+    # common mask of all variables
+    valid = np.isfinite(dat_tau) & np.isfinite(dat_pr) & np.isfinite(dat_tas)
+
+    if fig_config['correlation_method'] == 'pearson':
+        # subtract the means to avoid cancellation in the window sums
+        dats = []
+        for dat in (dat_tau, dat_pr, dat_tas):
+            dat = np.where(valid, dat, 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = (np.sum(dat, axis=(-2, -1), keepdims=True) /
+                        np.sum(valid, axis=(-2, -1), keepdims=True))
+            dats.append(dat - mean)
+        (num_valid_points, r12, r13, r23) = _get_correlations(
+            *dats, valid, lambda dat: _get_window_sums(dat, window_size))
+    elif fig_config['correlation_method'] == 'spearman':
+        ranks = [
+            _get_window_ranks(dat, valid, window_size)
+            for dat in (dat_tau, dat_pr, dat_tas)
+        ]
+        (num_valid_points, r12, r13, r23) = _get_correlations(
+            *ranks, ~np.isnan(ranks[0]),
+            lambda dat: np.sum(dat, axis=-1))
+    else:
+        sys.exit('set a valid correlation_method [pearson/spearman]')
 
-    dat_tau, dat_pr, dat_tas = _apply_common_mask(dat_tau, dat_pr, dat_tas)
     # minimum 1/8 of the given window has valid data points
-    min_points = np.shape(dat_tau)[1] * fig_config['min_points_frac']
-    for lat_index in range(len(corr_dat)):
-        istart = np.int(max(0, lat_index - window_size))
-        iend = np.int(min(np.size(dat_lats), lat_index + window_size + 1))
-        dat_tau_zone = dat_tau[istart:iend, :]
-        dat_pr_zone = dat_pr[istart:iend, :]
-        dat_tas_zone = dat_tas[istart:iend, :]
-        dat_x = np.ma.masked_invalid(dat_tau_zone).compressed().flatten()
-        dat_y = np.ma.masked_invalid(dat_pr_zone).compressed().flatten()
-        dat_z = np.ma.masked_invalid(dat_tas_zone).compressed().flatten()
-        num_valid_points = sum(~np.isnan(dat_x + dat_y + dat_z))
-        if num_valid_points > min_points:
-            corr_dat[lat_index, 1] = partial_corr(
-                np.vstack((dat_x, dat_y, dat_z)).T, fig_config)
-            corr_dat[lat_index, 0] = partial_corr(
-                np.vstack((dat_x, dat_z, dat_y)).T, fig_config)
+    min_points = np.shape(dat_tau)[-1] * fig_config['min_points_frac']
+    enough_points = num_valid_points > min_points
+    corr_dat[..., 1] = np.where(enough_points, partial_corr(r12, r13, r23),
+                                np.nan)
+    corr_dat[..., 0] = np.where(enough_points, partial_corr(r13, r12, r23),
+                                np.nan)
     return corr_dat
 
 
@@ -383,6 +476,7 @@ def main(diag_config):
                                      'dataset')
     fig_config = _get_fig_config(diag_config)
     zonal_correlation_mod = {}
+    grouped_model_data = {}
     for model_name, model_dataset in model_data_dict.items():
         zonal_correlation_mod[model_name] = {}
         mod_coords = {}
@@ -400,11 +494,19 @@ def main(diag_config):
         _tau_dat = _remove_invalid(tau_ctotal.data, fill_value=np.nan)
         _precip_dat = _remove_invalid(precip.data, fill_value=np.nan)
         _tas_dat = _remove_invalid(tas.data, fill_value=np.nan)
-        zon_corr = _calc_zonal_correlation(_tau_dat, _precip_dat, _tas_dat,
-                                           mod_coords['latitude'].points,
-                                           fig_config)
-        zonal_correlation_mod[model_name]['data'] = zon_corr
         zonal_correlation_mod[model_name]['latitude'] = mod_coords['latitude']
+
+        # group models on identical grids to process them at once
+        grid_key = (_tau_dat.shape, tuple(mod_coords['latitude'].points))
+        grouped_model_data.setdefault(grid_key, []).append(
+            (model_name, _tau_dat, _precip_dat, _tas_dat))
+
+    for (grid_key, grid_data) in grouped_model_data.items():
+        (model_names, *all_dat) = zip(*grid_data)
+        zon_corr = _calc_zonal_correlation(*[np.stack(dat) for dat in all_dat],
+                                           np.array(grid_key[1]), fig_config)
+        for (model_name, model_zon_corr) in zip(model_names, zon_corr):
+            zonal_correlation_mod[model_name]['data'] = model_zon_corr
     zonal_correlation_obs = _get_obs_data_zonal(diag_config)
 
     base_name = '{title}_{corr}_{source_label}_{grid_label}z'.format(
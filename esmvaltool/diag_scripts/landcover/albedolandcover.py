@@ -31,7 +31,7 @@ import iris
 import matplotlib.pyplot as plt
 import numpy as np
 # specific imports for this diagnostic
-from sklearn import linear_model
+from scipy import ndimage
 
 from esmvaltool.diag_scripts.shared import (group_metadata,
                                             run_diagnostic,
@@ -41,6 +41,9 @@ from esmvaltool.diag_scripts.shared import (group_metadata,
 # This part sends debug statements to stdout
 logger = logging.getLogger(os.path.basename(__file__))
 
+# Relative cutoff for small singular values in the local regressions
+PINV_RCOND = 1.0e-10
+
 
 def _add_masks_albedolandcover(model_data, this_models_xxfracs, cfg):
 
@@ -106,87 +109,122 @@ def _add_masks_albedolandcover(model_data, this_models_xxfracs, cfg):
     return model_data
 
 
-def _reconstruct_albedo_pixel(x_0, y_0, lc_logical):
-    # Check that the system is not over_parameterised
-    alb_lc_pixel = np.zeros((3, ))
-    alb_lc_pixel[...] = np.nan
-
-    if len(y_0) > np.sum(lc_logical.astype(int)) + 1 and\
-            np.sum(lc_logical.astype(int)) > 0:
-        # Do multiple linear regression
-        linreg = linear_model.LinearRegression().fit(x_0, y_0)
-        intercept = linreg.intercept_
-        coefficients = linreg.coef_
-
-        # Now loop again and reconstruct albedo's
-        lc_reg = 0
-        for i_0 in range(3):
-            if lc_logical[i_0]:
-                alb_lc_pixel[i_0] = intercept\
-                    + coefficients[lc_reg] * 100.
-                lc_reg = lc_reg + 1
-    return alb_lc_pixel
-
-
-def _prepare_data_for_linreg(model_data, islice, jslice):
-    lc_logical = np.full((3, ), True)
-    lc_classes = [config['params']['lc1_class'],
-                  config['params']['lc2_class'],
-                  config['params']['lc3_class']]
+def _get_box_sum(data, box_shape):
+    """Sum ``data`` over the neighbourhood box of every grid cell.
+
+    The box of grid cell ``(i, j)`` covers the indices ``[i - n // 2, i - n
+    // 2 + n)`` along each of the first two dimensions (``n`` given by
+    ``box_shape``) and is truncated at the boundaries of the grid. All box
+    sums are calculated at once from a summed-area table, additional trailing
+    dimensions of ``data`` are summed independently.
+    """
+    table = np.zeros((data.shape[0] + 1, data.shape[1] + 1) + data.shape[2:])
+    table[1:, 1:] = data.cumsum(axis=0).cumsum(axis=1)
+    limits = []
+    for (dim_size, box_size) in zip(data.shape[:2], box_shape):
+        start = np.arange(dim_size) - box_size // 2
+        limits.append((np.clip(start, 0, dim_size),
+                       np.clip(start + box_size, 0, dim_size)))
+    ((i_0, i_1), (j_0, j_1)) = limits
+    return (table[np.ix_(i_1, j_1)] - table[np.ix_(i_0, j_1)] -
+            table[np.ix_(i_1, j_0)] + table[np.ix_(i_0, j_0)])
+
+
+def _get_lc_data(model_data, valid, cfg):
+    """Get summed area fractions of the land cover classes (last axis)."""
     lc_data = []
-    # Loop over lc_classes
-    for i_0 in range(3):
-        current_class = lc_classes[i_0]
-        # First flatten the array
-        lc_flattened = {}
-        for varkey in current_class:
-            lc_flattened[varkey] = model_data[varkey].data[
-                islice, jslice].compressed()
-        lc_sum = sum([lc_flattened[varkey]
-                      for varkey in current_class])
-        # Now check thresholds
-        if (np.var(lc_sum) > 0. and
-                len(lc_sum) >= config['params']['mingc']):
-            lc_data.append(lc_sum)
-            lc_logical[i_0] = True
-        else:
-            logger.info("Variance zero or not enough\
-                   valid data for this landcover class")
-            lc_logical[i_0] = False
-    # Now the multiple lin reg part
-    x_0 = np.stack(lc_data)
-    x_0 = x_0.swapaxes(0, 1)
-    # Same mask, so shape is fine
-    y_0 = model_data['alb'].data[islice, jslice].compressed()
-
-    return x_0, y_0, lc_logical
+    for lc_key in ('lc1_class', 'lc2_class', 'lc3_class'):
+        lc_sum = np.zeros(valid.shape)
+        for varkey in cfg['params'][lc_key]:
+            lc_sum += np.ma.getdata(model_data[varkey].data)
+        lc_data.append(np.where(valid, lc_sum, 0.0))
+    return np.stack(lc_data, axis=-1)
+
+
+def _get_valid_lc_classes(x_data, valid, n_points, cfg):
+    """Check which land cover classes can be used as predictors.
+
+    A class is used in a neighbourhood box if its area fraction is not
+    constant and if the box contains at least ``mingc`` valid grid cells.
+    """
+    box_size = tuple(cfg['params'][key] for key in ('lonsize_BB',
+                                                    'latsize_BB')) + (1, )
+    valid = valid[..., np.newaxis]
+    x_max = ndimage.maximum_filter(np.where(valid, x_data, -np.inf),
+                                   size=box_size, mode='constant',
+                                   cval=-np.inf)
+    x_min = ndimage.minimum_filter(np.where(valid, x_data, np.inf),
+                                   size=box_size, mode='constant',
+                                   cval=np.inf)
+    enough_points = n_points >= cfg['params']['mingc']
+    return (x_max > x_min) & enough_points[..., np.newaxis]
 
 
 def _get_reconstructed_albedos(model_data, cfg):
-    alb_lc = np.zeros((3, ) + model_data['alb'].shape)
-    alb_lc[...] = np.nan
-
-    # Now loop over these arrays and do the math
-    for (indices, maskbool) in np.ndenumerate(model_data['alb'].data.mask):
-        if not maskbool:  # Only if not masked we need to check neighbourhood
-            i, j = indices
-            # Create the neighbourhood as bbox
-            islice = slice(int(i - (cfg['params']['lonsize_BB'] - 1) / 2),
-                           int(i + (cfg['params']['lonsize_BB'] - 1) / 2 + 1))
-            jslice = slice(int(j - (cfg['params']['latsize_BB'] - 1) / 2),
-                           int(j + (cfg['params']['latsize_BB'] - 1) / 2 + 1))
-            bbox_mask = model_data['alb'].data.mask[islice, jslice]
-
-            # Check if there are enough valid data points
-            # in the neighbourhood bbox
-            if (np.sum((~bbox_mask).astype(int)) >
-                    cfg['params']['minnum_gc_bb']):
-                x_0, y_0, lc_logical = _prepare_data_for_linreg(model_data,
-                                                                islice,
-                                                                jslice)
-                alb_lc[:, i, j] = _reconstruct_albedo_pixel(x_0, y_0,
-                                                            lc_logical)
+    """Reconstruct albedos of the land cover classes with local regressions.
 
+    For every valid grid cell, the albedo is regressed on the area fractions
+    of the three land cover classes within the surrounding neighbourhood box
+    (multiple linear regression). The regressions of all grid cells are
+    solved simultaneously from their normal equations, whose terms are
+    calculated as box sums of the corresponding products.
+    """
+    params = cfg['params']
+    box_shape = (params['lonsize_BB'], params['latsize_BB'])
+    alb_lc = np.full((3, ) + model_data['alb'].shape, np.nan)
+
+    # All variables share the same mask (see _add_masks_albedolandcover)
+    valid = ~np.ma.getmaskarray(model_data['alb'].data)
+    if not valid.any():
+        return alb_lc
+    x_data = _get_lc_data(model_data, valid, cfg)
+    y_data = np.where(valid, np.ma.getdata(model_data['alb'].data), 0.0)
+
+    # Subtract global means to avoid cancellation in the covariances
+    x_shift = x_data[valid].mean(axis=0)
+    y_shift = y_data[valid].mean()
+    x_data = np.where(valid[..., np.newaxis], x_data - x_shift, 0.0)
+    y_data = np.where(valid, y_data - y_shift, 0.0)
+
+    # Box sums for all terms of the normal equations
+    n_points = _get_box_sum(valid.astype(float), box_shape)
+    x_sum = _get_box_sum(x_data, box_shape)
+    y_sum = _get_box_sum(y_data, box_shape)
+    xx_sum = _get_box_sum(
+        x_data[..., :, np.newaxis] * x_data[..., np.newaxis, :], box_shape)
+    xy_sum = _get_box_sum(x_data * y_data[..., np.newaxis], box_shape)
+
+    # Check which regressions are possible and not over-parameterised
+    lc_valid = _get_valid_lc_classes(x_data, valid, n_points, cfg)
+    n_lc = np.count_nonzero(lc_valid, axis=-1)
+    regression_mask = (valid & (n_points > params['minnum_gc_bb']) &
+                       (n_points > n_lc + 1) & (n_lc > 0))
+    logger.info("Performing local regressions for %i of %i valid grid cells",
+                np.count_nonzero(regression_mask), np.count_nonzero(valid))
+    if not regression_mask.any():
+        return alb_lc
+    n_points = n_points[regression_mask]
+    lc_valid = lc_valid[regression_mask]
+    x_mean = x_sum[regression_mask] / n_points[:, np.newaxis]
+    y_mean = y_sum[regression_mask] / n_points
+
+    # Covariances (rows and columns of unused classes are set to zero)
+    cov_xx = (xx_sum[regression_mask] / n_points[:, np.newaxis, np.newaxis] -
+              x_mean[:, :, np.newaxis] * x_mean[:, np.newaxis, :])
+    cov_xx *= lc_valid[:, :, np.newaxis] & lc_valid[:, np.newaxis, :]
+    cov_xy = (xy_sum[regression_mask] / n_points[:, np.newaxis] -
+              x_mean * y_mean[:, np.newaxis])
+    cov_xy *= lc_valid
+
+    # Solve normal equations (minimum norm solution for collinear data)
+    coefficients = np.einsum('...ij,...j->...i',
+                             np.linalg.pinv(cov_xx, rcond=PINV_RCOND), cov_xy)
+    intercept = (y_mean + y_shift -
+                 np.einsum('...i,...i->...', coefficients, x_mean + x_shift))
+
+    # Reconstruct albedos for 100% coverage of the individual classes
+    alb_lc_valid = intercept[:, np.newaxis] + coefficients * 100.0
+    alb_lc[:, regression_mask] = np.where(lc_valid, alb_lc_valid, np.nan).T
     return alb_lc
 
 
@@ -43,12 +43,14 @@ Author: Lee de Mora (PML)
 import logging
 import os
 import sys
-from itertools import product
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 
 import iris
 import iris.quickplot as qplt
 import cartopy
+import numpy as np
 
 from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
 from esmvaltool.diag_scripts.shared import run_diagnostic
@@ -234,6 +236,65 @@ def make_map_contour(
         plt.close()
 
 
+def get_contour_lines(cube, thresholds):
+    """
+    Compute the contour lines of all the thresholds in a single call.
+
+    The contours are computed on an off-screen axes, in longitude and
+    latitude, so that they can be drawn on the figure of each threshold.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        a two dimensional latitude-longitude cube.
+    thresholds: list
+        the sorted list of thresholds.
+
+    Returns
+    -------
+    list
+        For each threshold, a list of the (longitude, latitude) arrays of its
+        contour lines.
+    """
+    lon_coord = cube.coord('longitude')
+    lons = lon_coord.points
+    lats = cube.coord('latitude').points
+    data = cube.data
+    if lons.ndim == 1:
+        if cube.coord_dims('longitude')[0] < cube.coord_dims('latitude')[0]:
+            data = data.T
+        # Close the lines across the wrap-around, as is done by iris.plot.
+        if lon_coord.circular:
+            lons = np.append(lons, lons[0] + 360.)
+            data = np.ma.concatenate([data, data[:, :1]], axis=1)
+        lons, lats = np.meshgrid(lons, lats)
+
+    contours = Figure().add_subplot(111).contour(lons, lats, data, thresholds)
+    return [[line for line in lines if len(line)]
+            for lines in contours.allsegs]
+
+
+def make_contour_figure():
+    """
+    Make a map figure with coastlines and land, ready for contour lines.
+
+    Returns
+    -------
+    matplotlib.pyplot.figure
+        The new figure.
+    """
+    fig = plt.figure()
+    axes = plt.subplot(111, projection=cartopy.crs.PlateCarree())
+    try:
+        axes.coastlines()
+    except AttributeError:
+        logger.warning('Not able to add coastlines')
+    axes.add_feature(cartopy.feature.LAND,
+                     zorder=10,
+                     facecolor=[0.8, 0.8, 0.8])
+    return fig
+
+
 def multi_model_contours(
         cfg,
         metadata,
@@ -241,6 +302,11 @@ def multi_model_contours(
     """
     Make a contour map showing several models.
 
+    The layer of each model is only extracted once, and the contours of all
+    the thresholds are computed in a single call for each model and layer.
+    The lines are kept per threshold, and each figure is only drawn, saved
+    and closed in turn once all the models have been contoured.
+
     Parameters
     ----------
     cfg: dict
@@ -269,13 +335,13 @@ def multi_model_contours(
     thresholds = diagtools.load_thresholds(cfg, metadata)
 
     # Make a plot for each layer and each threshold
-    for layer, threshold in product(layers, thresholds):
+    for layer in layers:
 
         title = ''
         z_units = ''
         plot_details = {}
         cmap = plt.cm.get_cmap('jet')
-        land_drawn = False
+        threshold_lines = {threshold: [] for threshold in thresholds}
 
         # Plot each file in the group
         for index, filename in enumerate(sorted(metadata)):
@@ -300,12 +366,10 @@ def multi_model_contours(
                 linewidth = 1.4
 
             cube = model_cubes[filename][layer]
-            qplt.contour(cube,
-                         [threshold, ],
-                         colors=[color, ],
-                         linewidths=linewidth,
-                         linestyles=linestyle,
-                         rasterized=True)
+            contour_lines = get_contour_lines(cube, thresholds)
+            for threshold, lines in zip(thresholds, contour_lines):
+                threshold_lines[threshold].append(
+                    (lines, color, linewidth, linestyle))
             plot_details[filename] = {
                 'c': color,
                 'ls': linestyle,
@@ -313,51 +377,57 @@ def multi_model_contours(
                 'label': metadata[filename]['dataset']
             }
 
-            if not land_drawn:
-                try:
-                    plt.gca().coastlines()
-                except AttributeError:
-                    logger.warning('Not able to add coastlines')
-                plt.gca().add_feature(cartopy.feature.LAND,
-                                      zorder=10,
-                                      facecolor=[0.8, 0.8, 0.8])
-                land_drawn = True
-
             title = metadata[filename]['long_name']
             if layer != '':
                 z_units = model_cubes[filename][layer].coords('depth')[0].units
             units = str(model_cubes[filename][layer].units)
 
-        # Add title, threshold, legend to plots
-        title = ' '.join([title, str(threshold), units])
-        if layer:
-            title = ' '.join([title, '(', str(layer), str(z_units), ')'])
-        plt.title(title)
-        plt.legend(loc='best')
-
-        # Saving files:
-        if cfg['write_plots']:
-            path = diagtools.get_image_path(
-                cfg,
-                metadata[filename],
-                prefix='MultipleModels_',
-                suffix='_'.join(['_contour_map_',
-                                 str(threshold),
-                                 str(layer) + image_extention]),
-                metadata_id_list=[
-                    'field', 'short_name', 'preprocessor', 'diagnostic',
-                    'start_year', 'end_year'
-                ],
-            )
-
-        # Resize and add legend outside thew axes.
-        plt.gcf().set_size_inches(9., 6.)
-        diagtools.add_legend_outside_right(
-            plot_details, plt.gca(), column_width=0.15)
-
-        logger.info('Saving plots to %s', path)
-        plt.savefig(path)
-        plt.close()
+        for threshold in thresholds:
+            fig = make_contour_figure()
+            try:
+                for lines, color, linewidth, linestyle in threshold_lines[
+                        threshold]:
+                    plt.gca().add_collection(
+                        LineCollection(lines,
+                                       colors=[color, ],
+                                       linewidths=linewidth,
+                                       linestyles=linestyle,
+                                       transform=cartopy.crs.PlateCarree(),
+                                       rasterized=True))
+                plt.gca().autoscale_view()
+
+                # Add title, threshold, legend to plots
+                threshold_title = ' '.join([title, str(threshold), units])
+                if layer:
+                    threshold_title = ' '.join(
+                        [threshold_title, '(', str(layer), str(z_units), ')'])
+                plt.title(threshold_title)
+                plt.legend(loc='best')
+
+                # Saving files:
+                if cfg['write_plots']:
+                    path = diagtools.get_image_path(
+                        cfg,
+                        metadata[filename],
+                        prefix='MultipleModels_',
+                        suffix='_'.join(['_contour_map_',
+                                         str(threshold),
+                                         str(layer) + image_extention]),
+                        metadata_id_list=[
+                            'field', 'short_name', 'preprocessor',
+                            'diagnostic', 'start_year', 'end_year'
+                        ],
+                    )
+
+                # Resize and add legend outside thew axes.
+                plt.gcf().set_size_inches(9., 6.)
+                diagtools.add_legend_outside_right(
+                    plot_details, plt.gca(), column_width=0.15)
+
+                logger.info('Saving plots to %s', path)
+                plt.savefig(path)
+            finally:
+                plt.close(fig)
 
 
 def main(cfg):
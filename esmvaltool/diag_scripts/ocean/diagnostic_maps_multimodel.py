@@ -20,6 +20,10 @@ An approproate preprocessor for a 2D + time field would be::
         target_grid: 1x1
         scheme: linear
 
+With many models, the script option ``layer_first: true`` keeps the memory
+footprint to roughly one model: each panel only reads the plotted layer of
+its file and computes its bias against the observations when it is drawn.
+
 This tool is part of the ocean diagnostic tools package in the ESMValTool.
 
 Author: lovato_tomas
@@ -122,8 +126,9 @@ def make_subplots(cubes, layout, obsname, fig):
 
     Parameters
     ----------
-    cubes: dict
-        dictionary with data for plot defined in select_cubes
+    cubes: dict or iterable
+        dictionary with data for plot defined in select_cubes, or an
+        iterable of (name, data for plot) pairs, as given by iter_layer_cubes
     layout : list
         subplot rows x cols organization
     obsname: string
@@ -135,9 +140,11 @@ def make_subplots(cubes, layout, obsname, fig):
     gsc = gridspec.GridSpec(layout[0], layout[1])
     row = 0
     col = 0
-    for thename in cubes:
+    if isinstance(cubes, dict):
+        cubes = cubes.items()
+    for _, plot_cube in cubes:
         axs = plt.subplot(gsc[row, col], projection=proj)
-        add_map_plot(axs, cubes[thename], col)
+        add_map_plot(axs, plot_cube, col)
         # next row & column indexes
         row = row + 1
         if row == layout[0]:
@@ -280,6 +287,249 @@ def select_cubes(cubes, layer, obsname, metadata):
     return plot_cubes
 
 
+def load_layer_cube(filename, layer, metadata):
+    """
+    Lazily load a single layer of an input file.
+
+    Parameters
+    ----------
+    filename: str
+        the preprocessed input file.
+    layer: str or float
+        Data level to be loaded
+    metadata: dict
+        the input files dictionary
+
+    Returns
+    -------
+    iris.cube.Cube
+        The layer cube, or None if the file has no such layer.
+    """
+    cube = iris.load_cube(filename)
+    cube = diagtools.make_cube_layer_dict(cube).get(layer)
+    if cube is None:
+        return None
+    return diagtools.bgc_units(cube, metadata[filename]['short_name'])
+
+
+def get_layer_ranges(filenames, layer, obs_filename, metadata):
+    """
+    Determine the data and bias ranges of a layer, one model at a time.
+
+    Parameters
+    ----------
+    filenames: list
+        input files listed in the recipe, without the observations
+    layer: str or float
+        Data level to be plotted
+    obs_filename: str
+        the preprocessed observations file.
+    metadata: dict
+        the input files dictionary
+
+    Returns
+    -------
+    dict
+        The observations layer ('obs', None if not available), the data
+        range of the models, or of the observations if available ('maps'),
+        and the range of the model minus observations ('diff', None without
+        observations). None if no model has data for the layer.
+    """
+    # The observations are realised once and kept for all the panels.
+    obs_cube = None
+    if obs_filename:
+        obs_cube = load_layer_cube(obs_filename, layer, metadata)
+
+    mins = []
+    maxs = []
+    for thename in filenames:
+        cube = load_layer_cube(thename, layer, metadata)
+        if cube is None:
+            continue
+        if obs_cube is not None:
+            cube = cube - obs_cube
+        mins.append(cube.data.min())
+        maxs.append(cube.data.max())
+    if not mins:
+        return None
+    if obs_cube is None:
+        return {'obs': None, 'maps': [np.min(mins), np.max(maxs)],
+                'diff': None}
+    return {'obs': obs_cube, 'maps': diagtools.get_cube_range([obs_cube]),
+            'diff': [np.min(mins), np.max(maxs)]}
+
+
+def iter_layer_cubes(filenames, layer, obs_filename, metadata, layer_ranges):
+    """
+    Yield the data to plot for each panel of a layer, one model at a time.
+
+    This is the layer-first equivalent of select_cubes: only the selected
+    layer of each file is read, and the bias against the observations is
+    computed when the panel is drawn, so that at most one model is held in
+    memory besides the observations.
+
+    Parameters
+    ----------
+    filenames: list
+        input files listed in the recipe, without the observations
+    layer: str or float
+        Data level to be plotted
+    obs_filename: str
+        the preprocessed observations file.
+    metadata: dict
+        the input files dictionary
+    layer_ranges: dict
+        the observations layer and the data ranges, as given by
+        get_layer_ranges
+
+    Yields
+    ------
+    str
+        The dataset name
+    dict
+        The data for plot, as defined in select_cubes
+    """
+    first_metadata = metadata[(obs_filename or filenames[0])]
+    obs_cube = layer_ranges['obs']
+    mrange = layer_ranges['maps']
+    drange = layer_ranges['diff']
+    if 'maps_range' in first_metadata:
+        mrange = first_metadata['maps_range']
+    if 'diff_range' in first_metadata:
+        drange = first_metadata['diff_range']
+    model_extend = 'neither'
+    if 'maps_range' in first_metadata:
+        model_extend = 'both'
+    if obs_cube is not None and 'diff_range' in first_metadata:
+        model_extend = 'both'
+
+    if obs_cube is not None:
+        thename = metadata[obs_filename]['dataset']
+        yield thename, {
+            'cube': obs_cube,
+            'title': '{} ({}) [{}]'.format(thename, obs_cube.var_name,
+                                           obs_cube.units),
+            'cmap': 'viridis',
+            'range': mrange,
+            'extend': 'both' if 'maps_range' in first_metadata else 'neither',
+            'hascbar': True
+        }
+
+    # Each panel is held back until the next one is found, so that the
+    # colorbar goes to the last panel actually drawn.
+    previous = None
+    for filename in filenames:
+        cube = load_layer_cube(filename, layer, metadata)
+        if cube is None:
+            continue
+        thename = metadata[filename]['dataset']
+        plot_cube = {
+            'cube': cube,
+            'title': thename,
+            'cmap': 'viridis',
+            'range': mrange,
+            'extend': model_extend,
+            'hascbar': False
+        }
+        if obs_cube is not None:
+            plot_cube['cube'] = cube - obs_cube
+            plot_cube['cmap'] = 'RdBu_r'
+            plot_cube['range'] = drange
+        elif previous is None:
+            plot_cube['title'] = '{} ({}) [{}]'.format(
+                thename, cube.var_name, cube.units)
+        if previous is not None:
+            yield previous
+        previous = (thename, plot_cube)
+    if previous is not None:
+        previous[1]['hascbar'] = True
+        yield previous
+
+
+def make_layer_first_plots(cfg, metadata, obs_filename):
+    """
+    Produce the multiple panel comparison maps reading one layer at a time.
+
+    The panels are the same as in make_multiple_plots, but the input files
+    are only read one layer and one model at a time.
+
+    Parameters
+    ----------
+    cfg: dict
+        the opened global config dictionary, passed by ESMValTool.
+    metadata: dict
+        the input files dictionary
+    obs_filename: str
+        the preprocessed observations file.
+    """
+    logger.debug('make_layer_first_plots')
+    filenames = list(metadata.keys())
+    varname = metadata[filenames[0]]['short_name']
+    layout = metadata[filenames[0]]['layout_rowcol']
+
+    obsname = ''
+    if obs_filename:
+        obsname = metadata[obs_filename]['dataset']
+        filenames.remove(obs_filename)
+        filenames.insert(0, obs_filename)
+        layout[0] = layout[0] + 1
+    else:
+        logger.info('Observations not provided. Plot each model data.')
+
+    if len(filenames) > (layout[0] * layout[1]):
+        raise ValueError(
+            'Number of inputfiles is larger than layout scheme (rows x cols). '
+            'Revise layout_rowcol size in recipe.')
+
+    # Only the layer names are read here, the data stays on disk.
+    layers = {}
+    for thename in filenames:
+        for layer in diagtools.make_cube_layer_dict(iris.load_cube(thename)):
+            layers[layer] = True
+
+    model_filenames = [name for name in filenames if name != obs_filename]
+    for layer in layers:
+        # The ranges are needed for the first panel, so the models are read
+        # once here and once more when drawn, one at a time.
+        layer_ranges = get_layer_ranges(model_filenames, layer, obs_filename,
+                                        metadata)
+        if layer_ranges is None:
+            logger.info('No model data for layer %s, skipping it', layer)
+            continue
+
+        fig = plt.figure()
+        fig.set_size_inches(layout[1] * 4., layout[0] * 2. + 2.)
+
+        make_subplots(
+            iter_layer_cubes(model_filenames, layer, obs_filename, metadata,
+                             layer_ranges),
+            layout, obsname, fig)
+
+        # Determine image filename:
+        if obsname != '':
+            plot_file = ['multimodel_vs', obsname, varname, str(layer), 'maps']
+        else:
+            plot_file = ['multimodel', varname, str(layer), 'maps']
+        plot_file = '_'.join(plot_file)
+        path = diagtools.folder(cfg['plot_dir']) + plot_file
+
+        # Saving file:
+        if cfg['write_plots']:
+            logger.info('Saving plots to %s', path)
+            plt.savefig(path, dpi=200)
+
+        # Provenance
+        provenance_record = get_provenance_record(plot_file,
+                                                  metadata[filenames[-1]],
+                                                  obsname, filenames)
+        logger.info("Recording provenance of %s:\n%s", plot_file,
+                    pformat(provenance_record))
+        with ProvenanceLogger(cfg) as provenance_logger:
+            provenance_logger.log(plot_file, provenance_record)
+
+        plt.close()
+
+
 def make_multiple_plots(cfg, metadata, obsname):
     """
     Produce multiple panel comparison maps of model(s) and data (if provided).
@@ -392,7 +642,10 @@ def main(cfg):
             if not os.path.isfile(obs_filename):
                 logger.info('OBS file not found %s', obs_filename)
 
-        make_multiple_plots(cfg, metadatas, obs_filename)
+        if cfg.get('layer_first', False):
+            make_layer_first_plots(cfg, metadatas, obs_filename)
+        else:
+            make_multiple_plots(cfg, metadatas, obs_filename)
 
     logger.info('Success')
 
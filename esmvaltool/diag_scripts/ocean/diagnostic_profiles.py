@@ -26,6 +26,11 @@ An approproate preprocessor for a 3D+time field would be::
         operator: mean
 
 
+By default, all the profiles are drawn in a single call from a precomputed
+array of the annual (or decadal) means. The older behaviour, where each
+profile is sliced from the cube and plotted separately, can be restored with
+the argument ``batch_profiles: false`` in the diagnostic script.
+
 In order to add an observational dataset to the profile plot, the following
 arguments are needed in the diagnostic script::
 
@@ -55,6 +60,8 @@ import iris.coord_categorisation
 import iris.exceptions
 import iris.quickplot as qplt
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.colors import Normalize
 
 from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
 from esmvaltool.diag_scripts.shared import run_diagnostic
@@ -93,6 +100,94 @@ def determine_profiles_str(cube):
     return ''
 
 
+def get_profiles_array(cube):
+    """
+    Extract the profiles of a time-depth cube as plain arrays.
+
+    The cube data is realised once, so that the profiles can be drawn
+    without slicing the cube for every time step.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        the aggregated dataset as a cube, with time as first dimension.
+
+    Returns
+    -------
+    numpy.array
+        The depth coordinate points.
+    numpy.ma.MaskedArray
+        The profiles, with shape (time, depth).
+    """
+    depths = cube.coord('depth').points
+    profiles = np.ma.masked_invalid(cube.data)
+    return depths, profiles
+
+
+def plot_profiles_collection(axis, times_float, depths, profiles, cmap):
+    """
+    Draw all the profiles at once with a single LineCollection.
+
+    The colour of each profile is taken from a colour normaliser shared by
+    all the time steps.
+
+    Parameters
+    ----------
+    axis: matplotlib.pyplot.axes
+        The axes to draw the profiles on.
+    times_float: numpy.array
+        The times in decimal years.
+    depths: numpy.array
+        The depth coordinate points.
+    profiles: numpy.ma.MaskedArray
+        The profiles, with shape (time, depth).
+    cmap: matplotlib.colors.Colormap
+        The colour map.
+
+    Returns
+    -------
+    list
+        The colour of each profile.
+    """
+    if times_float[-1] == times_float[0]:
+        colors = ['black' for time in times_float]
+    else:
+        norm = Normalize(vmin=times_float[0], vmax=times_float[-1])
+        colors = [tuple(color) for color in cmap(norm(times_float))]
+
+    segments = [np.ma.column_stack([profile, depths]) for profile in profiles]
+    axis.add_collection(LineCollection(segments, colors=colors,
+                                       linewidths=1))
+    axis.autoscale_view()
+    return colors
+
+
+def label_profiles_axes(axis, cube):
+    """
+    Add the axis labels, as done by iris.quickplot for a single profile.
+
+    The y-axis is inverted if the depth coordinate is positive down.
+
+    Parameters
+    ----------
+    axis: matplotlib.pyplot.axes
+        The axes with the profiles.
+    cube: iris.cube.Cube
+        the aggregated dataset as a cube.
+    """
+    depth_coord = cube.coord('depth')
+    labels = []
+    for cube_or_coord in [cube, depth_coord]:
+        labels.append('{} / {}'.format(
+            cube_or_coord.name().replace('_', ' ').capitalize(),
+            cube_or_coord.units))
+    axis.set_xlabel(labels[0])
+    axis.set_ylabel(labels[1])
+    if depth_coord.attributes.get('positive', '').lower() == 'down':
+        if not axis.yaxis_inverted():
+            axis.invert_yaxis()
+
+
 def make_profiles_plots(
         cfg,
         metadata,
@@ -144,18 +239,28 @@ def make_profiles_plots(
 
     cmap = plt.cm.get_cmap('jet')
 
-    plot_details = {}
-    for time_index, time in enumerate(times_float):
-        if times_float[-1] == time_0:
-            color = 'black'
-        else:
-            color = cmap((time - time_0) / (times_float[-1] - time_0))
+    if cfg.get('batch_profiles', True):
+        depths, profiles = get_profiles_array(cube)
+        colors = plot_profiles_collection(plt.gca(), np.array(times_float),
+                                          depths, profiles, cmap)
+        label_profiles_axes(plt.gca(), cube)
+    else:
+        colors = []
+        for time_index, time in enumerate(times_float):
+            if times_float[-1] == time_0:
+                color = 'black'
+            else:
+                color = cmap((time - time_0) / (times_float[-1] - time_0))
 
-        qplt.plot(cube[time_index, :], cube[time_index, :].coord('depth'),
-                  c=color)
+            qplt.plot(cube[time_index, :],
+                      cube[time_index, :].coord('depth'),
+                      c=color)
+            colors.append(color)
 
-        plot_details[str(time_index)] = {'c': color, 'ls': '-', 'lw': 1,
-                                         'label': str(int(time))}
+    plot_details = {}
+    for time_index, time in enumerate(times_float):
+        plot_details[str(time_index)] = {'c': colors[time_index], 'ls': '-',
+                                         'lw': 1, 'label': str(int(time))}
 
     # Add observational data.
     if obs_filename:
@@ -67,8 +67,8 @@ import sys
 from itertools import product
 
 import cartopy
+import dask.array as da
 import iris
-import iris.coord_categorisation
 import iris.quickplot as qplt
 import matplotlib
 import matplotlib.pyplot as plt
@@ -134,27 +134,21 @@ def calculate_area_time_series(cube, plot_type, threshold):
         An numpy array containing the total ice extent or total ice area.
 
     """
-    data = []
     times = diagtools.cube_time_to_float(cube)
-    for time_itr, time in enumerate(times):
-        icedata = cube[time_itr].data
-
-        area = iris.analysis.cartography.area_weights(cube[time_itr])
-        if plot_type.lower() == 'ice extent':
-            # Ice extend is the area with more than 15% ice cover.
-            icedata = np.ma.masked_where(icedata < threshold, icedata)
-            total_area = np.ma.masked_where(icedata.mask, area.data).sum()
-        if plot_type.lower() == 'ice area':
-            # Ice area is cover * cell area
-            total_area = np.sum(icedata * area)
-
-        logger.debug('Calculating time series area: %s, %s, %s,', time_itr,
-                     time, total_area)
-        data.append(total_area)
-
-    ######
-    # Create a small dummy output array
-    data = np.array(data)
+    icedata = cube.data
+    area = iris.analysis.cartography.area_weights(cube[0])
+    area = np.broadcast_to(area, icedata.shape)
+    other_axes = tuple(range(1, icedata.ndim))
+
+    if plot_type.lower() == 'ice extent':
+        # Ice extend is the area with more than 15% ice cover.
+        icedata = np.ma.masked_where(icedata < threshold, icedata)
+        data = np.ma.masked_where(icedata.mask, area).sum(axis=other_axes)
+    if plot_type.lower() == 'ice area':
+        # Ice area is cover * cell area
+        data = np.sum(icedata * area, axis=other_axes)
+
+    logger.debug('Calculated time series area: %s', data)
     return times, data
 
 
@@ -162,6 +156,7 @@ def make_ts_plots(
         cfg,
         metadata,
         filename,
+        cube=None,
 ):
     """
     Make a ice extent and ice area time series plot for an individual model.
@@ -174,13 +169,14 @@ def make_ts_plots(
         The metadata dictionairy for a specific model.
     filename: str
         The preprocessed model file.
+    cube: iris.cube.Cube
+        The seasonal means of the model file, as returned by
+        load_seasonal_cube. The file is loaded if not provided.
 
     """
     # Load cube and set up units
-    cube = iris.load_cube(filename)
-    iris.coord_categorisation.add_year(cube, 'time')
-    cube = diagtools.bgc_units(cube, metadata['short_name'])
-    cube = agregate_by_season(cube)
+    if cube is None:
+        cube = load_seasonal_cube(metadata, filename)
 
     # Is this data is a multi-model dataset?
     multi_model = metadata['dataset'].find('MultiModel') > -1
@@ -397,6 +393,7 @@ def make_map_plots(
         cfg,
         metadata,
         filename,
+        cube=None,
 ):
     """
     Make a simple map plot for an individual model.
@@ -409,13 +406,14 @@ def make_map_plots(
         The metadata dictionairy for a specific model.
     filename: str
         The preprocessed model file.
+    cube: iris.cube.Cube
+        The seasonal means of the model file, as returned by
+        load_seasonal_cube. The file is loaded if not provided.
 
     """
     # Load cube and set up units
-    cube = iris.load_cube(filename)
-    iris.coord_categorisation.add_year(cube, 'time')
-    cube = diagtools.bgc_units(cube, metadata['short_name'])
-    cube = agregate_by_season(cube)
+    if cube is None:
+        cube = load_seasonal_cube(metadata, filename)
 
     # Is this data is a multi-model dataset?
     multi_model = metadata['dataset'].find('MultiModel') > -1
@@ -481,6 +479,53 @@ def make_map_plots(
             plt.close()
 
 
+def get_season_groups(cube):
+    """
+    Determine the seasonal categories and groups of the time axis.
+
+    The dates are derived only once from the numeric time points. The groups
+    are numbered in the order of their first appearance, as is done by
+    iris' aggregated_by.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        Data Cube
+
+    Returns
+    ----------
+    dict:
+        The clim_season, season_year and year of each time point, the group
+        index of each time point and the index of the first time point of
+        each group.
+
+    """
+    time_coord = cube.coord('time')
+    dates = time_coord.units.num2date(time_coord.points)
+    years = np.array([date.year for date in dates])
+    months = np.array([date.month for date in dates])
+
+    # December belongs to the winter of the following year.
+    season_index = (months % 12) // 3
+    season_years = years + (months == 12)
+
+    _, first_index, group_index = np.unique(
+        season_years * 4 + season_index,
+        return_index=True,
+        return_inverse=True,
+    )
+    order = np.argsort(first_index)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return {
+        'clim_season': np.array(['djf', 'mam', 'jja', 'son'])[season_index],
+        'season_year': season_years,
+        'year': years,
+        'group_index': rank[np.ravel(group_index)],
+        'first_index': first_index[order],
+    }
+
+
 def agregate_by_season(cube):
     """
     Aggregate the cube into seasonal means.
@@ -488,6 +533,11 @@ def agregate_by_season(cube):
     Note that it is not currently possible to do this in the preprocessor,
     as the seasonal mean changes the cube units.
 
+    The means are computed lazily, so only the seasons which are actually
+    plotted are read from disk. As with iris' aggregated_by, the other
+    coordinates along the time axis are replaced by the mid-point of their
+    range over each season.
+
     Parameters
     ----------
     cube: iris.cube.Cube
@@ -499,19 +549,80 @@ def agregate_by_season(cube):
         Data Cube with the seasonal means
 
     """
-    if not cube.coords('clim_season'):
-        iris.coord_categorisation.add_season(cube, 'time', name='clim_season')
-    if not cube.coords('season_year'):
-        iris.coord_categorisation.add_season_year(
-            cube, 'time', name='season_year')
-    return cube.aggregated_by(['clim_season', 'season_year'],
-                              iris.analysis.MEAN)
+    groups = get_season_groups(cube)
+    time_dim = cube.coord_dims('time')[0]
+    for name, units in [('clim_season', 'no_unit'), ('season_year', '1'),
+                        ('year', '1')]:
+        if not cube.coords(name):
+            cube.add_aux_coord(
+                iris.coords.AuxCoord(groups[name], long_name=name,
+                                     units=units), time_dim)
+
+    def _time_slice(indices):
+        """Return the index of the time points along the time axis."""
+        slices = [slice(None) for index in cube.shape]
+        slices[time_dim] = indices
+        return tuple(slices)
+
+    group_index = groups['group_index']
+    n_groups = len(groups['first_index'])
+    data = cube.lazy_data()
+    means = [
+        da.mean(data[_time_slice(np.flatnonzero(group_index == group))],
+                axis=time_dim) for group in range(n_groups)
+    ]
+    seasonal = cube[_time_slice(groups['first_index'])]
+    seasonal = seasonal.copy(data=da.stack(means, axis=time_dim))
+
+    for coord in cube.coords(dimensions=time_dim):
+        if coord.name() in ['clim_season', 'season_year']:
+            continue
+        if coord.dtype.kind not in 'iuf':
+            continue
+        if coord.has_bounds():
+            bounds = coord.bounds
+        else:
+            bounds = np.column_stack([coord.points, coord.points])
+        lower = np.full(n_groups, np.inf)
+        upper = np.full(n_groups, -np.inf)
+        np.minimum.at(lower, group_index, bounds.min(axis=1))
+        np.maximum.at(upper, group_index, bounds.max(axis=1))
+        seasonal.replace_coord(seasonal.coord(coord).copy(
+            points=(lower + upper) / 2.,
+            bounds=np.column_stack([lower, upper]),
+        ))
+    return seasonal
+
+
+def load_seasonal_cube(metadata, filename):
+    """
+    Load a model file and aggregate it lazily into seasonal means.
+
+    The result is meant to be shared by all the plots of a model file.
+
+    Parameters
+    ----------
+    metadata: dict
+        The metadata dictionairy for a specific model.
+    filename: str
+        The preprocessed model file.
+
+    Returns
+    ----------
+    iris.cube.Cube:
+        Data Cube with the seasonal means
+
+    """
+    cube = iris.load_cube(filename)
+    cube = diagtools.bgc_units(cube, metadata['short_name'])
+    return agregate_by_season(cube)
 
 
 def make_map_extent_plots(
         cfg,
         metadata,
         filename,
+        cube=None,
 ):
     """
     Make an extent map plot showing several times for an individual model.
@@ -524,13 +635,14 @@ def make_map_extent_plots(
         The metadata dictionairy for a specific model.
     filename: str
         The preprocessed model file.
+    cube: iris.cube.Cube
+        The seasonal means of the model file, as returned by
+        load_seasonal_cube. The file is loaded if not provided.
 
     """
     # Load cube and set up units
-    cube = iris.load_cube(filename)
-    iris.coord_categorisation.add_year(cube, 'time')
-    cube = diagtools.bgc_units(cube, metadata['short_name'])
-    cube = agregate_by_season(cube)
+    if cube is None:
+        cube = load_seasonal_cube(metadata, filename)
 
     # Is this data is a multi-model dataset?
     multi_model = metadata['dataset'].find('MultiModel') > -1
@@ -576,13 +688,14 @@ def make_map_extent_plots(
         except AttributeError:
             logger.warning('make_polar_map: Not able to add coastlines')
 
-        times = np.array(cube.coord('time').points.astype(float))
+        times = np.array(cube_layer.coord('time').points.astype(float))
+        years = cube_layer.coord('year').points
         plot_desc = {}
         for time_itr, time in enumerate(times):
             cube = cube_layer[time_itr]
             line_width = 1
             color = plt.cm.jet(float(time_itr) / float(len(times)))
-            label = get_year(cube)
+            label = str(int(years[time_itr]))
             plot_desc[time] = {'label': label,
                                'c': [color, ],
                                'lw': [line_width, ],
@@ -685,17 +798,21 @@ def main(cfg):
                 'model filenames:\t%s',
                 filename,
             )
+            # Seasonal means, shared by all the plots of this model
+            cube = load_seasonal_cube(metadatas[filename], filename)
+
             ######
             # extent maps plots of individual models
-            make_map_extent_plots(cfg, metadatas[filename], filename)
+            make_map_extent_plots(cfg, metadatas[filename], filename,
+                                  cube=cube)
 
             ######
             # maps plots of individual models
-            make_map_plots(cfg, metadatas[filename], filename)
+            make_map_plots(cfg, metadatas[filename], filename, cube=cube)
 
             ######
             # time series plots o
-            make_ts_plots(cfg, metadatas[filename], filename)
+            make_ts_plots(cfg, metadatas[filename], filename, cube=cube)
 
     logger.info('Success')
 
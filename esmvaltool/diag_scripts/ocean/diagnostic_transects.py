@@ -129,13 +129,9 @@ def make_depth_safe(cube):
     if depth.attributes['positive'] != 'down':
         raise Exception('The depth field is not set up correctly')
 
-    depth_points = []
-    bad_points = depth.points <= 0.
-    for itr, point in enumerate(depth.points):
-        if bad_points[itr]:
-            depth_points.append(depth.bounds[itr, :].mean())
-        else:
-            depth_points.append(point)
+    depth_points = depth.points.copy()
+    bad_points = depth_points <= 0.
+    depth_points[bad_points] = depth.bounds[bad_points, :].mean(axis=1)
 
     cube.coord('depth').points = depth_points
     return cube
@@ -193,6 +189,43 @@ def make_cube_region_dict(cube):
     return cubes
 
 
+def load_transect_cubes(metadata, filename, model_cubes=None):
+    """
+    Load the transect of a model file as a dictionairy region: cube.
+
+    The cube is loaded lazily, converted to BGC units and given a safe depth
+    coordinate. When a model_cubes dictionairy is provided, the result is
+    stored in it, so that the file is only loaded once for all the plots.
+    The data of each region is then only read from disk when it is first
+    plotted.
+
+    Parameters
+    ----------
+    metadata: dict
+        The metadata dictionairy for a specific model.
+    filename: str
+        The preprocessed model file.
+    model_cubes: dict
+        A dictionairy of filename: region cubes, shared between the plots.
+
+    Returns
+    ---------
+    dict
+        A dictionairy of region name : region cube.
+    """
+    if model_cubes is not None and filename in model_cubes:
+        return model_cubes[filename]
+
+    cube = iris.load_cube(filename)
+    cube = diagtools.bgc_units(cube, metadata['short_name'])
+    cube = make_depth_safe(cube)
+    cubes = make_cube_region_dict(cube)
+
+    if model_cubes is not None:
+        model_cubes[filename] = cubes
+    return cubes
+
+
 def determine_set_y_logscale(cfg, metadata):
     """
     Determine whether to use a log scale y axis.
@@ -224,6 +257,7 @@ def make_transects_plots(
         cfg,
         metadata,
         filename,
+        model_cubes=None,
 ):
     """
     Make a simple plot of the transect for an indivudual model.
@@ -240,18 +274,16 @@ def make_transects_plots(
         The metadata dictionairy for a specific model.
     filename: str
         The preprocessed model file.
+    model_cubes: dict
+        A dictionairy of filename: region cubes, shared between the plots.
 
     """
     # Load cube and set up units
-    cube = iris.load_cube(filename)
-    cube = diagtools.bgc_units(cube, metadata['short_name'])
+    cubes = load_transect_cubes(metadata, filename, model_cubes=model_cubes)
 
     # Is this data is a multi-model dataset?
     multi_model = metadata['dataset'].find('MultiModel') > -1
 
-    cube = make_depth_safe(cube)
-    cubes = make_cube_region_dict(cube)
-
     # Determine y log scale.
     set_y_logscale = determine_set_y_logscale(cfg, metadata)
 
@@ -295,15 +327,20 @@ def make_transects_plots(
         plt.close()
 
 
-def add_sea_floor(cube):
+def make_sea_floor_cube(cube):
     """
-    Add a simple sea floor line from the cube mask.
+    Make a cube of the sea floor from the cube mask.
 
     Parameters
     ----------
     cube: iris.cube.Cube
         Input cube to use to produce the sea floor.
 
+    Returns
+    ----------
+    iris.cube.Cube:
+        The sea floor cube.
+
     """
     land_cube = cube.copy()
     land_cube.data = np.ma.array(land_cube.data)
@@ -312,6 +349,23 @@ def add_sea_floor(cube):
         mask = np.zeros_like(land_cube.data)
     land_cube.data = np.ma.masked_where(mask == 0, mask)
     land_cube.data.mask = mask
+    return land_cube
+
+
+def add_sea_floor(cube, land_cube=None):
+    """
+    Add a simple sea floor line from the cube mask.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        Input cube to use to produce the sea floor.
+    land_cube: iris.cube.Cube
+        The precomputed sea floor cube, made from the cube if not provided.
+
+    """
+    if land_cube is None:
+        land_cube = make_sea_floor_cube(cube)
     qplt.contour(land_cube, 2, cmap='Greys_r', rasterized=True)
 
 
@@ -319,6 +373,7 @@ def make_transect_contours(
         cfg,
         metadata,
         filename,
+        model_cubes=None,
 ):
     """
     Make a contour plot of the transect for an indivudual model.
@@ -335,12 +390,12 @@ def make_transect_contours(
         The metadata dictionairy for a specific model.
     filename: str
         The preprocessed model file.
+    model_cubes: dict
+        A dictionairy of filename: region cubes, shared between the plots.
 
     """
     # Load cube and set up units
-    cube = iris.load_cube(filename)
-    cube = diagtools.bgc_units(cube, metadata['short_name'])
-    cube = make_depth_safe(cube)
+    cubes = load_transect_cubes(metadata, filename, model_cubes=model_cubes)
 
     # Load threshold/thresholds.
     plot_details = {}
@@ -349,7 +404,6 @@ def make_transect_contours(
     linewidths = [1 for thres in thresholds]
     linestyles = ['-' for thres in thresholds]
 
-    cubes = make_cube_region_dict(cube)
     for region, cube in cubes.items():
         for itr, thres in enumerate(thresholds):
             colour = diagtools.get_colour_from_cmap(itr, len(thresholds))
@@ -413,6 +467,7 @@ def make_transect_contours(
 def multi_model_contours(
         cfg,
         metadatas,
+        model_cubes=None,
 ):
     """
     Make a multi model comparison plot showing several transect contour plots.
@@ -427,22 +482,23 @@ def multi_model_contours(
         the opened global config dictionairy, passed by ESMValTool.
     metadatas: dict
         The metadatas dictionairy for a specific model.
+    model_cubes: dict
+        A dictionairy of filename: region cubes, shared between the plots.
 
     """
     ####
     # Load the data for each layer as a separate cube
-    model_cubes = {}
+    if model_cubes is None:
+        model_cubes = {}
+    sea_floors = {}
     regions = {}
     thresholds = {}
     set_y_logscale = True
 
     for filename in sorted(metadatas):
-        cube = iris.load_cube(filename)
-        cube = diagtools.bgc_units(cube, metadatas[filename]['short_name'])
-        cube = make_depth_safe(cube)
-        cubes = make_cube_region_dict(cube)
-        model_cubes[filename] = cubes
-        for region in model_cubes[filename]:
+        cubes = load_transect_cubes(metadatas[filename], filename,
+                                    model_cubes=model_cubes)
+        for region in cubes:
             regions[region] = True
 
         # Determine y log scale.
@@ -501,7 +557,12 @@ def multi_model_contours(
             title = metadatas[filename]['long_name']
             units = str(model_cubes[filename][region].units)
 
-            add_sea_floor(model_cubes[filename][region])
+            # The sea floor does not depend on the threshold.
+            if (filename, region) not in sea_floors:
+                sea_floors[(filename, region)] = make_sea_floor_cube(
+                    model_cubes[filename][region])
+            add_sea_floor(model_cubes[filename][region],
+                          land_cube=sea_floors[(filename, region)])
 
         # Add title, threshold, legend to plots
         title = ' '.join([
@@ -561,12 +622,16 @@ def main(cfg):
         thresholds = diagtools.load_thresholds(cfg,
                                                next(iter(metadatas.values())))
 
+        # Each model is only loaded once and shared between the plots.
+        model_cubes = {}
+
         #######
         # Multi model contour plots
         if thresholds:
             multi_model_contours(
                 cfg,
                 metadatas,
+                model_cubes=model_cubes,
             )
 
         for filename in sorted(metadatas):
@@ -579,12 +644,14 @@ def main(cfg):
 
             ######
             # Time series of individual model
-            make_transects_plots(cfg, metadatas[filename], filename)
+            make_transects_plots(cfg, metadatas[filename], filename,
+                                 model_cubes=model_cubes)
 
             ######
             # Contour maps of individual model
             if thresholds:
-                make_transect_contours(cfg, metadatas[filename], filename)
+                make_transect_contours(cfg, metadatas[filename], filename,
+                                       model_cubes=model_cubes)
 
     logger.info('Success')
 
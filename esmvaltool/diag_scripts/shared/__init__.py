@@ -1,5 +1,5 @@
 """Code that is shared between multiple diagnostic scripts."""
-from . import io, iris_helpers, names, plot
+from . import io, iris_helpers, names, plot, regression
 from ._base import (ProvenanceLogger, extract_variables, get_cfg,
                     get_diagnostic_filename, get_plot_filename, group_metadata,
                     run_diagnostic, select_metadata, sorted_group_metadata,
@@ -33,6 +33,8 @@ __all__ = [
     'iris_helpers',
     # Plotting module
     'plot',
+    # Regression module
+    'regression',
     # Validation module
     'get_control_exper_obs',
     'apply_supermeans',
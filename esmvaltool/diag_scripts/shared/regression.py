@@ -0,0 +1,116 @@
+"""Vectorized linear regressions for many independent samples at once."""
+import logging
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+
+logger = logging.getLogger(__name__)
+
+LinregressResult = namedtuple(
+    'LinregressResult', ['slope', 'intercept', 'rvalue', 'pvalue', 'stderr'])
+
+TINY = 1.0e-20
+
+
+def _prepare_input(x_data, y_data, axis):
+    """Broadcast input arrays and move regression axis to last position."""
+    y_data = np.ma.filled(np.ma.asarray(y_data, dtype=np.float64), np.nan)
+    x_data = np.ma.filled(np.ma.asarray(x_data, dtype=np.float64), np.nan)
+    if y_data.ndim == 0:
+        raise ValueError("Expected at least 1D array for Y, got 0D array")
+    axis = axis % y_data.ndim
+    if x_data.ndim == 1 and y_data.ndim > 1:
+        if x_data.shape[0] != y_data.shape[axis]:
+            raise ValueError(
+                f"Expected 1D array for X with length {y_data.shape[axis]:d} "
+                f"(size of regression axis of Y), got {x_data.shape[0]:d}")
+        new_shape = [1] * y_data.ndim
+        new_shape[axis] = -1
+        x_data = x_data.reshape(new_shape)
+    (x_data, y_data) = np.broadcast_arrays(x_data, y_data)
+    return (np.moveaxis(x_data, axis, -1), np.moveaxis(y_data, axis, -1))
+
+
+def linregress(x_data, y_data, axis=-1):
+    """Calculate linear least-squares regressions along a given axis.
+
+    Vectorized version of :func:`scipy.stats.linregress` which calculates the
+    regressions of all independent samples (e.g. all grid points of a map)
+    simultaneously from closed-form moment formulas. Missing values (masked
+    or ``NaN`` in either ``x_data`` or ``y_data``) are ignored for the
+    individual regressions.
+
+    Parameters
+    ----------
+    x_data : array_like
+        Independent variable. Either a 1D array with the length of the
+        regression axis of ``y_data`` (e.g. a single predictor for all grid
+        points) or an array which can be broadcast to the shape of
+        ``y_data``.
+    y_data : array_like
+        Dependent variable.
+    axis : int, optional (default: -1)
+        Axis of ``y_data`` along which the regressions are calculated.
+
+    Returns
+    -------
+    LinregressResult
+        Named tuple with the fields ``slope``, ``intercept``, ``rvalue``,
+        ``pvalue`` (two-sided, null hypothesis: slope is zero) and ``stderr``
+        (standard error of the slope). Each field is an array with the shape
+        of ``y_data`` without ``axis``. Samples with less than 2 valid points
+        or with constant ``x_data`` contain ``NaN``, ``pvalue`` and ``stderr``
+        need at least 3 valid points.
+
+    Raises
+    ------
+    ValueError
+        Shapes of ``x_data`` and ``y_data`` do not match.
+
+    """
+    (x_data, y_data) = _prepare_input(x_data, y_data, axis)
+    valid = ~(np.isnan(x_data) | np.isnan(y_data))
+    x_data = np.where(valid, x_data, 0.0)
+    y_data = np.where(valid, y_data, 0.0)
+    n_points = np.count_nonzero(valid, axis=-1)
+
+    # Central moments
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = x_data.sum(axis=-1) / n_points
+        y_mean = y_data.sum(axis=-1) / n_points
+        x_anom = np.where(valid, x_data - x_mean[..., np.newaxis], 0.0)
+        y_anom = np.where(valid, y_data - y_mean[..., np.newaxis], 0.0)
+        ssxm = np.einsum('...i,...i->...', x_anom, x_anom) / n_points
+        ssym = np.einsum('...i,...i->...', y_anom, y_anom) / n_points
+        ssxym = np.einsum('...i,...i->...', x_anom, y_anom) / n_points
+
+        # Regression parameters
+        r_den = np.sqrt(ssxm * ssym)
+        rvalue = np.where(r_den == 0.0, 0.0, ssxym / r_den)
+        rvalue = np.clip(rvalue, -1.0, 1.0)
+        slope = ssxym / ssxm
+        intercept = y_mean - slope * x_mean
+
+        # Significance
+        dof = n_points - 2.0
+        tvalue = rvalue * np.sqrt(dof / ((1.0 - rvalue + TINY) *
+                                         (1.0 + rvalue + TINY)))
+        pvalue = 2.0 * stats.t.sf(np.abs(tvalue), dof)
+        stderr = np.sqrt((1.0 - rvalue**2) * ssym / ssxm / dof)
+
+    # Mask invalid samples (p-value and standard error need 3 points)
+    invalid = (n_points < 2) | (ssxm == 0.0)
+    (slope, intercept, rvalue) = [
+        np.where(invalid, np.nan, arr) for arr in (slope, intercept, rvalue)
+    ]
+    (pvalue, stderr) = [
+        np.where(invalid | (n_points < 3), np.nan, arr)
+        for arr in (pvalue, stderr)
+    ]
+    if invalid.any():
+        logger.debug(
+            "Linear regression is not possible for %i of %i samples (less "
+            "than 2 valid points or constant X)", np.count_nonzero(invalid),
+            invalid.size)
+    return LinregressResult(slope, intercept, rvalue, pvalue, stderr)
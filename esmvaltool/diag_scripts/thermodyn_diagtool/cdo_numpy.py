@@ -0,0 +1,328 @@
+"""IN-MEMORY BACKEND FOR THE CDO OPERATORS.
+
+Module providing a NumPy replacement for the subset of CDO operators used by
+the thermodynamic diagnostic tool.
+
+The class CdoNumpy mimics the interface of the cdo.Cdo python bindings, i.e.
+each operator is called as cdo.<operator>(<parameters>, input=<chain>,
+output=<file>, options=<options>). The chain of operators in the input string
+(e.g. '-fldmean -yearmonmean -div a.nc b.nc') is parsed into a tree and
+evaluated in memory, so that only the final result is written to a NetCDF
+file and no intermediate files are created. Results written to disk are kept
+in a small in-memory cache and are not read again when they are used as the
+input of a later operator.
+
+The backend is selected once per run with set_backend ('cdo' or 'numpy'),
+then get_cdo returns either a cdo.Cdo instance or the shared CdoNumpy
+instance.
+
+The functions that are here contained are:
+- get_cdo: function returning the CDO interface of the selected backend;
+- set_backend: function selecting the backend ('cdo' or 'numpy');
+
+Supported operators: add, sub, mul, div, addc, subc, mulc, divc, reci, sqr,
+sqrt, gtc, ltc, gec, lec, eqc, nec, setctomiss, setrtomiss, setmisstoc,
+fldmean, timmean, monmean, yearmonmean, chname, selvar.
+"""
+
+import os
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from cdo import Cdo
+from netCDF4 import Dataset, date2num, num2date
+
+BACKENDS = ('cdo', 'numpy')
+CACHE_SIZE = 8
+
+_SETTINGS = {'backend': 'cdo', 'instance': None}
+
+Field = namedtuple('Field', ['name', 'data', 'dims', 'coords', 'attrs',
+                             'dtype'])
+
+_BINARY = {
+    'add': np.ma.add,
+    'sub': np.ma.subtract,
+    'mul': np.ma.multiply,
+    'div': np.ma.divide,
+}
+_CONST = {
+    'addc': np.ma.add,
+    'subc': np.ma.subtract,
+    'mulc': np.ma.multiply,
+    'divc': np.ma.divide,
+}
+_COMPARE = {
+    'gtc': np.greater,
+    'ltc': np.less,
+    'gec': np.greater_equal,
+    'lec': np.less_equal,
+    'eqc': np.equal,
+    'nec': np.not_equal,
+}
+
+
+def get_cdo():
+    """Return the CDO interface of the selected backend."""
+    if _SETTINGS['backend'] == 'cdo':
+        return Cdo()
+    if _SETTINGS['instance'] is None:
+        _SETTINGS['instance'] = CdoNumpy()
+    return _SETTINGS['instance']
+
+
+def set_backend(backend):
+    """Select the backend for the CDO operators ('cdo' or 'numpy')."""
+    backend = str(backend).lower()
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend '{}', expected one of {}".format(
+            backend, BACKENDS))
+    _SETTINGS['backend'] = backend
+    _SETTINGS['instance'] = None
+
+
+class CdoNumpy():
+    """Evaluate chains of CDO operators in memory with NumPy."""
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        """Initialise the cache of the fields written to disk."""
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __getattr__(self, operator):
+        """Return a function applying the operator as in cdo.Cdo."""
+        if operator.startswith('_') or operator not in _operators():
+            raise AttributeError(
+                "Operator '{}' is not available in the numpy backend".format(
+                    operator))
+
+        def run(*args, **kwargs):
+            params = ','.join(str(arg) for arg in args).split(',')
+            params = [par for par in params if par]
+            tokens = kwargs['input'].split()
+            field = self._apply(operator, params, tokens)
+            if tokens:
+                raise ValueError('Unused input for {}: {}'.format(
+                    operator, ' '.join(tokens)))
+            options = kwargs.get('options', kwargs.get('option', ''))
+            self._write(field, kwargs['output'], options)
+            return kwargs['output']
+
+        return run
+
+    def _apply(self, operator, params, tokens):
+        """Apply an operator to the operands consumed from tokens."""
+        if operator == 'selvar':
+            if tokens and not tokens[0].startswith('-'):
+                return self._read(tokens.pop(0), params[0])
+            field = self._operand(tokens)
+            if field.name != params[0]:
+                raise ValueError('Variable {} not found'.format(params[0]))
+            return field
+        if operator in _BINARY:
+            first = self._operand(tokens)
+            second = self._operand(tokens)
+            return _binary(_BINARY[operator], first, second)
+        field = self._operand(tokens)
+        data = field.data
+        if operator in _CONST:
+            data = _CONST[operator](data, float(params[0]))
+        elif operator in _COMPARE:
+            comp = _COMPARE[operator](data.filled(0.), float(params[0]))
+            data = np.ma.array(comp.astype(np.float64),
+                               mask=np.ma.getmask(data))
+        elif operator == 'reci':
+            data = np.ma.divide(1., data)
+        elif operator == 'sqr':
+            data = data * data
+        elif operator == 'sqrt':
+            data = np.ma.sqrt(data)
+        elif operator == 'setctomiss':
+            data = np.ma.masked_where(data.filled(np.nan) == float(params[0]),
+                                      data)
+        elif operator == 'setrtomiss':
+            filled = data.filled(np.nan)
+            data = np.ma.masked_where((filled >= float(params[0])) &
+                                      (filled <= float(params[1])), data)
+        elif operator == 'setmisstoc':
+            data = np.ma.array(data.filled(float(params[0])))
+        elif operator == 'chname':
+            names = dict(zip(params[0::2], params[1::2]))
+            return field._replace(name=names.get(field.name, field.name))
+        else:
+            return _statistic(operator, field)
+        return field._replace(data=data)
+
+    def _operand(self, tokens):
+        """Evaluate the next operand (a file or an operator) in tokens."""
+        token = tokens.pop(0)
+        if not token.startswith('-'):
+            return self._read(token)
+        operator, *params = token[1:].split(',')
+        if operator not in _operators():
+            raise ValueError(
+                "Operator '{}' is not available in the numpy backend".format(
+                    operator))
+        return self._apply(operator, params, tokens)
+
+    def _read(self, filename, varname=None):
+        """Read a field from a NetCDF file, or from the cache."""
+        key = os.path.abspath(filename)
+        stat = os.stat(filename)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            if varname is None or cached[1].name == varname:
+                self._cache.move_to_end(key)
+                return cached[1]
+        with Dataset(filename) as dataset:
+            if varname is None:
+                varname = _main_variable(dataset)
+            var = dataset.variables[varname]
+            coords = OrderedDict()
+            for dim in var.dimensions:
+                if dim in dataset.variables:
+                    coord = dataset.variables[dim]
+                    attrs = {
+                        att: coord.getncattr(att)
+                        for att in coord.ncattrs()
+                        if att not in ('_FillValue', 'bounds')
+                    }
+                    coords[dim] = (np.array(coord[:]), attrs)
+                else:
+                    coords[dim] = (np.arange(len(dataset.dimensions[dim])),
+                                   {})
+            attrs = {
+                att: var.getncattr(att)
+                for att in var.ncattrs()
+                if att not in ('_FillValue', 'missing_value')
+            }
+            data = np.ma.array(var[:], dtype=np.float64)
+            return Field(varname, data, var.dimensions, coords, attrs,
+                         var.dtype)
+
+    def _write(self, field, filename, options=''):
+        """Write a field to a NetCDF file and store it in the cache."""
+        dtype = 'f4' if 'F32' in options else field.dtype
+        if 'F64' in options:
+            dtype = 'f8'
+        data = np.ma.masked_invalid(field.data)
+        with Dataset(filename, 'w', format='NETCDF4') as dataset:
+            for dim in field.dims:
+                values, attrs = field.coords[dim]
+                dataset.createDimension(dim, len(values))
+                coord = dataset.createVariable(dim, values.dtype, (dim, ))
+                coord.setncatts(attrs)
+                coord[:] = values
+            var = dataset.createVariable(field.name,
+                                         dtype,
+                                         field.dims,
+                                         fill_value=1.e20)
+            var.setncatts(field.attrs)
+            var[:] = data
+        # Cache the field as it would be read back from the file
+        data = data.astype(dtype).astype(np.float64)
+        field = field._replace(data=data, dtype=np.dtype(dtype))
+        stat = os.stat(filename)
+        self._cache[os.path.abspath(filename)] = ((stat.st_mtime_ns,
+                                                   stat.st_size), field)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def _binary(func, first, second):
+    """Apply a binary operator, broadcasting single time steps and points."""
+    data = func(first.data, second.data)
+    field = first if first.data.size >= second.data.size else second
+    return field._replace(name=first.name,
+                          data=data,
+                          attrs=first.attrs,
+                          dtype=first.dtype)
+
+
+def _cell_weights(field):
+    """Compute the area weights of a regular lonlat grid as (lat, lon)."""
+    lat = np.asarray(field.coords[field.dims[-2]][0], dtype=np.float64)
+    lon = np.asarray(field.coords[field.dims[-1]][0], dtype=np.float64)
+    if len(lat) > 1:
+        lat_b = np.clip(
+            np.concatenate([[1.5 * lat[0] - 0.5 * lat[1]],
+                            0.5 * (lat[1:] + lat[:-1]),
+                            [1.5 * lat[-1] - 0.5 * lat[-2]]]), -90., 90.)
+        w_lat = np.abs(np.diff(np.sin(np.deg2rad(lat_b))))
+    else:
+        w_lat = np.ones(1)
+    w_lon = np.abs(np.gradient(lon)) if len(lon) > 1 else np.ones(1)
+    return w_lat[:, np.newaxis] * w_lon[np.newaxis, :]
+
+
+def _main_variable(dataset):
+    """Find the data variable of a NetCDF file."""
+    for name, var in dataset.variables.items():
+        if (name not in dataset.dimensions and len(var.dimensions) > 1
+                and 'bnds' not in name and 'bounds' not in name):
+            return name
+    raise ValueError('No data variable found in {}'.format(dataset.filepath()))
+
+
+def _month_groups(field):
+    """Return the year and month of each time step and the month lengths."""
+    values, attrs = field.coords['time']
+    calendar = attrs.get('calendar', 'standard')
+    dates = num2date(values, attrs['units'], calendar)
+    years = np.array([date.year for date in dates])
+    months = np.array([date.month for date in dates])
+    start = [type(date)(date.year, date.month, 1) for date in dates]
+    end = [
+        type(date)(date.year + date.month // 12, date.month % 12 + 1, 1)
+        for date in dates
+    ]
+    units = 'days since {}-01-01'.format(years.min())
+    days = (date2num(end, units, calendar) -
+            date2num(start, units, calendar))
+    return years, months, np.asarray(days, dtype=np.float64)
+
+
+def _operators():
+    """Return the names of the operators supported by the backend."""
+    return (set(_BINARY) | set(_CONST) | set(_COMPARE) | {
+        'reci', 'sqr', 'sqrt', 'setctomiss', 'setrtomiss', 'setmisstoc',
+        'chname', 'selvar', 'fldmean', 'timmean', 'monmean', 'yearmonmean'
+    })
+
+
+def _statistic(operator, field):
+    """Compute field and time statistics of a field."""
+    data = field.data
+    coords = OrderedDict(field.coords)
+    if operator == 'fldmean':
+        weights = np.broadcast_to(_cell_weights(field), data.shape)
+        shape = data.shape[:-2] + (1, 1)
+        data = np.ma.average(np.ma.reshape(data, data.shape[:-2] + (-1, )),
+                             axis=-1,
+                             weights=np.reshape(weights, shape[:-2] + (-1, )))
+        for dim in field.dims[-2:]:
+            coords[dim] = (np.zeros(1), coords[dim][1])
+        return field._replace(data=np.ma.reshape(data, shape), coords=coords)
+    values, attrs = coords['time']
+    if operator == 'timmean':
+        data = np.ma.mean(data, axis=0)[np.newaxis]
+        coords['time'] = (values[-1:], attrs)
+        return field._replace(data=data, coords=coords)
+    years, months, days = _month_groups(field)
+    if operator == 'monmean':
+        keys = years * 100 + months
+        days = np.ones(len(values))
+    else:
+        keys = years
+    means = []
+    last = []
+    for key in sorted(set(keys), key=list(keys).index):
+        idx = np.where(keys == key)[0]
+        weights = np.broadcast_to(
+            np.reshape(days[idx], (-1, ) + (1, ) * (data.ndim - 1)),
+            data[idx].shape)
+        means.append(np.ma.average(data[idx], axis=0, weights=weights))
+        last.append(idx[-1])
+    coords['time'] = (values[last], attrs)
+    return field._replace(data=np.ma.stack(means), coords=coords)
@@ -32,11 +32,10 @@ import os
 from shutil import move
 
 import numpy as np
-from cdo import Cdo
 from netCDF4 import Dataset
 
 import esmvaltool.diag_scripts.shared as e
-from esmvaltool.diag_scripts.thermodyn_diagtool import mkthe
+from esmvaltool.diag_scripts.thermodyn_diagtool import cdo_numpy, mkthe
 
 L_C = 2501000  # latent heat of condensation
 LC_SUB = 2835000  # latent heat of sublimation
@@ -61,7 +60,7 @@ def baroceff(model, wdir, aux_file, toab_file, te_file):
     - te_file: a file containing the annual mean emission temperature
       (time,lon,lat);
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     removeif(aux_file)
     gain_file = wdir + '/{}_maskGain.nc'.format(model)
     cdo.gtc('0', input=toab_file, output=gain_file)
@@ -127,7 +126,7 @@ def budgets(model, wdir, aux_file, input_data):
     - aux_file: the name of a dummy aux. file to be used for computations;
     - filelist: a list of file names containing the input fields;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     hfls_file = e.select_metadata(input_data, short_name='hfls',
                                   dataset=model)[0]['filename']
     hfss_file = e.select_metadata(input_data, short_name='hfss',
@@ -185,7 +184,8 @@ def budgets(model, wdir, aux_file, input_data):
     return input_list, eb_gmean, eb_file, toab_ymm_file
 
 
-def direntr(logger, model, wdir, input_data, aux_file, te_file, lect, flags):
+def direntr(logger, model, wdir, input_data, aux_file, te_file, lect, flags,
+            store):
     """Compute the material entropy production with the direct method.
 
     The function computes the material entropy production with the direct
@@ -209,10 +209,12 @@ def direntr(logger, model, wdir, input_data, aux_file, te_file, lect, flags):
     - flags: a list of flags containing information on whether the water mass
     and energy budgets are computed, if the material entropy production has to
     be computed, if using the indirect, the direct method, or both methods;
+    - store: the store of the intermediate files of the model, where the
+    auxiliary fields are kept and removed at the end;
     """
     lec = flags[1]
     aux_files = mkthe.init_mkthe_direntr(model, wdir, input_data, te_file,
-                                         flags)
+                                         flags, store)
     htop_file = aux_files[1]
     prr_file = aux_files[2]
     tabl_file = aux_files[3]
@@ -230,8 +232,10 @@ def direntr(logger, model, wdir, input_data, aux_file, te_file, lect, flags):
                                 dataset=model)[0]['filename']
     logger.info('Computation of the material entropy '
                 'production with the direct method\n')
+    ts_reci_file = store.get('ts_reci', mkthe.reci_file, wdir, model, 'ts',
+                             ts_file)
     logger.info('1. Sensible heat fluxes\n')
-    infile_list = [hfss_file, tabl_file, ts_file]
+    infile_list = [hfss_file, tabl_file, ts_reci_file]
     ssens, sensentr_file = sensentr(model, wdir, infile_list, aux_file)
     logger.info(
         'Material entropy production associated with '
@@ -278,8 +282,6 @@ def direntr(logger, model, wdir, input_data, aux_file, te_file, lect, flags):
     logger.info('Material entropy production with '
                 'the direct method: %s\n', matentr)
     irrevers = ((matentr - float(skin)) / float(skin))
-    for filen in aux_files:
-        os.remove(filen)
     entr_list = [
         sensentr_file, evapentr_file, rainentr_file, snowentr_file,
         meltentr_file, potentr_file
@@ -303,7 +305,7 @@ def entr(filelist, nin, nout, entr_file, entr_mean_file):
     - entr_mean_file: the name of the file containing the global annual mean
       entropy value;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     en_file = filelist[0]
     tem_file = filelist[1]
     aux_file = filelist[2]
@@ -340,7 +342,7 @@ def evapentr(model, wdir, infile, aux_file):
     return evapentr_gmean, evapentr_file
 
 
-def indentr(model, wdir, infile, input_data, aux_file, toab_gmean):
+def indentr(model, wdir, infile, input_data, aux_file, toab_gmean, store):
     """Compute the material entropy production with the indirect method.
 
     The function computes the material entropy production with the indirect
@@ -358,8 +360,9 @@ def indentr(model, wdir, infile, input_data, aux_file, toab_gmean):
       (time,lon,lat);
     - aux_file: the name of a dummy aux. file to be used for computations;
     - toab_gmean: the climatological annaul mean TOA energy budget;
+    - store: the store of the intermediate files of the model;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     rlds_file = e.select_metadata(input_data, short_name='rlds',
                                   dataset=model)[0]['filename']
     rlus_file = e.select_metadata(input_data, short_name='rlus',
@@ -384,8 +387,10 @@ def indentr(model, wdir, infile, input_data, aux_file, toab_gmean):
     cdo.yearmonmean(input=' -add {} -sub {} -add {} {}'.format(
         rlds_file, rsds_file, rlus_file, rsus_file),
         output=vertenergy_file)
-    cdo.mul(input='{} -sub -yearmonmean -reci {} -yearmonmean -reci {}'.format(
-        vertenergy_file, infile[0], ts_file),
+    ts_reci_file = store.get('ts_reci', mkthe.reci_file, wdir, model, 'ts',
+                             ts_file)
+    cdo.mul(input='{} -sub -yearmonmean -reci {} -yearmonmean {}'.format(
+        vertenergy_file, infile[0], ts_reci_file),
             output=aux_file)
     vertentr_mean = write_eb('rlds', 'sver', aux_file, vertentropy_file,
                              vertentropy_mean_file)
@@ -410,7 +415,7 @@ def kinentr(logger, aux_file, tasvert_file, lect, lec):
     - lect: an array containing the annual mean LEC intensity;
     - lec: a flag marking whether the LEC has been previously computed or not
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     removeif(aux_file)
     if lec is True:
         cdo.yearmonmean(input=tasvert_file, output=aux_file)
@@ -441,7 +446,7 @@ def landoc_budg(model, wdir, infile, mask, name):
     - mask: the file containing the land-sea mask;
     - name: the variable name as in the input file;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     ocean_file = wdir + '/{}_{}_ocean.nc'.format(model, name)
     oc_gmean_file = wdir + '/{}_{}_oc_gmean.nc'.format(model, name)
     land_file = wdir + '/{}_{}_land.nc'.format(model, name)
@@ -480,7 +485,7 @@ def mask_precip(model, wdir, infile):
     - infile: a list of input file, containing rainfall precipitation (prr) and
       prsn, respectively (dimensions (time,lat,lon));
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     prr_file = infile[0]
     prsn_file = infile[1]
     tlcl_file = infile[2]
@@ -568,7 +573,7 @@ def meltentr(model, wdir, latsnow_file, aux_file):
     - infile: the latent energy associated with snowfall precipitation;
     - aux_file: the name of a dummy aux. file to be used for computations;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     removeif(aux_file)
     latmelt_file = (wdir + '/{}_latentEnergy_snowmelt.nc'.format(model))
     meltentr_file = (wdir + '/{}_snowmelt_entr.nc'.format(model))
@@ -616,7 +621,7 @@ def potentr(model, wdir, infile, aux_file):
       the cloud top and the ground (tcolumn);
     - aux_file: the name of a dummy aux. file to be used for computations;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     removeif(aux_file)
     htop_file = infile[0]
     prrmask_file = infile[1]
@@ -654,7 +659,7 @@ def rainentr(model, wdir, infile, aux_file):
       (prrmask) and the temperature of the cloud (tcloud);
     - aux_file: the name of a dummy aux. file to be used for computations;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     prrmask_file = infile[0]
     removeif(aux_file)
     latrain_file = wdir + '/{}_latentEnergy_rain.nc'.format(model)
@@ -693,14 +698,15 @@ def sensentr(model, wdir, infile, aux_file):
     - model: the model name;
     - wdir: the working directory where the outputs are stored;
     - infile: a list of file containing hfss, the temperature at the boundary
-    layer top (tabl), ts, respectively (with dimensions (time,lat,lon);
+    layer top (tabl), the reciprocal of ts, respectively (with dimensions
+    (time,lat,lon);
     - aux_file: the name of a dummy aux. file to be used for computations;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     difftemp_file = wdir + '/{}_difftemp_bl.nc'.format(model)
     sensentr_file = (wdir + '/{}_sens_entr.nc'.format(model))
     sensentr_mean_file = wdir + '/{}_sensEntropy_gmean.nc'.format(model)
-    cdo.reci(input='-sub -reci {}  -reci {}'.format(infile[1], infile[2]),
+    cdo.reci(input='-sub -reci {} {}'.format(infile[1], infile[2]),
              options='-b F32',
              output=difftemp_file)
     flist = [infile[0], difftemp_file, aux_file]
@@ -727,7 +733,7 @@ def snowentr(model, wdir, infile, aux_file):
       (prsnmask) and the temperature of the cloud (tcloud);
     - aux_file: the name of a dummy aux. file to be used for computations;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     prsnmask_file = infile[0]
     removeif(aux_file)
     latsnow_file = wdir + '/{}_latentEnergy_snow.nc'.format(model)
@@ -761,7 +767,7 @@ def wmbudg(model, wdir, aux_file, input_data, auxlist):
     - filelist: a list of file names containing the input fields;
     - auxlist: a list of auxiliary files;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     hfls_file = e.select_metadata(input_data, short_name='hfls',
                                   dataset=model)[0]['filename']
     pr_file = e.select_metadata(input_data, short_name='pr',
@@ -800,7 +806,7 @@ def write_eb(namein, nameout, aux_file, d3_file, gmean_file):
     - gmean_file: the name of a file where to put the annual and globally
       averaged fields;
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     ch_name = '{},{}'.format(namein, nameout)
     cdo.chname(ch_name, input=aux_file, options='-b F32', output=d3_file)
     cdo.fldmean(input='-yearmonmean {}'.format(d3_file), output=gmean_file)
@@ -20,117 +20,115 @@ G_0 = 9.81  # Gravity acceleration
 GAM = 0.0065  # Standard atmosphere lapse rate
 GAS_CON = 287.0  # Gas constant
 P_0 = 10000  # Reference tropospheric pressure
+NCHUNK = 30  # Number of time steps processed at once
 
 
-def fourier_coeff(tadiagfile, outfile, ta_input, tas_input):
+def fourier_coeff(tadiagfile, outfile, ta_input, tas_input, nchunk=NCHUNK):
     """Compute Fourier coefficients in lon direction.
 
+    The input fields are processed in chunks of nchunk time steps: the
+    temperatures below the surface are extrapolated, the truncated Fourier
+    coefficients are computed and both are written to the output files
+    before the next chunk is read.
+
     Arguments:
     ---------
     - tadiagfile: the name of a file to store modified t fields;
     - outfile: the name of a file to store the Fourier coefficients;
     - ta_input: the name of a file containing t,u,v,w fields;
-    - tas_input: the name of a file containing t2m field.
+    - tas_input: the name of a file containing t2m field;
+    - nchunk: the number of time steps that are processed at once.
     """
     with Dataset(ta_input) as dataset:
-        lon = dataset.variables['lon'][:]
         lat = dataset.variables['lat'][:]
         lev = dataset.variables['plev'][:]
-        time = dataset.variables['time'][:]
-        t_a = dataset.variables['ta'][:, :, :, :]
-        u_a = dataset.variables['ua'][:, :, :, :]
-        v_a = dataset.variables['va'][:, :, :, :]
-        wap = dataset.variables['wap'][:, :, :, :]
-    nlon = len(lon)
+        ntime = len(dataset.variables['time'])
     nlat = len(lat)
-    nlev = len(lev)
-    ntime = len(time)
     i = np.min(np.where(2 * nlat <= GP_RES))
     trunc = FC_RES[i] + 1
     wave2 = np.linspace(0, trunc - 1, trunc)
-    with Dataset(tas_input) as dataset:
-        tas = dataset.variables['tas'][:, :, :]
-    tas = tas[:, ::-1, :]
-    ta1_fx = np.array(t_a)
-    deltat = np.zeros([ntime, nlev, nlat, nlon])
-    p_s = np.full([ntime, nlat, nlon], P_0)
-    for i in np.arange(nlev - 1, 0, -1):
-        h_1 = np.ma.masked_where(ta1_fx[:, i, :, :] != 0, ta1_fx[:, i, :, :])
-        if np.any(h_1.mask > 0):
-            deltat[:, i - 1, :, :] = np.where(ta1_fx[:, i - 1, :, :] != 0,
-                                              deltat[:, i - 1, :, :],
-                                              (ta1_fx[:, i, :, :] - tas))
-            deltat[:, i - 1, :, :] = ((1 * np.array(h_1.mask)) *
-                                      np.array(deltat[:, i - 1, :, :]))
-            d_p = -((P_0 * G_0 /
-                     (GAM * GAS_CON)) * deltat[:, i - 1, :, :] / tas)
-            p_s = np.where(ta1_fx[:, i - 1, :, :] != 0, p_s, lev[i - 1] + d_p)
-            for k in np.arange(0, nlev - i - 1, 1):
-                h_3 = np.ma.masked_where(ta1_fx[:, i + k, :, :] != 0,
-                                         ta1_fx[:, i + k, :, :])
-                if np.any(h_3.mask > 0):
-                    deltat[:, i - 1, :, :] = np.where(
-                        ta1_fx[:, i + k, :, :] != 0, deltat[:, i - 1, :, :],
-                        (ta1_fx[:, i + k + 1, :, :] - tas))
-                    d_p = -((P_0 * G_0 /
-                             (GAM * GAS_CON)) * deltat[:, i - 1, :, :] / tas)
-                    p_s = np.where(ta1_fx[:, i + k, :, :] != 0, p_s,
-                                   lev[i + k] + d_p)
-    ta2_fx = np.array(t_a)
-    mask = np.zeros([nlev, ntime, nlat, nlon])
-    dat = np.zeros([nlev, ntime, nlat, nlon])
-    tafr_bar = np.zeros([nlev, ntime, nlat, nlon])
-    deltap = np.zeros([ntime, nlev, nlat, nlon])
-    for i in np.arange(nlev):
-        deltap[:, i, :, :] = p_s - lev[i]
-        h_2 = np.ma.masked_where(ta2_fx[:, i, :, :] == 0, ta2_fx[:, i, :, :])
-        mask[i, :, :, :] = np.array(h_2.mask)
-        tafr_bar[i, :, :, :] = (1 * np.array(mask[i, :, :, :]) *
-                                (tas - GAM * GAS_CON /
-                                 (G_0 * p_s) * deltap[:, i, :, :] * tas))
-        dat[i, :, :, :] = (ta2_fx[:, i, :, :] *
-                           (1 - 1 * np.array(mask[i, :, :, :])))
-        t_a[:, i, :, :] = dat[i, :, :, :] + tafr_bar[i, :, :, :]
-    pr_output_diag(t_a, ta_input, tadiagfile, 'ta')
-    tafft_p = np.fft.fft(t_a, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    uafft_p = np.fft.fft(u_a, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    vafft_p = np.fft.fft(v_a, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    wapfft_p = np.fft.fft(wap, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    tafft = np.zeros([ntime, nlev, nlat, trunc])
-    uafft = np.zeros([ntime, nlev, nlat, trunc])
-    vafft = np.zeros([ntime, nlev, nlat, trunc])
-    wapfft = np.zeros([ntime, nlev, nlat, trunc])
-    tafft[:, :, :, 0::2] = np.real(tafft_p)
-    tafft[:, :, :, 1::2] = np.imag(tafft_p)
-    uafft[:, :, :, 0::2] = np.real(uafft_p)
-    uafft[:, :, :, 1::2] = np.imag(uafft_p)
-    vafft[:, :, :, 0::2] = np.real(vafft_p)
-    vafft[:, :, :, 1::2] = np.imag(vafft_p)
-    wapfft[:, :, :, 0::2] = np.real(wapfft_p)
-    wapfft[:, :, :, 1::2] = np.imag(wapfft_p)
-    dict_v = {'ta': tafft, 'ua': uafft, 'va': vafft, 'wap': wapfft}
-    file_desc = 'Fourier coefficients'
-    pr_output(dict_v, ta_input, outfile, file_desc, wave2)
-
-
-def pr_output(dict_v, nc_f, fileo, file_desc, wave2):
-    """Print outputs to NetCDF.
-
-    Save fields to NetCDF, retrieving information from an existing
-    NetCDF file. Metadata are transferred from the existing file to the
-    new one.
+    varnames = ['ta', 'ua', 'va', 'wap']
+    pr_output_diag(ta_input, tadiagfile, 'ta')
+    pr_output(varnames, ta_input, outfile, 'Fourier coefficients', wave2)
+    with Dataset(ta_input) as dataset, Dataset(tas_input) as dataset_tas, \
+            Dataset(tadiagfile, 'a') as diag_fid, \
+            Dataset(outfile, 'a') as out_fid:
+        for t_0 in range(0, ntime, nchunk):
+            t_s = slice(t_0, t_0 + nchunk)
+            tas = np.array(dataset_tas.variables['tas'][t_s])[:, ::-1, :]
+            for name in varnames:
+                fld = np.array(dataset.variables[name][t_s])
+                if name == 'ta':
+                    fld = extrapolate_ta(fld, tas, lev)
+                    diag_fid.variables['ta'][t_s] = fld
+                out_fid.variables[name][t_s] = fourier_trunc(fld, trunc)
+
+
+def extrapolate_ta(t_a, tas, lev):
+    """Extrapolate the temperatures below the surface.
+
+    Points below the surface are marked by zero temperatures. The surface
+    pressure is estimated from the highest level below the surface and the
+    temperature at the level above it, then the temperatures below the
+    surface are obtained from tas with the standard atmosphere lapse rate.
+
+    Arguments:
+    ---------
+    - t_a: the temperature field as (time,level,lat,lon);
+    - tas: the near-surface temperature field as (time,lat,lon);
+    - lev: the pressure levels.
+    """
+    nlev = len(lev)
+    mask = t_a == 0
+    # Highest level below the surface, excluding the top level
+    below = mask[:, :nlev - 1]
+    j_s = nlev - 2 - np.argmax(below[:, ::-1], axis=1)
+    t_up = np.take_along_axis(t_a, j_s[:, np.newaxis] + 1, axis=1)[:, 0]
+    deltat = np.asarray(t_up - tas, dtype=np.float64)
+    d_p = -((P_0 * G_0 / (GAM * GAS_CON)) * deltat / tas)
+    p_s = np.where(np.any(below, axis=1), lev[j_s] + d_p, P_0)
+    deltap = p_s[:, np.newaxis] - lev[np.newaxis, :, np.newaxis, np.newaxis]
+    tafr_bar = (tas[:, np.newaxis] - GAM * GAS_CON /
+                (G_0 * p_s[:, np.newaxis]) * deltap * tas[:, np.newaxis])
+    return np.where(mask, tafr_bar, t_a).astype(t_a.dtype)
+
+
+def fourier_trunc(fld, trunc):
+    """Compute the truncated Fourier coefficients along longitudes.
+
+    The real and imaginary parts of the coefficients are stored as even and
+    odd elements of the wave dimension.
+
+    Arguments:
+    ---------
+    - fld: the field as (time,level,lat,lon);
+    - trunc: the length of the wave dimension.
+    """
+    nwave = int(trunc / 2)
+    fld_p = np.fft.rfft(fld, axis=-1)[..., :nwave] / np.shape(fld)[-1]
+    fld_fc = np.zeros(np.shape(fld)[:-1] + (trunc, ))
+    fld_fc[..., 0:2 * nwave:2] = np.real(fld_p)
+    fld_fc[..., 1:2 * nwave:2] = np.imag(fld_p)
+    return fld_fc
+
+
+def pr_output(varnames, nc_f, fileo, file_desc, wave2):
+    """Prepare the NetCDF output of the Fourier coefficients.
+
+    Create the variables for the Fourier coefficients in a new NetCDF file,
+    retrieving information from an existing NetCDF file. Metadata are
+    transferred from the existing file to the new one.
 
     Arguments:
     ---------
-        - var1, var2, var3, var4: the fields to be stored, with shape
-          (time,level,wave,lon);
+        - varnames: the names of the variables to be saved, among ta, ua, va
+          and wap;
         - nc_f: the existing dataset, from where the metadata are
           retrieved. Coordinates time,level and lon have to be the same
           dimension as the fields to be saved to the new files;
         - fileo: the name of the output file;
+        - file_desc: the description of the output file;
         - wave2: an array containing the zonal wavenumbers;
-        - name1, name2, name3, name4: the name of the variables to be
-          saved;
 
     PROGRAMMER(S)
         Chris Slocum (2014), modified by Valerio Lembo (2018).
@@ -147,24 +145,21 @@ def pr_output(dict_v, nc_f, fileo, file_desc, wave2):
             var_nc_fid.createVariable('wave', nc_fid.variables['plev'].dtype,
                                       ('wave', ))
         var_nc_fid.variables['wave'][:] = wave2
-        for key in dict_v:
-            value = dict_v[key]
+        for key in varnames:
             var1_nc_var = var_nc_fid.createVariable(
                 key, 'f8', ('time', 'plev', 'lat', 'wave'))
             varatts(var1_nc_var, key)
-            var_nc_fid.variables[key][:, :, :, :] = value
 
 
-def pr_output_diag(var1, nc_f, fileo, name1):
-    """Print processed ta field to NetCDF file.
+def pr_output_diag(nc_f, fileo, name1):
+    """Prepare the NetCDF output of the processed ta field.
 
-    Save fields to NetCDF, retrieving information from an existing
-    NetCDF file. Metadata are transferred from the existing file to the
-    new one.
+    Create the variable for the processed ta field in a new NetCDF file,
+    retrieving information from an existing NetCDF file. Metadata are
+    transferred from the existing file to the new one.
 
     Arguments:
     ---------
-        - var1: the field to be stored, with shape (time,level,lat,lon);
         - nc_f: the existing dataset, from where the metadata are
           retrieved. Coordinates time,level, lat and lon have to be the
           same dimension as the fields to be saved to the new files;
@@ -185,7 +180,6 @@ def pr_output_diag(var1, nc_f, fileo, name1):
         var1_nc_var = var_nc_fid.createVariable(name1, 'f8',
                                                 ('time', 'plev', 'lat', 'lon'))
         varatts(var1_nc_var, name1)
-        var_nc_fid.variables[name1][:, :, :, :] = var1
 
 
 def extr_lat(nc_fid, var_nc_fid, latn):
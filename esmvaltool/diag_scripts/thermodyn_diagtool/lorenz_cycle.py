@@ -6,7 +6,6 @@ The module contains the following functions:
               NetCDF files and providing a flux diagram and a table outputs,
               the latter separately for the two hemispheres;
     - averages: a script computing time, global and zonal averages;
-    - averages_comp: a script computing global mean of the output fields;
     - bsslzr: it contains the coefficients for the conversion from regular
               lonlat grid to Gaussian grid;
     - diagram: it is the interface between the main program and a
@@ -16,6 +15,7 @@ The module contains the following functions:
     - globall_cg: it computes the global and hemispheric means at each
                   timestep;
     - init: initializes the table and ingests input fields;
+    - lec_year: computes the Fourier coefficients and the LEC for one year;
     - makek: computes the KE reservoirs;
     - makea: computes the APE reservoirs;
     - mka2k: computes the APE->KE conversion terms;
@@ -23,6 +23,7 @@ The module contains the following functions:
     - mkkekz: computes the zonal KE - eddy KE conversion terms;
     - mkatas: computes the stationay eddy - transient eddy APE conversions;
     - mkktks: computes the stationay eddy - transient eddy KE conversions;
+    - merid_diff: computes meridional derivatives;
     - output: compute vertical integrals and print NC output;
     - preprocess_lec: a script handling the input files, separating the real
                       from imaginary part of the Fourier coefficients,
@@ -36,6 +37,8 @@ The module contains the following functions:
              the reservoirs;
     - table_conv: prints the global and hemispheric mean values of the
                   conversion terms;
+    - transient: computes the time mean transient eddy reservoirs and
+                 conversion terms over chunks of time steps;
     - varatts: prints the attributes of a variable in a Nc file;
     - weights: computes the weights for vertical integrations and meridional
                averages;
@@ -51,6 +54,7 @@ References.
 import math
 import os
 import sys
+from multiprocessing import get_context
 
 import numpy as np
 from cdo import Cdo
@@ -68,9 +72,10 @@ PS = 101100.0
 NW_1 = 3
 NW_2 = 9
 NW_3 = 21
+NCHUNK = 32
 
 
-def lorenz(outpath, model, year, filenc, plotfile, logfile):
+def lorenz(outpath, model, year, filenc, plotfile, logfile, nchunk=NCHUNK):
     """Manage input and output fields and calling functions.
 
     Receive fields t,u,v,w as input fields in Fourier
@@ -82,12 +87,11 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
         - year: year that is considered;
         - filenc: name of the file containing the input fields;
         - plotfile: name of the file that will contain the flux diagram;
-        - logfile: name of the file containing the table as a .txt file.
+        - logfile: name of the file containing the table as a .txt file;
+        - nchunk: the number of time steps that are processed at once.
     """
     ta_c, ua_c, va_c, wap_c, dims, lev, lat, log = init(logfile, filenc)
     nlev = int(dims[0])
-    ntime = int(dims[1])
-    nlat = int(dims[2])
     ntp = int(dims[3])
     d_s, y_l, g_w = weights(lev, nlev, lat)
     # Compute time mean
@@ -98,56 +102,25 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
     wap_tmn = np.nanmean(wap_c, axis=1)
     _, wap_gmn = averages(wap_tmn, g_w)
     # Compute stability parameter
-    gam_ztmn = np.zeros([nlev, nlat])
-    for l_l in range(nlat):
-        gam_ztmn[:, l_l] = stabil(ta_ztmn[:, l_l], lev, nlev)
-    gam_tmn = stabil(ta_gmn, lev, nlev)
-    e_k = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ape = np.zeros([nlev, ntime, nlat, ntp - 1])
-    a2k = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ae2az = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ke2kz = np.zeros([nlev, ntime, nlat, ntp - 1])
-    at2as = np.zeros([nlev, ntime, nlat, ntp - 1])
-    kt2ks = np.zeros([nlev, ntime, nlat, ntp - 1])
-    for t_t in range(ntime):
-        ta_tan = ta_c[:, t_t, :, :] - ta_tmn
-        ua_tan = ua_c[:, t_t, :, :] - ua_tmn
-        va_tan = va_c[:, t_t, :, :] - va_tmn
-        wap_tan = wap_c[:, t_t, :, :] - wap_tmn
-        # Compute zonal means
-        _, ta_tgan = averages(ta_tan, g_w)
-        _, wap_tgan = averages(wap_tan, g_w)
-        # Compute kinetic energy
-        e_k[:, t_t, :, :] = makek(ua_tan, va_tan)
-        # Compute available potential energy
-        ape[:, t_t, :, :] = makea(ta_tan, ta_tgan, gam_tmn)
-        # Compute conversion between kin.en. and pot.en.
-        a2k[:, t_t, :, :] = mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan, lev)
-        # Compute conversion between zonal and eddy APE
-        ae2az[:, t_t, :, :] = mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn, ta_gmn,
-                                     lev, y_l, gam_tmn, nlat, nlev)
-        # Compute conversion between zonal and eddy KE
-        ke2kz[:, t_t, :, :] = mkkekz(ua_tan, va_tan, wap_tan, ua_tmn, va_tmn,
-                                     lev, y_l, nlat, ntp, nlev)
-        # Compute conversion between stationary and transient eddy APE
-        at2as[:, t_t, :, :] = mkatas(ua_tan, va_tan, wap_tan, ta_tan, ta_ztmn,
-                                     gam_ztmn, lev, y_l, nlat, ntp, nlev)
-        # Compute conversion between stationary and transient eddy KE
-        kt2ks[:, t_t, :, :] = mkktks(ua_tan, va_tan, ua_tmn, va_tmn, y_l, nlat,
-                                     ntp, nlev)
-    ek_tgmn = averages_comp(e_k, g_w, d_s, dims)
+    gam_ztmn = stabil(ta_ztmn, lev)
+    gam_tmn = stabil(ta_gmn, lev)
+    # Compute the time mean of the transient eddy terms
+    e_k, ape, a2k, ae2az, ke2kz, at2as, kt2ks = transient(
+        [ta_c, ua_c, va_c, wap_c], [ta_tmn, ua_tmn, va_tmn, wap_tmn],
+        [ta_ztmn, ta_gmn, gam_ztmn, gam_tmn], lev, y_l, g_w, nchunk)
+    ek_tgmn = globall_cg(e_k, g_w, d_s, dims)
     table(ek_tgmn, ntp, 'TOT. KIN. EN.    ', logfile, flag=0)
-    ape_tgmn = averages_comp(ape, g_w, d_s, dims)
+    ape_tgmn = globall_cg(ape, g_w, d_s, dims)
     table(ape_tgmn, ntp, 'TOT. POT. EN.   ', logfile, flag=0)
-    a2k_tgmn = averages_comp(a2k, g_w, d_s, dims)
+    a2k_tgmn = globall_cg(a2k, g_w, d_s, dims)
     table(a2k_tgmn, ntp, 'KE -> APE (trans) ', logfile, flag=1)
-    ae2az_tgmn = averages_comp(ae2az, g_w, d_s, dims)
+    ae2az_tgmn = globall_cg(ae2az, g_w, d_s, dims)
     table(ae2az_tgmn, ntp, 'AZ <-> AE (trans) ', logfile, flag=1)
-    ke2kz_tgmn = averages_comp(ke2kz, g_w, d_s, dims)
+    ke2kz_tgmn = globall_cg(ke2kz, g_w, d_s, dims)
     table(ke2kz_tgmn, ntp, 'KZ <-> KE (trans) ', logfile, flag=1)
-    at2as_tgmn = averages_comp(at2as, g_w, d_s, dims)
+    at2as_tgmn = globall_cg(at2as, g_w, d_s, dims)
     table(at2as_tgmn, ntp, 'ASE  <->  ATE   ', logfile, flag=1)
-    kt2ks_tgmn = averages_comp(kt2ks, g_w, d_s, dims)
+    kt2ks_tgmn = globall_cg(kt2ks, g_w, d_s, dims)
     table(kt2ks_tgmn, ntp, 'KSE  <->  KTE   ', logfile, flag=1)
     ek_st = makek(ua_tmn, va_tmn)
     ek_stgmn = globall_cg(ek_st, g_w, d_s, dims)
@@ -159,11 +132,10 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
     a2k_stgmn = globall_cg(a2k_st, g_w, d_s, dims)
     table(a2k_stgmn, ntp, 'KE -> APE (stat)', logfile, flag=1)
     ae2az_st = mkaeaz(va_tmn, wap_tmn, ta_tmn, ta_tmn, ta_gmn, lev, y_l,
-                      gam_tmn, nlat, nlev)
+                      gam_tmn)
     ae2az_stgmn = globall_cg(ae2az_st, g_w, d_s, dims)
     table(ae2az_stgmn, ntp, 'AZ <-> AE (stat)', logfile, flag=1)
-    ke2kz_st = mkkekz(ua_tmn, va_tmn, wap_tmn, ua_tmn, va_tmn, lev, y_l, nlat,
-                      ntp, nlev)
+    ke2kz_st = mkkekz(ua_tmn, va_tmn, wap_tmn, ua_tmn, va_tmn, lev, y_l)
     ke2kz_stgmn = globall_cg(ke2kz_st, g_w, d_s, dims)
     table(ke2kz_stgmn, ntp, 'KZ <-> KE (stat)', logfile, flag=1)
     list_diag = [
@@ -189,28 +161,14 @@ def averages(x_c, g_w):
     """Compute time, zonal and global mean averages of initial fields.
 
     Arguments:
-    - x_c: the input field as (lev, lat, wave);
+    - x_c: the input field as (lev, lat, wave), or (time, lev, lat, wave);
     - g_w: the Gaussian weights for meridional averaging;
     """
-    xc_ztmn = np.squeeze(np.real(x_c[:, :, 0]))
-    xc_gmn = np.nansum(xc_ztmn * g_w[np.newaxis, :], axis=1) / np.nansum(g_w)
+    xc_ztmn = np.real(x_c[..., 0])
+    xc_gmn = np.nansum(xc_ztmn * g_w, axis=-1) / np.nansum(g_w)
     return xc_ztmn, xc_gmn
 
 
-def averages_comp(fld, g_w, d_s, dims):
-    """Compute the global mean averages of reservoirs and conversion terms.
-
-    Arguments:
-    - fld: the component of the LEC (time, lev, lat, wave);
-    - g_w: the Gaussian weights for meridional averaging;
-    - d_s: the Delta sigma of the sigma levels;
-    - dims: a list containing the dimensions length0;
-    """
-    fld_tmn = np.nanmean(fld, axis=1)
-    fld_tgmn = globall_cg(fld_tmn, g_w, d_s, dims)
-    return fld_tgmn
-
-
 def bsslzr(kdim):
     """Obtain parameters for the Gaussian coefficients.
 
@@ -471,18 +429,48 @@ def init(logfile, filep):
     return ta_c, ua_c, va_c, wap_c, dims, lev, lat, log
 
 
+def lec_year(model, wdir, ldir, year, energy_file, tas_file):
+    """Compute the LEC for a single year.
+
+    Arguments:
+    - model: the model name;
+    - wdir: the working directory where the outputs are stored;
+    - ldir: the directory where the tables and flux diagrams are stored;
+    - year: the year that is considered;
+    - energy_file: the file containing the preprocessed ta, ua, va, wap
+      fields;
+    - tas_file: the file containing the near-surface temperature;
+    """
+    cdo = Cdo()
+    enfile_yr = wdir + '/inputen_{}.nc'.format(year)
+    tasfile_yr = wdir + '/tas_yr_{}.nc'.format(year)
+    tadiag_file = wdir + '/ta_filled_{}.nc'.format(year)
+    ncfile = wdir + '/fourier_coeff_{}.nc'.format(year)
+    cdo.selyear(year, input=energy_file, options='-b F32', output=enfile_yr)
+    cdo.selyear(year, input=tas_file, options='-b F32', output=tasfile_yr)
+    fourier_coefficients.fourier_coeff(tadiag_file, ncfile, enfile_yr,
+                                       tasfile_yr)
+    diagfile = (ldir + '/{}_{}_lec_diagram.png'.format(model, year))
+    logfile = (ldir + '/{}_{}_lec_table.txt'.format(model, year))
+    lect = lorenz(wdir, model, year, ncfile, diagfile, logfile)
+    for filen in [enfile_yr, tasfile_yr, tadiag_file, ncfile]:
+        os.remove(filen)
+    return lect
+
+
 def makek(u_t, v_t):
     """Compute the kinetic energy reservoirs from u and v.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
-    - v_t: a 3D meridional velocity field;
+    - u_t: a 3D zonal velocity field (optionally with a leading time axis);
+    - v_t: a 3D meridional velocity field (optionally with a leading time
+      axis);
     """
     ck1 = u_t * np.conj(u_t)
     ck2 = v_t * np.conj(v_t)
     e_k = np.real(ck1 + ck2)
-    e_k[:, :, 0] = 0.5 * np.real(u_t[:, :, 0] * u_t[:, :, 0] +
-                                 v_t[:, :, 0] * v_t[:, :, 0])
+    e_k[..., 0] = 0.5 * np.real(u_t[..., 0] * u_t[..., 0] +
+                                v_t[..., 0] * v_t[..., 0])
     return e_k
 
 
@@ -490,323 +478,184 @@ def makea(t_t, t_g, gam):
     """Compute the kinetic energy reservoirs from t.
 
     Arguments:
-    - t_t_ a 3D temperature field;
-    - t_g: a temperature vertical profile;
+    - t_t_ a 3D temperature field (optionally with a leading time axis);
+    - t_g: a temperature vertical profile (time, lev) or (lev);
     - gam: a vertical profile of the stability parameter;
     """
     ape = gam[:, np.newaxis, np.newaxis] * np.real(t_t * np.conj(t_t))
-    ape[:, :, 0] = (gam[:, np.newaxis] * 0.5 * np.real(
-        (t_t[:, :, 0] - t_g[:, np.newaxis]) *
-        (t_t[:, :, 0] - t_g[:, np.newaxis])))
+    ape[..., 0] = (gam[:, np.newaxis] * 0.5 * np.real(
+        (t_t[..., 0] - t_g[..., np.newaxis]) *
+        (t_t[..., 0] - t_g[..., np.newaxis])))
     return ape
 
 
+def merid_diff(fld, lat):
+    """Compute the meridional derivative of a (lev, lat, ...) field.
+
+    Centred differences are used at interior latitudes, one-sided
+    differences at the first and last latitude.
+
+    Arguments:
+    - fld: the field, with latitudes along the second axis;
+    - lat: the latitudes in radians;
+    """
+    lat = np.asarray(lat)
+    dfld = np.concatenate(
+        [fld[:, 1:2] - fld[:, :1], fld[:, 2:] - fld[:, :-2],
+         fld[:, -1:] - fld[:, -2:-1]],
+        axis=1)
+    dlat = np.concatenate(
+        [lat[1:2] - lat[:1], lat[2:] - lat[:-2], lat[-1:] - lat[-2:-1]])
+    return dfld / np.reshape(dlat, (len(dlat), ) + (1, ) * (dfld.ndim - 2))
+
+
 def mka2k(wap, t_t, w_g, t_g, p_l):
     """Compute the KE to APE energy conversions from t and w.
 
     Arguments:
-    - wap: a 3D vertical velocity field;
-    - t_t: a 3D temperature field;
-    - w_g: a vertical velocity vertical profile;
-    - t_g: a temperature vertical profile;
+    - wap: a 3D vertical velocity field (optionally with a leading time axis);
+    - t_t: a 3D temperature field (optionally with a leading time axis);
+    - w_g: a vertical velocity vertical profile (time, lev) or (lev);
+    - t_g: a temperature vertical profile (time, lev) or (lev);
     - p_l: the pressure levels;
     """
     a2k = -(R / p_l[:, np.newaxis, np.newaxis] *
-            (t_t * np.conj(wap) + np.conj(t_t) * wap))
-    a2k[:, :, 0] = -(R / p_l[:, np.newaxis] *
-                     (t_t[:, :, 0] - t_g[:, np.newaxis]) *
-                     (wap[:, :, 0] - w_g[:, np.newaxis]))
+            np.real(t_t * np.conj(wap) + np.conj(t_t) * wap))
+    a2k[..., 0] = -(R / p_l[:, np.newaxis] *
+                    np.real((t_t[..., 0] - t_g[..., np.newaxis]) *
+                            (wap[..., 0] - w_g[..., np.newaxis])))
     return a2k
 
 
-def mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam, nlat, nlev):
+def mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam):
     """Compute the zonal mean - eddy APE conversions from t and v.
 
     Arguments:
-    - v_t: a 3D meridional velocity field;
-    - wap: a 3D vertical velocity field;
-    - t_t: a 3D temperature field;
+    - v_t: a 3D meridional velocity field (optionally with a leading time
+      axis);
+    - wap: a 3D vertical velocity field (optionally with a leading time axis);
+    - t_t: a 3D temperature field (optionally with a leading time axis);
     - ttt: a climatological mean 3D temperature field;
+    - ttg: a climatological mean temperature vertical profile;
     - p_l: the pressure levels;
     - lat: the latudinal dimension;
     - gam: a vertical profile of the stability parameter;
-    - nlat: the number of latitudes;
-    - nlev: the number of levels;
     """
-    dtdp = np.zeros([nlev, nlat])
-    dtdy = np.zeros([nlev, nlat])
-    for l_l in np.arange(nlev):
-        if l_l == 0:
-            t_1 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
-            t_2 = np.real(ttt[l_l + 1, :, 0]) - ttg[l_l + 1]
-            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
-        elif l_l == nlev - 1:
-            t_1 = np.real(ttt[l_l - 1, :, 0]) - ttg[l_l - 1]
-            t_2 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
-            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
-        else:
-            t_1 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
-            t_2 = np.real(ttt[l_l + 1, :, 0]) - ttg[l_l + 1]
-            dtdp1 = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
-            t_2 = t_1
-            t_1 = np.real(ttt[l_l - 1, :, 0]) - ttg[l_l - 1]
-            dtdp2 = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
-            dtdp[l_l, :] = ((dtdp1 * (p_l[l_l] - p_l[l_l - 1]) + dtdp2 *
-                             (p_l[l_l + 1] - p_l[l_l])) /
-                            (p_l[l_l + 1] - p_l[l_l - 1]))
-        dtdp[l_l, :] = dtdp[l_l, :] - (R / (CP * p_l[l_l]) *
-                                       (ttt[l_l, :, 0] - ttg[l_l]))
-    for i_l in np.arange(nlat):
-        if i_l == 0:
-            t_1 = np.real(ttt[:, i_l, 0])
-            t_2 = np.real(ttt[:, i_l + 1, 0])
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l])
-        elif i_l == nlat - 1:
-            t_1 = np.real(ttt[:, i_l - 1, 0])
-            t_2 = np.real(ttt[:, i_l, 0])
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l] - lat[i_l - 1])
-        else:
-            t_1 = np.real(ttt[:, i_l - 1, 0])
-            t_2 = np.real(ttt[:, i_l + 1, 0])
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l - 1])
-    dtdy = dtdy / AA
+    t_z = np.real(ttt[:, :, 0])
+    t_a = t_z - ttg[:, np.newaxis]
+    dtdp = (np.gradient(t_a, p_l, axis=0) -
+            R / (CP * p_l[:, np.newaxis]) * t_a)
+    dtdy = merid_diff(t_z, lat) / AA
     c_1 = np.real(v_t * np.conj(t_t) + t_t * np.conj(v_t))
     c_2 = np.real(wap * np.conj(t_t) + t_t * np.conj(wap))
     ae2az = (gam[:, np.newaxis, np.newaxis] *
              (dtdy[:, :, np.newaxis] * c_1 + dtdp[:, :, np.newaxis] * c_2))
-    ae2az[:, :, 0] = 0.
+    ae2az[..., 0] = 0.
     return ae2az
 
 
-def mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat, nlat, ntp, nlev):
+def mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat):
     """Compute the zonal mean - eddy KE conversions from u and v.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
-    - v_t: a 3D meridional velocity field;
-    - wap: a 3D vertical velocity field;
+    - u_t: a 3D zonal velocity field (optionally with a leading time axis);
+    - v_t: a 3D meridional velocity field (optionally with a leading time
+      axis);
+    - wap: a 3D vertical velocity field (optionally with a leading time axis);
     - utt: a climatological mean 3D zonal velocity field;
     - vtt: a climatological mean 3D meridional velocity field;
     - p_l: the pressure levels;
     - lat: the latitude dimension;
-    - nlat: the number of latitudes;
-    - ntp: the number of wavenumbers;
-    - nlev: the number of vertical levels;
     """
-    dudp = np.zeros([nlev, nlat])
-    dvdp = np.zeros([nlev, nlat])
-    dudy = np.zeros([nlev, nlat])
-    dvdy = np.zeros([nlev, nlat])
-    for l_l in np.arange(nlev):
-        if l_l == 0:
-            dudp[l_l, :] = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
-                            (p_l[l_l + 1] - p_l[l_l]))
-            dvdp[l_l, :] = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
-                            (p_l[l_l + 1] - p_l[l_l]))
-        elif l_l == nlev - 1:
-            dudp[l_l, :] = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
-                            (p_l[l_l] - p_l[l_l - 1]))
-            dvdp[l_l, :] = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
-                            (p_l[l_l] - p_l[l_l - 1]))
-        else:
-            dudp1 = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
-                     (p_l[l_l + 1] - p_l[l_l]))
-            dvdp1 = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
-                     (p_l[l_l + 1] - p_l[l_l]))
-            dudp2 = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
-                     (p_l[l_l] - p_l[l_l - 1]))
-            dvdp2 = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
-                     (p_l[l_l] - p_l[l_l - 1]))
-            dudp[l_l, :] = ((dudp1 * (p_l[l_l] - p_l[l_l - 1]) + dudp2 *
-                             (p_l[l_l + 1] - p_l[l_l])) /
-                            (p_l[l_l + 1] - p_l[l_l - 1]))
-            dvdp[l_l, :] = ((dvdp1 * (p_l[l_l] - p_l[l_l - 1]) + dvdp2 *
-                             (p_l[l_l + 1] - p_l[l_l])) /
-                            (p_l[l_l + 1] - p_l[l_l - 1]))
-    for i_l in np.arange(nlat):
-        if i_l == 0:
-            dudy[:, i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l, 0])) /
-                            (lat[i_l + 1] - lat[i_l]))
-            dvdy[:, i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l, 0])) /
-                            (lat[i_l + 1] - lat[i_l]))
-        elif i_l == nlat - 1:
-            dudy[:, i_l] = ((np.real(utt[:, i_l, 0] - utt[:, i_l - 1, 0])) /
-                            (lat[i_l] - lat[i_l - 1]))
-            dvdy[:, i_l] = ((np.real(vtt[:, i_l, 0] - vtt[:, i_l - 1, 0])) /
-                            (lat[i_l] - lat[i_l - 1]))
-        else:
-            dudy[:, i_l] = (
-                (np.real(utt[:, i_l + 1, 0] - utt[:, i_l - 1, 0])) /
-                (lat[i_l + 1] - lat[i_l - 1]))
-            dvdy[:, i_l] = (
-                (np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l - 1, 0])) /
-                (lat[i_l + 1] - lat[i_l - 1]))
-    dudy = dudy / AA
-    dvdy = dvdy / AA
-    c_1 = np.zeros([nlev, nlat, ntp - 1])
-    c_2 = np.zeros([nlev, nlat, ntp - 1])
-    c_3 = np.zeros([nlev, nlat, ntp - 1])
-    c_4 = np.zeros([nlev, nlat, ntp - 1])
-    c_5 = np.zeros([nlev, nlat, ntp - 1])
-    c_6 = np.zeros([nlev, nlat, ntp - 1])
-    u_u = u_t * np.conj(u_t) + u_t * np.conj(u_t)
-    u_v = u_t * np.conj(v_t) + v_t * np.conj(u_t)
-    v_v = v_t * np.conj(v_t) + v_t * np.conj(v_t)
-    u_w = u_t * np.conj(wap) + wap * np.conj(u_t)
-    v_w = v_t * np.conj(wap) + wap * np.conj(v_t)
-    for i_l in np.arange(nlat):
-        c_1[:, i_l, :] = dudy[:, i_l][:, np.newaxis] * u_v[:, i_l, :]
-        c_2[:, i_l, :] = dvdy[:, i_l][:, np.newaxis] * v_v[:, i_l, :]
-        c_5[:, i_l, :] = (np.tan(lat[i_l]) / AA *
-                          np.real(utt[:, i_l, 0])[:, np.newaxis] *
-                          (u_v[:, i_l, :]))
-        c_6[:, i_l, :] = -(np.tan(lat[i_l]) / AA *
-                           np.real(vtt[:, i_l, 0])[:, np.newaxis] *
-                           (u_u[:, i_l, :]))
-    for l_l in np.arange(nlev):
-        c_3[l_l, :, :] = dudp[l_l, :][:, np.newaxis] * u_w[l_l, :, :]
-        c_4[l_l, :, :] = dvdp[l_l, :][:, np.newaxis] * v_w[l_l, :, :]
-    ke2kz = (c_1 + c_2 + c_3 + c_4 + c_5 + c_6)
-    ke2kz[:, :, 0] = 0.
+    u_z = np.real(utt[:, :, 0])
+    v_z = np.real(vtt[:, :, 0])
+    dudp = np.gradient(u_z, p_l, axis=0)
+    dvdp = np.gradient(v_z, p_l, axis=0)
+    dudy = merid_diff(u_z, lat) / AA
+    dvdy = merid_diff(v_z, lat) / AA
+    tan_lat = np.tan(lat)[np.newaxis, :] / AA
+    u_u = np.real(u_t * np.conj(u_t) + u_t * np.conj(u_t))
+    u_v = np.real(u_t * np.conj(v_t) + v_t * np.conj(u_t))
+    v_v = np.real(v_t * np.conj(v_t) + v_t * np.conj(v_t))
+    u_w = np.real(u_t * np.conj(wap) + wap * np.conj(u_t))
+    v_w = np.real(v_t * np.conj(wap) + wap * np.conj(v_t))
+    ke2kz = ((dudy + tan_lat * u_z)[:, :, np.newaxis] * u_v +
+             dvdy[:, :, np.newaxis] * v_v + dudp[:, :, np.newaxis] * u_w +
+             dvdp[:, :, np.newaxis] * v_w -
+             (tan_lat * v_z)[:, :, np.newaxis] * u_u)
+    ke2kz[..., 0] = 0.
     return ke2kz
 
 
-def mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
+def mkatas(u_t, v_t, wap, t_t, ttt, gam, p_l, lat):
     """Compute the stat.-trans. eddy APE conversions from u, v, wap and t.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
-    - v_t: a 3D meridional velocity field;
-    - wap: a 3D vertical velocity field;
-    - t_t: a 3D temperature field;
-    - ttt: a climatological mean 3D temperature field;
-    - g_w: the gaussian weights;
+    - u_t: a 3D zonal velocity field (optionally with a leading time axis);
+    - v_t: a 3D meridional velocity field (optionally with a leading time
+      axis);
+    - wap: a 3D vertical velocity field (optionally with a leading time axis);
+    - t_t: a 3D temperature field (optionally with a leading time axis);
+    - ttt: a climatological mean zonal mean temperature field (lev, lat);
+    - gam: the stability parameter (lev, lat);
     - p_l: the pressure levels;
     - lat: the latitude dimension;
-    - nlat: the number of latitudes;
-    - ntp: the number of wavenumbers;
-    - nlev: the number of vertical levels;
     """
-    t_r = np.fft.ifft(t_t, axis=2)
-    u_r = np.fft.ifft(u_t, axis=2)
-    v_r = np.fft.ifft(v_t, axis=2)
-    w_r = np.fft.ifft(wap, axis=2)
-    tur = t_r * u_r
-    tvr = t_r * v_r
-    twr = t_r * w_r
-    t_u = np.fft.fft(tur, axis=2)
-    t_v = np.fft.fft(tvr, axis=2)
-    t_w = np.fft.fft(twr, axis=2)
-    c_1 = (t_u * np.conj(ttt[:, :, np.newaxis]) -
-           ttt[:, :, np.newaxis] * np.conj(t_u))
-    c_6 = (t_w * np.conj(ttt[:, :, np.newaxis]) -
-           ttt[:, :, np.newaxis] * np.conj(t_w))
-    c_2 = np.zeros([nlev, nlat, ntp - 1])
-    c_3 = np.zeros([nlev, nlat, ntp - 1])
-    c_5 = np.zeros([nlev, nlat, ntp - 1])
-    for i_l in range(nlat):
-        if i_l == 0:
-            c_2[:, i_l, :] = (
-                t_v[:, i_l, :] / (AA * (lat[i_l + 1] - lat[i_l])) *
-                np.conj(ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
-            c_3[:, i_l, :] = (
-                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l + 1] - lat[i_l])) *
-                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
-        elif i_l == nlat - 1:
-            c_2[:, i_l, :] = (
-                t_v[:, i_l, :] / (AA * (lat[i_l] - lat[i_l - 1])) *
-                np.conj(ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-            c_3[:, i_l, :] = (
-                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l] - lat[i_l - 1])) *
-                (ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-        else:
-            c_2[:, i_l, :] = (t_v[:, i_l, :] /
-                              (AA * (lat[i_l + 1] - lat[i_l - 1])) *
-                              np.conj(ttt[:, i_l + 1, np.newaxis] -
-                                      ttt[:, i_l - 1, np.newaxis]))
-            c_3[:, i_l, :] = (
-                np.conj(t_v[:, i_l, :]) / (AA *
-                                           (lat[i_l + 1] - lat[i_l - 1])) *
-                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-    for l_l in range(nlev):
-        if l_l == 0:
-            c_5[l_l, :, :] = (
-                (ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
-                (p_l[l_l + 1] - p_l[l_l]))
-        elif l_l == nlev - 1:
-            c_5[l_l, :, :] = (
-                (ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
-                (p_l[l_l] - p_l[l_l - 1]))
-        else:
-            c51 = ((ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
-                   (p_l[l_l + 1] - p_l[l_l]))
-            c52 = ((ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
-                   (p_l[l_l] - p_l[l_l - 1]))
-            c_5[l_l, :, :] = ((c51 * (p_l[l_l] - p_l[l_l - 1]) + c52 *
-                               (p_l[l_l + 1] - p_l[l_l])) /
-                              (p_l[l_l + 1] - p_l[l_l - 1]))
-    k_k = np.arange(0, ntp - 1)
+    t_r = np.fft.ifft(t_t, axis=-1)
+    u_r = np.fft.ifft(u_t, axis=-1)
+    v_r = np.fft.ifft(v_t, axis=-1)
+    w_r = np.fft.ifft(wap, axis=-1)
+    t_u = np.fft.fft(t_r * u_r, axis=-1)
+    t_v = np.fft.fft(t_r * v_r, axis=-1)
+    t_w = np.fft.fft(t_r * w_r, axis=-1)
+    ttt = ttt[:, :, np.newaxis]
+    c_1 = t_u * np.conj(ttt) - ttt * np.conj(t_u)
+    c_6 = t_w * np.conj(ttt) - ttt * np.conj(t_w)
+    dtdy = merid_diff(ttt, lat) / AA
+    c_2 = t_v * np.conj(dtdy)
+    c_3 = np.conj(t_v) * dtdy
+    c_5 = np.real(np.gradient(ttt, p_l, axis=0))
+    k_k = np.arange(0, np.shape(t_t)[-1])
     at2as = (((k_k - 1)[np.newaxis, np.newaxis, :] * np.imag(c_1) /
               (AA * np.cos(lat[np.newaxis, :, np.newaxis])) +
               np.real(t_w * np.conj(c_5) + np.conj(t_w) * c_5) +
-              np.real(c_2 + c_3) + R /
+              np.real(c_2) + np.real(c_3) + R /
               (CP * p_l[:, np.newaxis, np.newaxis]) * np.real(c_6)) *
-             g_w[:, :, np.newaxis])
-    at2as[:, :, 0] = 0.
+             gam[:, :, np.newaxis])
+    at2as[..., 0] = 0.
     return at2as
 
 
-def mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
+def mkktks(u_t, v_t, utt, vtt, lat):
     """Compute the stat.-trans. eddy KE conversions from u, v and t.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
-    - v_t: a 3D meridional velocity field;
+    - u_t: a 3D zonal velocity field (optionally with a leading time axis);
+    - v_t: a 3D meridional velocity field (optionally with a leading time
+      axis);
     - utt: a climatological mean 3D zonal velocity field;
     - vtt: a climatological mean 3D meridional velocity field;
     - lat: the latitude dimension;
-    - nlat: the number of latitudes;
-    - ntp: the number of wavenumbers;
-    - nlev: the number of vertical levels;
     """
-    dut = np.zeros([nlev, nlat, ntp - 1])
-    dvt = np.zeros([nlev, nlat, ntp - 1])
-    dlat = np.zeros([nlat])
-    u_r = np.fft.irfft(u_t, axis=2)
-    v_r = np.fft.irfft(v_t, axis=2)
-    uur = u_r * u_r
-    uvr = u_r * v_r
-    vvr = v_r * v_r
-    u_u = np.fft.rfft(uur, axis=2)
-    v_v = np.fft.rfft(vvr, axis=2)
-    u_v = np.fft.rfft(uvr, axis=2)
+    u_r = np.fft.irfft(u_t, axis=-1)
+    v_r = np.fft.irfft(v_t, axis=-1)
+    u_u = np.fft.rfft(u_r * u_r, axis=-1)
+    v_v = np.fft.rfft(v_r * v_r, axis=-1)
+    u_v = np.fft.rfft(u_r * v_r, axis=-1)
     c_1 = u_u * np.conj(u_t) - u_t * np.conj(u_u)
     # c_3 = u_v * np.conj(u_t) + u_t * np.conj(u_v)
     c_5 = u_u * np.conj(v_t) + v_t * np.conj(u_u)
     c_6 = u_v * np.conj(v_t) - v_t * np.conj(u_v)
-    for i_l in range(nlat):
-        if i_l == 0:
-            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l, :])
-            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l, :])
-            dlat[i_l] = (lat[i_l + 1] - lat[i_l])
-        elif i_l == nlat - 1:
-            dut[:, i_l, :] = (utt[:, i_l, :] - utt[:, i_l - 1, :])
-            dvt[:, i_l, :] = (vtt[:, i_l, :] - vtt[:, i_l - 1, :])
-            dlat[i_l] = (lat[i_l] - lat[i_l - 1])
-        else:
-            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l - 1, :])
-            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l - 1, :])
-            dlat[i_l] = (lat[i_l + 1] - lat[i_l - 1])
-    c21 = np.conj(u_u) * dut / dlat[np.newaxis, :, np.newaxis]
-    c22 = u_u * np.conj(dut) / dlat[np.newaxis, :, np.newaxis]
-    c41 = np.conj(v_v) * dvt / dlat[np.newaxis, :, np.newaxis]
-    c42 = v_v * np.conj(dvt) / dlat[np.newaxis, :, np.newaxis]
-    k_k = np.arange(0, ntp - 1)
-    kt2ks = (np.real(c21 + c22 + c41 + c42) / AA +
+    dudy = merid_diff(np.real(utt), lat)
+    dvdy = merid_diff(np.real(vtt), lat)
+    c_2 = np.real(np.conj(u_u) + u_u) * dudy
+    c_4 = np.real(np.conj(v_v) + v_v) * dvdy
+    k_k = np.arange(0, np.shape(u_t)[-1])
+    kt2ks = ((c_2 + c_4) / AA +
              np.tan(lat)[np.newaxis, :, np.newaxis] * np.real(c_1 - c_5) / AA +
              np.imag(c_1 + c_6) * (k_k - 1)[np.newaxis, np.newaxis, :] /
              (AA * np.cos(lat)[np.newaxis, :, np.newaxis]))
-    kt2ks[:, :, 0] = 0
+    kt2ks[..., 0] = 0
     return kt2ks
 
 
@@ -820,8 +669,7 @@ def output(fld, d_s, filenc, name, nc_f):
     - name: the variable name;
     - nc_f: the name of the output file (with path)
     """
-    fld_tmn = np.nanmean(fld, axis=1)
-    fld_aux = fld_tmn * d_s[:, np.newaxis, np.newaxis]
+    fld_aux = fld * d_s[:, np.newaxis, np.newaxis]
     fld_vmn = np.nansum(fld_aux, axis=0) / np.nansum(d_s)
     removeif(nc_f)
     pr_output(fld_vmn, name, filenc, nc_f)
@@ -864,7 +712,7 @@ def pr_output(varo, varname, filep, nc_f):
         w_nc_fid.variables[varname][:] = varo
 
 
-def preproc_lec(model, wdir, pdir, input_data):
+def preproc_lec(model, wdir, pdir, input_data, nproc=1):
     """Preprocess fields for LEC computations and send it to lorenz program.
 
     This function computes the interpolation of ta, ua, va, wap daily fields to
@@ -880,9 +728,9 @@ def preproc_lec(model, wdir, pdir, input_data):
       to store tables of conversion/reservoir terms and the flux diagram for
       year;
     - filelist: a list of file names containing the input fields;
+    - nproc: the number of processes computing the LEC of different years.
     """
     cdo = Cdo()
-    fourc = fourier_coefficients
     ta_file = e.select_metadata(input_data, short_name='ta',
                                 dataset=model)[0]['filename']
     tas_file = e.select_metadata(input_data, short_name='tas',
@@ -925,35 +773,16 @@ def preproc_lec(model, wdir, pdir, input_data):
                    output=energy3_file)
     yrs = cdo.showyear(input=energy3_file)
     yrs = str(yrs)
-    yrs2 = yrs.split()
-    y_i = 0
-    lect = np.zeros(len(yrs2))
-    for y_r in yrs2:
-        y_rl = [y_n for y_n in y_r]
-        y_ro = ''
-        for e_l in y_rl:
-            e_l = str(e_l)
-            if e_l.isdigit() is True:
-                y_ro += e_l
-        # print(filter(str.isdigit, str(y_r)))
-        enfile_yr = wdir + '/inputen.nc'
-        tasfile_yr = wdir + '/tas_yr.nc'
-        tadiag_file = wdir + '/ta_filled.nc'
-        ncfile = wdir + '/fourier_coeff.nc'
-        cdo.selyear(y_ro,
-                    input=energy3_file,
-                    options='-b F32',
-                    output=enfile_yr)
-        cdo.selyear(y_ro, input=tas_file, options='-b F32', output=tasfile_yr)
-        fourc.fourier_coeff(tadiag_file, ncfile, enfile_yr, tasfile_yr)
-        diagfile = (ldir + '/{}_{}_lec_diagram.png'.format(model, y_ro))
-        logfile = (ldir + '/{}_{}_lec_table.txt'.format(model, y_ro))
-        lect[y_i] = lorenz(wdir, model, y_ro, ncfile, diagfile, logfile)
-        y_i = y_i + 1
-        os.remove(enfile_yr)
-        os.remove(tasfile_yr)
-        os.remove(tadiag_file)
-        os.remove(ncfile)
+    years = []
+    for y_r in yrs.split():
+        years.append(''.join(e_l for e_l in str(y_r) if e_l.isdigit()))
+    args = [(model, wdir, ldir, y_ro, energy3_file, tas_file)
+            for y_ro in years]
+    if nproc > 1 and len(years) > 1:
+        with get_context('spawn').Pool(min(nproc, len(years))) as pool:
+            lect = np.array(pool.starmap(lec_year, args))
+    else:
+        lect = np.array([lec_year(*arg) for arg in args])
     os.remove(maskorog)
     os.remove(ua_file_mask)
     os.remove(va_file_mask)
@@ -969,30 +798,17 @@ def removeif(filename):
         pass
 
 
-def stabil(ta_gmn, p_l, nlev):
+def stabil(ta_gmn, p_l):
     """Compute the stability parameter from temp. and pressure levels.
 
     Arguments
-    - ta_gmn: a temperature vertical profile;
+    - ta_gmn: a temperature vertical profile (lev) or field (lev, lat);
     - p_l: the vertical levels;
-    - nlev: the number of vertical levels;
     """
     cpdr = CP / R
-    t_g = ta_gmn
-    g_s = np.zeros(nlev)
-    for i_l in range(nlev):
-        if i_l == 0:
-            dtdp = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
-        elif i_l == nlev - 1:
-            dtdp = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
-        else:
-            dtdp1 = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
-            dtdp2 = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
-            dtdp = ((dtdp1 * (p_l[i_l] - p_l[i_l - 1]) + dtdp2 *
-                     (p_l[i_l + 1] - p_l[i_l])) /
-                    (p_l[i_l + 1] - p_l[i_l - 1]))
-        g_s[i_l] = CP / (t_g[i_l] - p_l[i_l] * dtdp * cpdr)
-    return g_s
+    dtdp = np.gradient(ta_gmn, p_l, axis=0)
+    p_l = np.reshape(p_l, (len(p_l), ) + (1, ) * (np.ndim(ta_gmn) - 1))
+    return CP / (ta_gmn - p_l * dtdp * cpdr)
 
 
 def table(varin, ntp, name, logfile, flag):
@@ -1017,6 +833,57 @@ def table(varin, ntp, name, logfile, flag):
     write_to_tab(logfile, name, vared_tog, varzon)
 
 
+def transient(flds, flds_tmn, t_avg, p_l, lat, g_w, nchunk):
+    """Compute the time mean of the transient eddy reservoirs and conversions.
+
+    The anomalies with respect to the time mean are processed in chunks of
+    nchunk time steps, with the time axis leading, and only the running time
+    sums of each LEC component are kept in memory.
+
+    Arguments:
+    - flds: a list with the ta, ua, va, wap Fourier coefficients as
+      (lev, time, lat, wave);
+    - flds_tmn: a list with the time means of the fields in flds;
+    - t_avg: a list with the zonal and global mean temperature and the
+      zonal and global mean stability parameter;
+    - p_l: the pressure levels;
+    - lat: the latitudes in radians;
+    - g_w: the Gaussian weights for meridional averaging;
+    - nchunk: the number of time steps that are processed at once;
+    """
+    ta_c, ua_c, va_c, wap_c = flds
+    ta_tmn, ua_tmn, va_tmn, wap_tmn = flds_tmn
+    ta_ztmn, ta_gmn, gam_ztmn, gam_tmn = t_avg
+    ntime = np.shape(ta_c)[1]
+    fld_sum = np.zeros((7, ) + np.shape(ta_tmn))
+    fld_num = np.zeros((7, ) + np.shape(ta_tmn))
+    for t_0 in range(0, ntime, nchunk):
+        t_s = slice(t_0, t_0 + nchunk)
+        ta_tan = np.moveaxis(ta_c[:, t_s], 1, 0) - ta_tmn
+        ua_tan = np.moveaxis(ua_c[:, t_s], 1, 0) - ua_tmn
+        va_tan = np.moveaxis(va_c[:, t_s], 1, 0) - va_tmn
+        wap_tan = np.moveaxis(wap_c[:, t_s], 1, 0) - wap_tmn
+        # Compute zonal means
+        _, ta_tgan = averages(ta_tan, g_w)
+        _, wap_tgan = averages(wap_tan, g_w)
+        lec = [
+            makek(ua_tan, va_tan),
+            makea(ta_tan, ta_tgan, gam_tmn),
+            mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan, p_l),
+            mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn, ta_gmn, p_l, lat,
+                   gam_tmn),
+            mkkekz(ua_tan, va_tan, wap_tan, ua_tmn, va_tmn, p_l, lat),
+            mkatas(ua_tan, va_tan, wap_tan, ta_tan, ta_ztmn, gam_ztmn, p_l,
+                   lat),
+            mkktks(ua_tan, va_tan, ua_tmn, va_tmn, lat)
+        ]
+        for i_c, fld in enumerate(lec):
+            fld = np.asarray(fld)
+            fld_sum[i_c] += np.nansum(fld, axis=0)
+            fld_num[i_c] += np.sum(~np.isnan(fld), axis=0)
+    return fld_sum / fld_num
+
+
 def varatts(w_nc_var, varname, tres, vres):
     """Add attibutes to the variables, depending on name and time res.
 
@@ -23,14 +23,15 @@ Authors: Frank Lunkeit and Valerio Lembo (University of Hamburg)
 Created on Fri Jun 15 10:06:30 2018
 """
 import os
+from contextlib import ExitStack
 from shutil import move
 
 import numpy as np
-from cdo import Cdo
 from netCDF4 import Dataset
 
 import esmvaltool.diag_scripts.shared as e
-from esmvaltool.diag_scripts.thermodyn_diagtool import fourier_coefficients
+from esmvaltool.diag_scripts.thermodyn_diagtool import (cdo_numpy,
+                                                        fourier_coefficients)
 
 ALV = 2.5008e6  # Latent heat of vaporization
 G_0 = 9.81  # Gravity acceleration
@@ -46,6 +47,7 @@ RIC_RS = 0.39  # Critical Richardson number for stable layer
 RIC_RU = 0.28  # Critical Richardson number for unstable layer
 L_C = 2501000  # latent heat of condensation
 SIGMAINV = 17636684.3034  # inverse of the Stefan-Boltzmann constant
+NCHUNK = 120  # Number of time steps processed at once
 
 
 def init_mkthe_te(model, wdir, input_data):
@@ -59,7 +61,7 @@ def init_mkthe_te(model, wdir, input_data):
     Author:
     Valerio Lembo, University of Hamburg (2019).
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     rlut_file = e.select_metadata(input_data, short_name='rlut',
                                   dataset=model)[0]['filename']
     # Compute monthly mean fields from 2D surface daily fields
@@ -76,7 +78,7 @@ def init_mkthe_te(model, wdir, input_data):
     return te_ymm_file, te_gmean_constant, te_file
 
 
-def init_mkthe_wat(model, wdir, input_data, flags):
+def init_mkthe_wat(model, wdir, input_data, flags, store):
     """Compute auxiliary fields or perform time averaging of existing fields.
 
     Arguments:
@@ -87,28 +89,27 @@ def init_mkthe_wat(model, wdir, input_data, flags):
               entr: a flag for the material entropy production (y or n);
               met: a flag for the material entropy production method
               (1: indirect, 2, direct, 3: both));
+    - store: the store of the intermediate files of the model;
 
     Author:
     Valerio Lembo, University of Hamburg (2019).
     """
     wat = flags[0]
     if wat == 'True':
-        evspsbl_file, prr_file = wfluxes(model, wdir, input_data)
+        evspsbl_file, prr_file = store.get('wfluxes', wfluxes, model, wdir,
+                                           input_data)
         aux_files = [evspsbl_file, prr_file]
     return aux_files
 
 
-def init_mkthe_lec(model, wdir, input_data):
+def init_mkthe_lec(model, wdir, input_data, store):
     """Compute auxiliary fields or perform time averaging of existing fields.
 
     Arguments:
     - model: the model name;
     - wdir: the working directory where the outputs are stored;
     - filelist: a list of file names containing the input fields;
-    - flags: (wat: a flag for the water mass budget module (y or n),
-              entr: a flag for the material entropy production (y or n);
-              met: a flag for the material entropy production method
-              (1: indirect, 2, direct, 3: both));
+    - store: the store of the intermediate files of the model;
 
     Author:
     Valerio Lembo, University of Hamburg (2019).
@@ -117,18 +118,34 @@ def init_mkthe_lec(model, wdir, input_data):
                                  dataset=model)[0]['filename']
     vas_file = e.select_metadata(input_data, short_name='vas',
                                  dataset=model)[0]['filename']
-    uasmn_file = mon_from_day(wdir, model, 'uas', uas_file)
-    vasmn_file = mon_from_day(wdir, model, 'vas', vas_file)
+    uasmn_file = store.get('uas_mm', mon_from_day, wdir, model, 'uas',
+                           uas_file)
+    vasmn_file = store.get('vas_mm', mon_from_day, wdir, model, 'vas',
+                           vas_file)
     return uasmn_file, vasmn_file
 
 
-def init_mkthe_direntr(model, wdir, input_data, te_file, flags):
-    cdo = Cdo()
-    wat = flags[0]
+def init_mkthe_direntr(model, wdir, input_data, te_file, flags, store):
+    """Compute the auxiliary fields for the direct method.
+
+    The files are registered in the store of the model, fields shared with
+    the other modules (e.g. the water fluxes or the monthly mean winds) are
+    only computed if they are not already there.
+
+    Arguments:
+    - model: the model name;
+    - wdir: the working directory where the outputs are stored;
+    - input_data: a list of the metadata of the input files;
+    - te_file: the file containing the emission temperature;
+    - flags: (wat: a flag for the water mass budget module (y or n),
+              entr: a flag for the material entropy production (y or n);
+              met: a flag for the material entropy production method
+              (1: indirect, 2, direct, 3: both));
+    - store: the store of the intermediate files of the model;
+    """
+    cdo = cdo_numpy.get_cdo()
     met = flags[3]
     if met in {'2', '3'}:
-        if wat == 'False':
-            evspsbl_file, prr_file = wfluxes(model, wdir, input_data)
         hfss_file = e.select_metadata(input_data,
                                       short_name='hfss',
                                       dataset=model)[0]['filename']
@@ -152,18 +169,18 @@ def init_mkthe_direntr(model, wdir, input_data, te_file, flags):
                                      short_name='vas',
                                      dataset=model)[0]['mip']
         if uas_tres == 'day':
-            uasmn_file = wdir + '/{}_uas_mm.nc'.format(model)
-            uasmn_file = mon_from_day(wdir, model, 'uas', uas_file)
-            uas_file = uasmn_file
+            uas_file = store.get('uas_mm', mon_from_day, wdir, model, 'uas',
+                                 uas_file)
         if vas_tres == 'day':
-            vasmn_file = wdir + '/{}_uas_mm.nc'.format(model)
-            vasmn_file = mon_from_day(wdir, model, 'vas', vas_file)
-            vas_file = vasmn_file
-        evspsbl_file, prr_file = wfluxes(model, wdir, input_data)
+            vas_file = store.get('vas_mm', mon_from_day, wdir, model, 'vas',
+                                 vas_file)
+        evspsbl_file, prr_file = store.get('wfluxes', wfluxes, model, wdir,
+                                           input_data)
         mk_list = [
             ts_file, hus_file, ps_file, uas_file, vas_file, hfss_file, te_file
         ]
-        htop_file, tabl_file, tlcl_file = mkthe_main(wdir, mk_list, model)
+        htop_file, tabl_file, tlcl_file = store.get('bl_fields', mkthe_main,
+                                                    wdir, mk_list, model)
         # Working temperatures for the hydrological cycle
         tcloud_file = (wdir + '/{}_tcloud.nc'.format(model))
         removeif(tcloud_file)
@@ -183,6 +200,9 @@ def init_mkthe_direntr(model, wdir, input_data, te_file, flags):
         cdo.fldmean(input='-mulc,0.5 -add {} {}'.format(ts_file, tabl_file),
                     options='-b F32',
                     output=tasvert_file)
+        store.add('tcloud', tcloud_file)
+        store.add('tcolumn', tcolumn_file)
+        store.add('tasvert', tasvert_file)
         aux_files = [
             evspsbl_file, htop_file, prr_file, tabl_file, tasvert_file,
             tcloud_file, tcolumn_file, tlcl_file
@@ -192,92 +212,28 @@ def init_mkthe_direntr(model, wdir, input_data, te_file, flags):
     return aux_files
 
 
-def input_fields(wdir, file_list):
-    """Manipulate input fields and read datasets.
+def bl_fields(hfss, huss, p_s, t_e, t_s, vv_hor):
+    """Compute the LCL temperature, the BL top temperature and height.
 
     Arguments:
-    - wdir: the working directory path;
-    - file_list: the list of file containing ts, hus,
-    ps, uas, vas, hfss, te;
-
-    Author:
-    Valerio Lembo, University of Hamburg, 2019
-    """
-    cdo = Cdo()
-    ts_miss_file = wdir + '/ts.nc'
-    removeif(ts_miss_file)
-    cdo.setctomiss('0', input=file_list[0], output=ts_miss_file)
-    hus_miss_file = wdir + '/hus.nc'
-    removeif(hus_miss_file)
-    cdo.setctomiss('0', input=file_list[1], output=hus_miss_file)
-    ps_miss_file = wdir + '/ps.nc'
-    removeif(ps_miss_file)
-    cdo.setctomiss('0', input=file_list[2], output=ps_miss_file)
-    vv_missfile = wdir + '/V.nc'
-    removeif(vv_missfile)
-    vv_file = wdir + '/V_miss.nc'
-    removeif(vv_file)
-    cdo.sqrt(input='-add -sqr {} -sqr {}'.format(file_list[3], file_list[4]),
-             options='-b F32',
-             output=vv_file)
-    cdo.setctomiss('0', input=vv_file, output=vv_missfile)
-    os.remove(vv_file)
-    hfss_miss_file = wdir + '/hfss.nc'
-    removeif(hfss_miss_file)
-    cdo.setctomiss('0', input=file_list[5], output=hfss_miss_file)
-    te_miss_file = wdir + '/te.nc'
-    removeif(te_miss_file)
-    cdo.setctomiss('0', input=file_list[6], output=te_miss_file)
-    with Dataset(ts_miss_file) as dataset:
-        t_s = dataset.variables['ts'][:, :, :]
-    with Dataset(hus_miss_file) as dataset:
-        hus = dataset.variables['hus'][:, :, :, :]
-        lev = dataset.variables['plev'][:]
-    with Dataset(ps_miss_file) as dataset:
-        p_s = dataset.variables['ps'][:, :, :]
-    with Dataset(vv_missfile) as dataset:
-        vv_hor = dataset.variables['uas'][:, :, :]
-    with Dataset(hfss_miss_file) as dataset:
-        hfss = dataset.variables['hfss'][:, :, :]
-    with Dataset(te_miss_file) as dataset:
-        t_e = dataset.variables['rlut'][:, :, :]
-    huss = hus[:, 0, :, :]
-    huss = np.where(lev[0] >= p_s, huss, 0.)
-    nlev = len(lev)
-    for l_l in range(nlev):
-        aux = hus[:, l_l, :, :]
-        aux = np.where((p_s >= lev[l_l]), aux, 0.)
-        huss = huss + aux
-    remove_files = [
-        ts_miss_file, hus_miss_file, ps_miss_file, vv_missfile, hfss_miss_file,
-        te_miss_file
-    ]
-    for filen in remove_files:
-        os.remove(filen)
-    return hfss, huss, p_s, t_e, t_s, vv_hor
-
-
-def mkthe_main(wdir, file_list, modelname):
-    """Compute the auxiliary variables for the Thermodynamic diagnostic tool.
-
-    Arguments:
-    - wdir: the working directory path;
-    - file_list: the list of file containing ts, hus,
-    ps, uas, vas, hfss, te;
-    - modelname: the name of the model from which the fields are;
+    - hfss: the surface turbulent sensible heat fluxes;
+    - huss: the near-surface specific humidity;
+    - p_s: the surface pressure;
+    - t_e: the emission temperature;
+    - t_s: the skin temperature;
+    - vv_hor: the near-surface horizontal wind speed;
     """
-    hfss, huss, p_s, t_e, t_s, vv_hor = input_fields(wdir, file_list)
-    ricr = RIC_RU
-    h_bl = H_U
-    ricr = np.where(hfss >= 0.75, ricr, RIC_RS)
-    h_bl = np.where(hfss >= 0.75, h_bl, H_S)
+    # The regime only depends on the flux values, not on their mask
+    unstable = np.ma.getdata(hfss) >= 0.75
+    ricr = np.where(unstable, RIC_RU, RIC_RS)
+    h_bl = np.where(unstable, H_U, H_S)
     ev_p = huss * p_s / (huss + GAS_CON / RV)  # Water vapour pressure
     td_inv = (1 / T_MELT) - (RV / ALV) * np.log(ev_p / RA_1)  # Dewpoint t.
     t_d = 1 / td_inv
     hlcl = 125. * (t_s - t_d)  # Empirical formula for LCL height
     #  Negative heights are replaced by the height of the stable
     #  boundary layer (lower constraint to the height of the cloud layer)
-    hlcl = np.where(hlcl >= 0., hlcl, h_bl)
+    hlcl = np.ma.where(hlcl >= 0., hlcl, h_bl)
     cp_d = GAS_CON / AKAP
     ztlcl = t_s - (G_0 / cp_d) * hlcl
     # Compute the pseudo-adiabatic lapse rate to obtain the height of cloud
@@ -292,14 +248,79 @@ def mkthe_main(wdir, file_list, modelname):
     thz = ths + 0.03 * ricr * (vv_hor)**2 / h_bl
     p_z = p_s * np.exp((-G_0 * h_bl) / (GAS_CON * t_s))  # Barometric eq.
     t_z = thz * (P_0 / p_z)**(-AKAP)
-    outlist = [ztlcl, t_z, htop]
-    htop_file, tabl_file, tlcl_file = write_output(wdir, modelname, file_list,
-                                                   outlist)
+    return ztlcl, t_z, htop
+
+
+def input_fields(datasets, t_s):
+    """Read a chunk of the input fields and mask the zero values.
+
+    The near-surface humidity is obtained from the humidity on the pressure
+    levels above the surface with a single masked reduction over the levels.
+
+    Arguments:
+    - datasets: the open datasets containing ts, hus, ps, uas, vas, hfss, te;
+    - t_s: the slice of the time steps to be read;
+
+    Author:
+    Valerio Lembo, University of Hamburg, 2019
+    """
+    t_s_fld, hus, p_s = [
+        np.ma.masked_equal(dataset.variables[name][t_s], 0.)
+        for dataset, name in zip(datasets[:3], ['ts', 'hus', 'ps'])
+    ]
+    hfss = np.ma.masked_equal(datasets[5].variables['hfss'][t_s], 0.)
+    t_e = np.ma.masked_equal(datasets[6].variables['rlut'][t_s], 0.)
+    uas = datasets[3].variables['uas'][t_s]
+    vas = datasets[4].variables['vas'][t_s]
+    vv_hor = np.ma.sqrt(uas**2 + vas**2).astype(np.float32)
+    vv_hor = np.ma.masked_equal(vv_hor, 0.)
+    lev = datasets[1].variables['plev'][:]
+    p_sd = np.ma.getdata(p_s)
+    weight = (p_sd[:, np.newaxis] >= lev[np.newaxis, :, np.newaxis,
+                                         np.newaxis]).astype(hus.dtype)
+    weight[:, 0] += lev[0] >= p_sd
+    huss = np.ma.sum(hus * weight, axis=1)
+    return hfss, huss, p_s, t_e, t_s_fld, vv_hor
+
+
+def mkthe_main(wdir, file_list, modelname, nchunk=NCHUNK):
+    """Compute the auxiliary variables for the Thermodynamic diagnostic tool.
+
+    The input fields are read in chunks of nchunk time steps and the
+    results are written to the output files before the next chunk is read.
+
+    Arguments:
+    - wdir: the working directory path;
+    - file_list: the list of file containing ts, hus,
+    ps, uas, vas, hfss, te;
+    - modelname: the name of the model from which the fields are;
+    - nchunk: the number of time steps that are processed at once;
+    """
+    htop_file, tabl_file, tlcl_file = write_output(wdir, modelname,
+                                                   file_list)
+    with ExitStack() as stack:
+        datasets = [
+            stack.enter_context(Dataset(filen)) for filen in file_list
+        ]
+        out_tlcl, out_tabl, out_htop = [
+            stack.enter_context(Dataset(filen, 'a'))
+            for filen in [tlcl_file, tabl_file, htop_file]
+        ]
+        ntime = len(datasets[0].variables['time'])
+        for t_0 in range(0, ntime, nchunk):
+            t_s = slice(t_0, t_0 + nchunk)
+            ztlcl, t_z, htop = bl_fields(*input_fields(datasets, t_s))
+            out_tlcl.variables['tlcl'][t_s] = np.ma.masked_inside(
+                ztlcl, 400., 1e36)
+            out_tabl.variables['tabl'][t_s] = np.ma.masked_inside(
+                t_z, 400., 1e36)
+            out_htop.variables['htop'][t_s] = np.ma.masked_inside(
+                htop, 12000., 1e36)
     return htop_file, tabl_file, tlcl_file
 
 
 def mon_from_day(wdir, model, name, filein):
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     fileaux = wdir + '/aux.nc'
     cdo.selvar(name, input=filein, output=fileaux)
     move(fileaux, filein)
@@ -311,6 +332,21 @@ def mon_from_day(wdir, model, name, filein):
     return fileout
 
 
+def reci_file(wdir, model, name, filein):
+    """Compute the reciprocal of a field and store it in double precision.
+
+    Arguments:
+    - wdir: the working directory where the outputs are stored;
+    - model: the model name;
+    - name: the name of the field;
+    - filein: the file containing the field;
+    """
+    cdo = cdo_numpy.get_cdo()
+    fileout = wdir + '/{}_{}_reci.nc'.format(model, name)
+    cdo.reci(input=filein, options='-b F64', output=fileout)
+    return fileout
+
+
 def removeif(filename):
     """Remove filename if it exists."""
     try:
@@ -330,7 +366,7 @@ def wfluxes(model, wdir, input_data):
     Author:
     Valerio Lembo, University of Hamburg (2019).
     """
-    cdo = Cdo()
+    cdo = cdo_numpy.get_cdo()
     hfls_file = e.select_metadata(input_data, short_name='hfls',
                                   dataset=model)[0]['filename']
     pr_file = e.select_metadata(input_data, short_name='pr',
@@ -351,31 +387,25 @@ def wfluxes(model, wdir, input_data):
     return evspsbl_file, prr_file
 
 
-def write_output(wdir, model, file_list, varlist):
-    """Write auxiliary variables to new NC files, write new attributes.
+def write_output(wdir, model, file_list):
+    """Create the NC files of the auxiliary variables, write new attributes.
+
+    The variables tlcl (the temperature at the LCL), tabl (the temperature at
+    the boundary layer top) and htop (the height of the boundary layer top)
+    are created with dimensions (time, lat, lon), their values are written
+    by mkthe_main.
 
     Arguments:
     - wdir: the work directory where the outputs are stored;
     - model: the name of the model;
     - file_list: the list containing the input fields;
-    - varlist: a list containing the variables to be written to NC files, i.e.
-      tlcl (the temperature at the LCL), t_z (the temperature at the boundary
-      layer top), htop (the height of the boundary layer top); their dimensions
-      are as (time, lat, lon);
 
     Author:
     Valerio Lembo, University of Hamburg (2019).
     """
-    cdo = Cdo()
     fourc = fourier_coefficients
-
-    dataset = Dataset(file_list[0])
-    ztlcl = varlist[0]
-    t_z = varlist[1]
-    htop = varlist[2]
-    tlcl_temp = wdir + '/tlcl.nc'
-    removeif(tlcl_temp)
-    with Dataset(tlcl_temp, 'w', format='NETCDF4') as w_nc_fid:
+    tlcl_file = wdir + '/{}_tlcl.nc'.format(model)
+    with Dataset(tlcl_file, 'w', format='NETCDF4') as w_nc_fid:
         w_nc_fid.description = (
             "Monthly mean LCL temperature from {} model. ".format(model),
             "Calculated by Thermodynamics model diagnostics ",
@@ -385,8 +415,9 @@ def write_output(wdir, model, file_list, varlist):
             fourc.extr_time(dataset, w_nc_fid)
             fourc.extr_lat(dataset, w_nc_fid, 'lat')
             fourc.extr_lon(dataset, w_nc_fid)
-        w_nc_var = w_nc_fid.createVariable('tlcl', 'f8',
-                                           ('time', 'lat', 'lon'))
+        w_nc_var = w_nc_fid.createVariable('tlcl',
+                                           'f8', ('time', 'lat', 'lon'),
+                                           fill_value=1.e20)
         w_nc_var.setncatts({
             'long_name':
             "LCL Temperature",
@@ -400,10 +431,8 @@ def write_output(wdir, model, file_list, varlist):
             'statistic':
             'monthly mean'
         })
-        w_nc_fid.variables['tlcl'][:] = ztlcl
-    tabl_temp = wdir + '/tabl.nc'
-    removeif(tabl_temp)
-    with Dataset(tabl_temp, 'w', format='NETCDF4') as w_nc_fid:
+    tabl_file = wdir + '/{}_tabl.nc'.format(model)
+    with Dataset(tabl_file, 'w', format='NETCDF4') as w_nc_fid:
         w_nc_fid.description = (
             "Monthly mean BL top temperature for {} model. ".format(model),
             "Calculated by Thermodynamics model diagnostics ",
@@ -413,8 +442,9 @@ def write_output(wdir, model, file_list, varlist):
             fourc.extr_time(dataset_tabl, w_nc_fid)
             fourc.extr_lat(dataset_tabl, w_nc_fid, 'lat')
             fourc.extr_lon(dataset_tabl, w_nc_fid)
-        w_nc_var = w_nc_fid.createVariable('tabl', 'f8',
-                                           ('time', 'lat', 'lon'))
+        w_nc_var = w_nc_fid.createVariable('tabl',
+                                           'f8', ('time', 'lat', 'lon'),
+                                           fill_value=1.e20)
         w_nc_var.setncatts({
             'long_name':
             "Temperature at BL top",
@@ -428,10 +458,8 @@ def write_output(wdir, model, file_list, varlist):
             'statistic':
             'monthly mean'
         })
-        w_nc_fid.variables['tabl'][:] = t_z
-    htop_temp = wdir + '/htop.nc'
-    removeif(htop_temp)
-    with Dataset(htop_temp, 'w', format='NETCDF4') as w_nc_fid:
+    htop_file = wdir + '/{}_htop.nc'.format(model)
+    with Dataset(htop_file, 'w', format='NETCDF4') as w_nc_fid:
         w_nc_fid.description = (
             "Monthly mean height of the BL top for {} model. ".format(model),
             "Calculated by Thermodynamics model diagnostics ",
@@ -441,8 +469,9 @@ def write_output(wdir, model, file_list, varlist):
             fourc.extr_time(dataset_htop, w_nc_fid)
             fourc.extr_lat(dataset_htop, w_nc_fid, 'lat')
             fourc.extr_lon(dataset_htop, w_nc_fid)
-        w_nc_var = w_nc_fid.createVariable('htop', 'f8',
-                                           ('time', 'lat', 'lon'))
+        w_nc_var = w_nc_fid.createVariable('htop',
+                                           'f8', ('time', 'lat', 'lon'),
+                                           fill_value=1.e20)
         w_nc_var.setncatts({
             'long_name':
             "Height at BL top",
@@ -456,11 +485,48 @@ def write_output(wdir, model, file_list, varlist):
             'statistic':
             'monthly mean'
         })
-        w_nc_fid.variables['htop'][:] = htop
-    tlcl_file = wdir + '/{}_tlcl.nc'.format(model)
-    cdo.setrtomiss('400,1e36', input=tlcl_temp, output=tlcl_file)
-    tabl_file = wdir + '/{}_tabl.nc'.format(model)
-    cdo.setrtomiss('400,1e36', input=tabl_temp, output=tabl_file)
-    htop_file = wdir + '/{}_htop.nc'.format(model)
-    cdo.setrtomiss('12000,1e36', input=htop_temp, output=htop_file)
     return htop_file, tabl_file, tlcl_file
+
+
+class AuxStore():
+    """Store of the intermediate files of a model.
+
+    Each product is computed once, the first time it is requested, and the
+    same files are then used by all the modules (energy and water mass
+    budgets, LEC, material entropy production) for the same model. The files
+    are removed at the end by clear, except for the monthly mean winds, which
+    are left in the working directory.
+    """
+
+    def __init__(self):
+        """Initialise an empty store."""
+        self.files = {}
+
+    def add(self, name, files):
+        """Register files that have already been computed."""
+        self.files[name] = files
+
+    def get(self, name, func, *args):
+        """Return the files of a product, computing them with func if needed.
+
+        Arguments:
+        - name: the name of the product;
+        - func: the function computing the product and returning the files;
+        - args: the arguments of func;
+        """
+        if name not in self.files:
+            self.files[name] = func(*args)
+        return self.files[name]
+
+    KEEP = ('uas_mm', 'vas_mm')
+
+    def clear(self):
+        """Remove the files of the store, except for those listed in KEEP."""
+        for name, files in self.files.items():
+            if name in self.KEEP:
+                continue
+            if isinstance(files, str):
+                files = [files]
+            for filen in files:
+                removeif(filen)
+        self.files = {}
@@ -57,16 +57,10 @@ def balances(cfg, wdir, plotpath, filena, name, model):
 
     # timesery = np.zeros([nsub, 2])
     dims, ndims, tmean, zmean, timeser = global_averages(nsub, filena, name)
-    transp_mean = np.zeros([nsub, ndims[1]])
-    lat_maxm = np.zeros([nsub, 2, len(dims[3])])
-    tr_maxm = np.zeros([nsub, 2, len(dims[3])])
-    lim = [55, 55, 25]
-    for i_f in np.arange(nsub):
-        transp = transport(zmean[i_f, :, :], timeser[i_f, :, 0], dims[1])
-        transp_mean[i_f, :], list_peak = transports_preproc(
-            dims[1], ndims[3], lim[i_f], transp)
-        lat_maxm[i_f, :, :] = list_peak[0]
-        tr_maxm[i_f, :, :] = list_peak[1]
+    lim = np.array([55, 55, 25])[:nsub, np.newaxis]
+    transp = transport(zmean, timeser[:, :, 0], dims[1])
+    transp_mean, list_peak = transports_preproc(dims[1], lim, transp)
+    lat_maxm, tr_maxm = list_peak
     if nsub == 3:
         ext_name = [
             'TOA Energy Budget', 'Atmospheric Energy Budget',
@@ -91,12 +85,13 @@ def balances(cfg, wdir, plotpath, filena, name, model):
             lat_model = 'lat_{}'.format(model)
             pr_output(transp_mean[i, :], filename, nc_f, nameout, lat_model)
             name_model = '{}_{}'.format(nameout, model)
+            aux_file = wdir + '/{}_aux.nc'.format(model)
             cdo.chname('{},{}'.format(nameout, name_model),
                        input=nc_f,
-                       output='aux.nc')
-            move('aux.nc', nc_f)
-            cdo.chname('lat,{}'.format(lat_model), input=nc_f, output='aux.nc')
-            move('aux.nc', nc_f)
+                       output=aux_file)
+            move(aux_file, nc_f)
+            cdo.chname('lat,{}'.format(lat_model), input=nc_f, output=aux_file)
+            move(aux_file, nc_f)
             attr = ['{} meridional enthalpy transports'.format(nameout), model]
             provrec = provenance_meta.get_prov_transp(attr, filename,
                                                       plotentname)
@@ -244,13 +239,10 @@ def global_averages(nsub, filena, name):
     vary = np.nanmean(var_r, axis=2)
     zmean = np.nanmean(vary, axis=3)
     tmean = np.nanmean(vary, axis=1)
-    timeser = np.zeros([nsub, yr_0, 3])
-    for i_f in np.arange(nsub):
-        zmean_w = latwgt(lats, zmean[i_f, :, :])
-        gmean = np.nansum(zmean_w, axis=1)
-        shmean = hemean(0, lats, zmean[i_f, :, :])
-        nhmean = hemean(1, lats, zmean[i_f, :, :])
-        timeser[i_f, :, :] = np.column_stack((gmean, shmean, nhmean))
+    gmean = np.nansum(latwgt(lats, zmean), axis=-1)
+    shmean = hemean(0, lats, zmean)
+    nhmean = hemean(1, lats, zmean)
+    timeser = np.stack((gmean, shmean, nhmean), axis=-1)
     return dims, ndims, tmean, zmean, timeser
 
 
@@ -260,21 +252,14 @@ def hemean(hem, lat, inp):
     Arguments:
     - hem: a parameter for the choice of the hemisphere (1 stands for SH);
     - lat: latitude (in degrees);
-    - inp: input field;
+    - inp: input field, with latitude as last dimension;
     """
-    j_end = np.shape(inp)[1]
+    j_end = np.shape(inp)[-1]
     zmn = latwgt(lat, inp)
-    hmean = []
     if hem == 1:
-        if j_end % 2 == 0:
-            hmean = 2 * np.nansum(zmn[:, int(j_end / 2):j_end], axis=1)
-        else:
-            hmean = 2 * np.nansum(zmn[:, int((j_end + 1) / 2):j_end], axis=1)
+        hmean = 2 * np.nansum(zmn[..., int((j_end + 1) / 2):j_end], axis=-1)
     else:
-        if j_end % 2 == 0:
-            hmean = 2 * np.nansum(zmn[:, 1:int(j_end / 2)], axis=1)
-        else:
-            hmean = 2 * np.nansum(zmn[:, 1:int((j_end - 1) / 2)], axis=1)
+        hmean = 2 * np.nansum(zmn[..., 1:int(j_end / 2)], axis=-1)
     return hmean
 
 
@@ -298,25 +283,42 @@ def init_plotentr(model, pdir, flist):
             model)
 
 
+def interp_cubic(lat, fld, x_i):
+    """Interpolate fields with cubic splines at different points.
+
+    Each field along the last dimension of fld is interpolated at its own
+    points, given along the last dimension of x_i. The not-a-knot cubic
+    spline is the same as in scipy.interpolate.interp1d(kind='cubic').
+
+    Arguments:
+    - lat: a latitudinal array;
+    - fld: the fields to be interpolated, with latitude as last dimension;
+    - x_i: the interpolation points, with the same leading dimensions as fld;
+    """
+    if lat[0] > lat[-1]:
+        lat = lat[::-1]
+        fld = fld[..., ::-1]
+    spline = interpolate.CubicSpline(lat, fld, axis=-1)
+    coef = np.moveaxis(spline.c, (0, 1), (-2, -1))
+    idx = np.clip(np.searchsorted(lat, x_i) - 1, 0, len(lat) - 2)
+    coef = np.take_along_axis(coef, idx[..., np.newaxis, :], axis=-1)
+    d_x = x_i - lat[idx]
+    return ((coef[..., 0, :] * d_x + coef[..., 1, :]) * d_x +
+            coef[..., 2, :]) * d_x + coef[..., 3, :]
+
+
 def latwgt(lat, t_r):
     """Compute weighted average over latitudes.
 
     Arguments:
     - lat: latitude (in degrees);
-    - tr: the field to be averaged (time,lat);
+    - tr: the field to be averaged, with latitude as last dimension;
     """
     p_i = math.pi
     conv = 2 * p_i / 360
-    dlat = np.zeros(len(lat))
-    for i in range(len(lat) - 1):
-        dlat[i] = abs(lat[i + 1] - lat[i])
-    dlat[len(lat) - 1] = dlat[len(lat) - 2]
-    latr = conv * lat
-    dlatr = conv * dlat
-    tr2 = np.zeros((np.shape(t_r)[0], np.shape(t_r)[1]))
-    for j in range(len(lat)):
-        tr2[:, j] = t_r[:, j] * np.cos(latr[j]) * dlatr[j] / 2
-    return tr2
+    dlat = np.abs(np.diff(lat))
+    dlat = np.append(dlat, dlat[-1])
+    return t_r * np.cos(conv * lat) * conv * dlat / 2
 
 
 def plot_climap_eb(model, pdir, coords, tmean, ext_name):
@@ -809,26 +811,20 @@ def removeif(filename):
 def transport(zmean, gmean, lat):
     """Integrate the energy/water mass budgets to obtain meridional transp.
 
+    The budgets are integrated from the northernmost latitude with a
+    cumulative sum, for all the leading dimensions (e.g. variables, years)
+    at once.
+
     Arguments:
-    - zmean: zonal mean input fields;
+    - zmean: zonal mean input fields, with latitude as last dimension;
     - gmean: the global mean of the input fields;
     - lat: a latitudinal array (in degrees of latitude);
     """
     p_i = math.pi
-    dlat = np.zeros(len(lat))
-    for i in range(len(lat) - 1):
-        dlat[i] = abs(lat[i + 1] - lat[i])
-    dlat[len(lat) - 1] = dlat[len(lat) - 2]
-    zmn_ub = np.zeros((np.shape(zmean)[0], np.shape(zmean)[1]))
-    for index, value in enumerate(gmean):
-        for j_l in range(np.shape(zmean)[1]):
-            zmn_ub[index, j_l] = zmean[index, j_l] - value
+    zmn_ub = zmean - np.expand_dims(gmean, -1)
     zmn_ub[np.isnan(zmn_ub)] = 0
-    cumb = np.zeros((np.shape(zmean)[0], np.shape(zmean)[1]))
-    transp = np.zeros((np.shape(zmean)[0], np.shape(zmean)[1]))
-    for j_l in range(len(lat) - 1):
-        cumb[:, j_l] = (-2 * np.nansum(
-            latwgt(lat[j_l:len(lat)], zmn_ub[:, j_l:len(lat)]), axis=1))
+    cumb = -2 * np.cumsum(latwgt(lat, zmn_ub)[..., ::-1], axis=-1)[..., ::-1]
+    cumb[..., -1] = 0.
     r_earth = 6.371 * 10**6
     transp = 2 * p_i * cumb * r_earth * r_earth
     return [zmn_ub, transp]
@@ -837,55 +833,43 @@ def transport(zmean, gmean, lat):
 def transp_max(lat, transp, lim):
     """Obtain transport peak magnitude and location from interpolation.
 
+    The first two zero crossings of the meridional derivative within
+    (-lim,lim) are retained as peaks. Missing peaks are set to zero.
+
     Arguments:
     - lat: a latitudinal array;
-    - transp: the meridional transport a 1D array (lat);
+    - transp: the meridional transport, with latitude as last dimension;
     - lim: limits to constrain the peak search in
-    (necessary for ocean transp.)
+    (necessary for ocean transp.), broadcastable to the leading dimensions
+    of transp;
     """
-    deriv = np.gradient(transp)
+    deriv = np.gradient(transp, axis=-1)
     x_c = zerocross1d(lat, deriv)
-    y_i = np.zeros(2)
-    xc_cut = np.zeros(2)
-    j_p = 0
-    for value in x_c:
-        if abs(value) <= lim:
-            xc_cut[j_p] = value
-            y_i[j_p] = interpolate.interp1d(lat, transp, kind='cubic')(value)
-            j_p = j_p + 1
-            if j_p == 2:
-                break
+    with np.errstate(invalid='ignore'):
+        x_c[np.abs(x_c) > np.expand_dims(lim, -1)] = np.nan
+    xc_cut = np.sort(x_c, axis=-1)[..., :2]
+    y_i = interp_cubic(lat, transp, xc_cut)
+    y_i[np.isnan(xc_cut)] = 0.
+    xc_cut[np.isnan(xc_cut)] = 0.
     return [xc_cut, y_i]
 
 
-def transports_preproc(lats, yrs, lim, transp):
+def transports_preproc(lats, lim, transp):
     """Compute the peaks magnitude and locations of a meridional transport.
 
-    This function computes the peaks magnitudes and locations recursively at
-    each time through the function transp_max and stores them in a list.
+    This function computes the peaks magnitudes and locations at each time
+    through the function transp_max and stores them in a list.
 
     Arguments:
     - lats: a latitudinal array;
-    - yrs: the number of years through which iterating;
     - lim: the range (-lim,lim) in which the function transp_max has to search
     for the peaks;
-    - transp: the array containing the transport;
+    - transp: the array containing the transport, as (...,time,lat);
     """
     transpp = transp[1]
-    transp_mean = np.nanmean(transpp, axis=0)
-    yr_ext = []
-    lat_maxm = np.zeros([2, yrs])
-    tr_maxm = np.zeros([2, yrs])
-    lat_max = list()
-    tr_max = list()
-    for t_t in np.arange(int(yrs)):
-        yr_ext = transp_max(lats, transpp[t_t, :], lim)
-        lat_max.append(yr_ext[0])
-        tr_max.append(yr_ext[1])
-    for t_t in np.arange(int(yrs)):
-        lat_maxm[:, t_t] = lat_max[t_t]
-        tr_maxm[:, t_t] = tr_max[t_t]
-    list_peak = [lat_maxm, tr_maxm]
+    transp_mean = np.nanmean(transpp, axis=-2)
+    lat_max, tr_max = transp_max(lats, transpp, lim)
+    list_peak = [np.swapaxes(lat_max, -1, -2), np.swapaxes(tr_max, -1, -2)]
     return transp_mean, list_peak
 
 
@@ -939,6 +923,10 @@ def zerocross1d(x_x, y_y):
     Note that the first and last data point will not be considered whether
     or not they are zero.
 
+    The zero crossings are searched along the last dimension of y_y and
+    returned in ascending order, padded with NaN to the same length for all
+    the leading dimensions.
+
     Arguments:
     x_x, y_y : arrays. Ordinate and abscissa data values.
 
@@ -949,15 +937,15 @@ def zerocross1d(x_x, y_y):
     License:
     Copyright (c) 2011, PyA group.
     """
-    indi = np.where(y_y[1:] * y_y[0:-1] < 0.0)[0]
-    d_x = x_x[indi + 1] - x_x[indi]
-    d_y = y_y[indi + 1] - y_y[indi]
-    z_c = -y_y[indi] * (d_x / d_y) + x_x[indi]
-    z_i = np.where(y_y == 0.0)[0]
-    z_i = z_i[np.where((z_i > 0) & (z_i < x_x.size - 1))]
-    z_i = z_i[np.where(y_y[z_i - 1] * y_y[z_i + 1] < 0.0)]
-    zzindi = np.concatenate((indi, z_i))
-    z_z = np.concatenate((z_c, x_x[z_i]))
-    sind = np.argsort(z_z)
-    z_z, zzindi = z_z[sind], zzindi[sind]
+    y_0 = y_y[..., :-1]
+    y_1 = y_y[..., 1:]
+    d_x = x_x[1:] - x_x[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_c = np.where(y_1 * y_0 < 0.0, -y_0 * (d_x / (y_1 - y_0)) + x_x[:-1],
+                       np.nan)
+    z_i = np.full(np.shape(y_y), np.nan)
+    z_i[..., 1:-1] = np.where((y_y[..., 1:-1] == 0.0) &
+                              (y_y[..., :-2] * y_y[..., 2:] < 0.0),
+                              x_x[1:-1], np.nan)
+    z_z = np.sort(np.concatenate((z_c, z_i), axis=-1), axis=-1)
     return z_z
@@ -242,12 +242,14 @@ for immediate model intercomparison.
 import logging
 import os
 import warnings
+from multiprocessing import get_context
 
 import numpy as np
 
 import esmvaltool.diag_scripts.shared as e
 from esmvaltool.diag_scripts.shared import ProvenanceLogger
-from esmvaltool.diag_scripts.thermodyn_diagtool import (computations,
+from esmvaltool.diag_scripts.thermodyn_diagtool import (cdo_numpy,
+                                                        computations,
                                                         lorenz_cycle, mkthe,
                                                         plot_script,
                                                         provenance_meta)
@@ -257,9 +259,9 @@ logger = logging.getLogger(os.path.basename(__file__))
 
 
 def compute_water_mass_budget(cfg, wdir_up, pdir, model, wdir, input_data,
-                              flags, aux_file):
+                              flags, aux_file, store):
     logger.info('Computing water mass and latent energy budgets\n')
-    aux_list = mkthe.init_mkthe_wat(model, wdir, input_data, flags)
+    aux_list = mkthe.init_mkthe_wat(model, wdir, input_data, flags, store)
     wm_gmean, wm_file = computations.wmbudg(model, wdir, aux_file, input_data,
                                             aux_list)
     wm_time_mean = np.nanmean(wm_gmean[0])
@@ -273,8 +275,6 @@ def compute_water_mass_budget(cfg, wdir_up, pdir, model, wdir, input_data,
     plot_script.balances(cfg, wdir_up, pdir, [wm_file[0], wm_file[1]],
                          ['wmb', 'latent'], model)
     logger.info('Done\n')
-    for filen in aux_list:
-        os.remove(filen)
     return (wm_file, wm_time_mean, wm_time_std, latent_time_mean,
             latent_time_std)
 
@@ -287,6 +287,164 @@ def compute_land_ocean(model, wdir, file, sftlf_fx, name):
     return (ocean_mean, land_mean)
 
 
+def compute_model(cfg, model, input_data, flags, nproc=1):
+    """Run the diagnostic tool for a single model.
+
+    The multi-model metrics are returned in a dictionary (mean and standard
+    deviation for each quantity), together with the files that need to be
+    recorded in the provenance. The provenance is written by the main process
+    after all models are done, so that different processes do not write to
+    the provenance file at the same time.
+
+    Arguments:
+    - cfg: the ESMValTool configuration;
+    - model: the model name;
+    - input_data: the list of the metadata of the input files;
+    - flags: the user-defined options (wat, lec, entr, met);
+    - nproc: the number of processes computing the LEC of different years;
+    """
+    lorenz = lorenz_cycle
+    comp = computations
+    plotsmod = plot_script
+    cdo_numpy.set_backend(cfg.get('backend', 'cdo'))
+    wat, lec, entr, met = flags
+    lsm = str(cfg['lsm'])
+    wdir_up = cfg['work_dir']
+    # Load paths to individual models output and plotting directories
+    wdir = os.path.join(wdir_up, model)
+    pdir = os.path.join(cfg['plot_dir'], model)
+    os.makedirs(wdir)
+    os.makedirs(pdir)
+    aux_file = wdir + '/aux.nc'
+    res = {'prov': [], 'indentr': None, 'direntr': None}
+    store = mkthe.AuxStore()
+    te_ymm_file, te_gmean_constant, te_file = mkthe.init_mkthe_te(
+        model, wdir, input_data)
+    res['te'] = te_gmean_constant
+    logger.info('Computing energy budgets\n')
+    in_list, eb_gmean, eb_file, toab_ymm_file = comp.budgets(
+        model, wdir, aux_file, input_data)
+    prov_rec = provenance_meta.get_prov_map(
+        ['TOA energy budgets', model],
+        [in_list[4], in_list[6], in_list[7]])
+    res['prov'].append((eb_file[0], prov_rec))
+    prov_rec = provenance_meta.get_prov_map(
+        ['atmospheric energy budgets', model], [
+            in_list[0], in_list[1], in_list[2], in_list[3], in_list[4],
+            in_list[5], in_list[6], in_list[7], in_list[8]
+        ])
+    res['prov'].append((eb_file[1], prov_rec))
+    prov_rec = provenance_meta.get_prov_map(
+        ['surface energy budgets', model], [
+            in_list[0], in_list[1], in_list[2], in_list[3], in_list[5],
+            in_list[7]
+        ])
+    res['prov'].append((eb_file[2], prov_rec))
+    res['toab'] = [np.nanmean(eb_gmean[0]), np.nanstd(eb_gmean[0])]
+    res['atmb'] = [np.nanmean(eb_gmean[1]), np.nanstd(eb_gmean[1])]
+    res['surb'] = [np.nanmean(eb_gmean[2]), np.nanstd(eb_gmean[2])]
+    logger.info('Global mean emission temperature: %s\n', te_gmean_constant)
+    logger.info('TOA energy budget: %s\n', res['toab'][0])
+    logger.info('Atmospheric energy budget: %s\n', res['atmb'][0])
+    logger.info('Surface energy budget: %s\n', res['surb'][0])
+    logger.info('Done\n')
+    res['baroc_eff'] = comp.baroceff(model, wdir, aux_file, toab_ymm_file,
+                                     te_ymm_file)
+    logger.info('Baroclinic efficiency (Lucarini et al., 2011): %s\n',
+                res['baroc_eff'])
+    logger.info('Running the plotting module for the budgets\n')
+    plotsmod.balances(cfg, wdir_up, pdir, [eb_file[0], eb_file[1], eb_file[2]],
+                      ['toab', 'atmb', 'surb'], model)
+    logger.info('Done\n')
+    # Water mass budget
+    if wat == 'True':
+        (wm_file, wm_time_mean, wm_time_std, latent_time_mean,
+         latent_time_std) = compute_water_mass_budget(
+             cfg, wdir_up, pdir, model, wdir, input_data, flags, aux_file,
+             store)
+        res['wmb'] = [wm_time_mean, wm_time_std]
+        res['latent'] = [latent_time_mean, latent_time_std]
+    if lsm == 'True':
+        sftlf_fx = e.select_metadata(input_data,
+                                     short_name='sftlf',
+                                     dataset=model)[0]['filename']
+        logger.info('Computing energy budgets over land and oceans\n')
+        res['toab_oc'], res['toab_la'] = compute_land_ocean(
+            model, wdir, eb_file[0], sftlf_fx, 'toab')
+        res['atmb_oc'], res['atmb_la'] = compute_land_ocean(
+            model, wdir, eb_file[1], sftlf_fx, 'atmb')
+        res['surb_oc'], res['surb_la'] = compute_land_ocean(
+            model, wdir, eb_file[2], sftlf_fx, 'surb')
+        if wat == 'True':
+            logger.info('Computing water mass and latent energy'
+                        ' budgets over land and oceans\n')
+            res['wmb_oc'], res['wmb_la'] = compute_land_ocean(
+                model, wdir, wm_file[0], sftlf_fx, 'wmb')
+            res['latent_oc'], res['latent_la'] = compute_land_ocean(
+                model, wdir, wm_file[1], sftlf_fx, 'latent')
+        logger.info('Done\n')
+    if lec == 'True':
+        logger.info('Computation of the Lorenz Energy '
+                    'Cycle (year by year)\n')
+        _, _ = mkthe.init_mkthe_lec(model, wdir, input_data, store)
+        lect = lorenz.preproc_lec(model, wdir, pdir, input_data, nproc)
+        res['lec'] = [np.nanmean(lect), np.nanstd(lect)]
+        logger.info(
+            'Intensity of the annual mean Lorenz Energy '
+            'Cycle: %s\n', res['lec'][0])
+        logger.info('Done\n')
+    else:
+        lect = np.repeat(2.0, len(eb_gmean[0]))
+        res['lec'] = [2.0, 0.2]
+    if entr == 'True':
+        if met in {'1', '3'}:
+            logger.info('Computation of the material entropy production '
+                        'with the indirect method\n')
+            indentr_list = [te_file, eb_file[0]]
+            horz_mn, vert_mn, horzentr_file, vertentr_file = comp.indentr(
+                model, wdir, indentr_list, input_data, aux_file, eb_gmean[0],
+                store)
+            res['indentr'] = [horzentr_file, vertentr_file]
+            res['horzentr'] = [np.nanmean(horz_mn), np.nanstd(horz_mn)]
+            res['vertentr'] = [np.nanmean(vert_mn), np.nanstd(vert_mn)]
+            logger.info(
+                'Horizontal component of the material entropy '
+                'production: %s\n', res['horzentr'][0])
+            logger.info(
+                'Vertical component of the material entropy '
+                'production: %s\n', res['vertentr'][0])
+            logger.info('Done\n')
+            logger.info('Running the plotting module for the material '
+                        'entropy production (indirect method)\n')
+            plotsmod.entropy(pdir, vertentr_file, 'sver',
+                             'Vertical entropy production', model)
+            logger.info('Done\n')
+        if met in {'2', '3'}:
+            matentr, irrevers, entr_list = comp.direntr(
+                logger, model, wdir, input_data, aux_file, te_file, lect,
+                flags, store)
+            res['direntr'] = entr_list
+            res['matentr'] = [matentr, 0.]
+            if met in {'3'}:
+                diffentr = (float(np.nanmean(vert_mn)) +
+                            float(np.nanmean(horz_mn)) - matentr)
+                logger.info('Difference between the two '
+                            'methods: %s\n', diffentr)
+                res['diffentr'] = [diffentr, 0.]
+            logger.info('Degree of irreversibility of the '
+                        'system: %s\n', irrevers)
+            res['irrevers'] = irrevers
+            logger.info('Running the plotting module for the material '
+                        'entropy production (direct method)\n')
+            plotsmod.init_plotentr(model, pdir, entr_list)
+            logger.info('Done\n')
+        os.remove(te_file)
+    store.clear()
+    os.remove(te_ymm_file)
+    logger.info('Done for model: %s \n', model)
+    return res
+
+
 def main(cfg):
     """Execute the program.
 
@@ -294,13 +452,11 @@ def main(cfg):
     filenames and user-defined options, is passed by ESMValTool preprocessor.
     """
     provlog = ProvenanceLogger(cfg)
-    lorenz = lorenz_cycle
-    comp = computations
     logger.info('Entering the diagnostic tool')
     # Load paths
     wdir_up = cfg['work_dir']
     pdir_up = cfg['plot_dir']
-    input_data = cfg['input_data'].values()
+    input_data = list(cfg['input_data'].values())
     logger.info('Work directory: %s \n', wdir_up)
     logger.info('Plot directory: %s \n', pdir_up)
     plotsmod = plot_script
@@ -314,12 +470,13 @@ def main(cfg):
     curr_vars = list(set(varnames))
     logger.debug(curr_vars)
     # load user-defined options
-    lsm = str(cfg['lsm'])
     wat = str(cfg['wat'])
     lec = str(cfg['lec'])
     entr = str(cfg['entr'])
     met = str(cfg['met'])
     flags = [wat, lec, entr, met]
+    cdo_numpy.set_backend(cfg.get('backend', 'cdo'))
+    n_workers = max(int(cfg.get('n_workers', 1)), 1)
     # Initialize multi-model arrays
     modnum = len(model_names)
     te_all = np.zeros(modnum)
@@ -345,149 +502,54 @@ def main(cfg):
     matentr_all = np.zeros([modnum, 2])
     irrevers_all = np.zeros(modnum)
     diffentr_all = np.zeros([modnum, 2])
+    all_arrays = {
+        'te': te_all,
+        'toab': toab_all,
+        'toab_oc': toab_oc_all,
+        'toab_la': toab_la_all,
+        'atmb': atmb_all,
+        'atmb_oc': atmb_oc_all,
+        'atmb_la': atmb_la_all,
+        'surb': surb_all,
+        'surb_oc': surb_oc_all,
+        'surb_la': surb_la_all,
+        'wmb': wmb_all,
+        'wmb_oc': wmb_oc_all,
+        'wmb_la': wmb_la_all,
+        'latent': latent_all,
+        'latent_oc': latent_oc_all,
+        'latent_la': latent_la_all,
+        'baroc_eff': baroc_eff_all,
+        'lec': lec_all,
+        'horzentr': horzentr_all,
+        'vertentr': vertentr_all,
+        'matentr': matentr_all,
+        'irrevers': irrevers_all,
+        'diffentr': diffentr_all,
+    }
     logger.info("Entering main loop\n")
-    i_m = 0
-    for model in model_names:
-        # Load paths to individual models output and plotting directories
-        wdir = os.path.join(wdir_up, model)
-        pdir = os.path.join(pdir_up, model)
-        os.makedirs(wdir)
-        os.makedirs(pdir)
-        aux_file = wdir + '/aux.nc'
-        te_ymm_file, te_gmean_constant, te_file = mkthe.init_mkthe_te(
-            model, wdir, input_data)
-        te_all[i_m] = te_gmean_constant
-        logger.info('Computing energy budgets\n')
-        in_list, eb_gmean, eb_file, toab_ymm_file = comp.budgets(
-            model, wdir, aux_file, input_data)
-        prov_rec = provenance_meta.get_prov_map(
-            ['TOA energy budgets', model],
-            [in_list[4], in_list[6], in_list[7]])
-        provlog.log(eb_file[0], prov_rec)
-        prov_rec = provenance_meta.get_prov_map(
-            ['atmospheric energy budgets', model], [
-                in_list[0], in_list[1], in_list[2], in_list[3], in_list[4],
-                in_list[5], in_list[6], in_list[7], in_list[8]
-            ])
-        provlog.log(eb_file[1], prov_rec)
-        prov_rec = provenance_meta.get_prov_map(
-            ['surface energy budgets', model], [
-                in_list[0], in_list[1], in_list[2], in_list[3], in_list[5],
-                in_list[7]
-            ])
-        provlog.log(eb_file[2], prov_rec)
-        toab_all[i_m, 0] = np.nanmean(eb_gmean[0])
-        toab_all[i_m, 1] = np.nanstd(eb_gmean[0])
-        atmb_all[i_m, 0] = np.nanmean(eb_gmean[1])
-        atmb_all[i_m, 1] = np.nanstd(eb_gmean[1])
-        surb_all[i_m, 0] = np.nanmean(eb_gmean[2])
-        surb_all[i_m, 1] = np.nanstd(eb_gmean[2])
-        logger.info('Global mean emission temperature: %s\n',
-                    te_gmean_constant)
-        logger.info('TOA energy budget: %s\n', toab_all[i_m, 0])
-        logger.info('Atmospheric energy budget: %s\n', atmb_all[i_m, 0])
-        logger.info('Surface energy budget: %s\n', surb_all[i_m, 0])
-        logger.info('Done\n')
-        baroc_eff_all[i_m] = comp.baroceff(model, wdir, aux_file,
-                                           toab_ymm_file, te_ymm_file)
-        logger.info('Baroclinic efficiency (Lucarini et al., 2011): %s\n',
-                    baroc_eff_all[i_m])
-        logger.info('Running the plotting module for the budgets\n')
-        plotsmod.balances(cfg, wdir_up, pdir,
-                          [eb_file[0], eb_file[1], eb_file[2]],
-                          ['toab', 'atmb', 'surb'], model)
-        logger.info('Done\n')
-        # Water mass budget
-        if wat == 'True':
-            (wm_file,
-             wmb_all[i_m, 0],
-             wmb_all[i_m, 1],
-             latent_all[i_m, 0],
-             latent_all[i_m, 1]) = compute_water_mass_budget(
-                 cfg, wdir_up, pdir, model, wdir, input_data, flags, aux_file)
-        if lsm == 'True':
-            sftlf_fx = e.select_metadata(input_data,
-                                         short_name='sftlf',
-                                         dataset=model)[0]['filename']
-            logger.info('Computing energy budgets over land and oceans\n')
-            toab_oc_all[i_m], toab_la_all[i_m] = compute_land_ocean(
-                model, wdir, eb_file[0], sftlf_fx, 'toab')
-            atmb_oc_all[i_m], atmb_la_all[i_m] = compute_land_ocean(
-                model, wdir, eb_file[1], sftlf_fx, 'atmb')
-            surb_oc_all[i_m], surb_la_all[i_m] = compute_land_ocean(
-                model, wdir, eb_file[2], sftlf_fx, 'surb')
-            if wat == 'True':
-                logger.info('Computing water mass and latent energy'
-                            ' budgets over land and oceans\n')
-                wmb_oc_all[i_m], wmb_la_all[i_m] = compute_land_ocean(
-                    model, wdir, wm_file[0], sftlf_fx, 'wmb')
-                latent_oc_all[i_m], latent_la_all[i_m] = compute_land_ocean(
-                    model, wdir, wm_file[1], sftlf_fx, 'latent')
-            logger.info('Done\n')
-        if lec == 'True':
-            logger.info('Computation of the Lorenz Energy '
-                        'Cycle (year by year)\n')
-            _, _ = mkthe.init_mkthe_lec(model, wdir, input_data)
-            lect = lorenz.preproc_lec(model, wdir, pdir, input_data)
-            lec_all[i_m, 0] = np.nanmean(lect)
-            lec_all[i_m, 1] = np.nanstd(lect)
-            logger.info(
-                'Intensity of the annual mean Lorenz Energy '
-                'Cycle: %s\n', lec_all[i_m, 0])
-            logger.info('Done\n')
-        else:
-            lect = np.repeat(2.0, len(eb_gmean[0]))
-            lec_all[i_m, 0] = 2.0
-            lec_all[i_m, 1] = 0.2
-        if entr == 'True':
-            if met in {'1', '3'}:
-                logger.info('Computation of the material entropy production '
-                            'with the indirect method\n')
-                indentr_list = [te_file, eb_file[0]]
-                horz_mn, vert_mn, horzentr_file, vertentr_file = comp.indentr(
-                    model, wdir, indentr_list, input_data, aux_file,
-                    eb_gmean[0])
-                listind = [horzentr_file, vertentr_file]
-                provenance_meta.meta_indentr(cfg, model, input_data, listind)
-                horzentr_all[i_m, 0] = np.nanmean(horz_mn)
-                horzentr_all[i_m, 1] = np.nanstd(horz_mn)
-                vertentr_all[i_m, 0] = np.nanmean(vert_mn)
-                vertentr_all[i_m, 1] = np.nanstd(vert_mn)
-                logger.info(
-                    'Horizontal component of the material entropy '
-                    'production: %s\n', horzentr_all[i_m, 0])
-                logger.info(
-                    'Vertical component of the material entropy '
-                    'production: %s\n', vertentr_all[i_m, 0])
-                logger.info('Done\n')
-                logger.info('Running the plotting module for the material '
-                            'entropy production (indirect method)\n')
-                plotsmod.entropy(pdir, vertentr_file, 'sver',
-                                 'Vertical entropy production', model)
-                logger.info('Done\n')
-            if met in {'2', '3'}:
-                matentr, irrevers, entr_list = comp.direntr(
-                    logger, model, wdir, input_data, aux_file, te_file, lect,
-                    flags)
-                provenance_meta.meta_direntr(cfg, model, input_data, entr_list)
-                matentr_all[i_m, 0] = matentr
-                if met in {'3'}:
-                    diffentr = (float(np.nanmean(vert_mn)) +
-                                float(np.nanmean(horz_mn)) - matentr)
-                    logger.info('Difference between the two '
-                                'methods: %s\n', diffentr)
-                    diffentr_all[i_m, 0] = diffentr
-                logger.info('Degree of irreversibility of the '
-                            'system: %s\n', irrevers)
-                irrevers_all[i_m] = irrevers
-                logger.info('Running the plotting module for the material '
-                            'entropy production (direct method)\n')
-                plotsmod.init_plotentr(model, pdir, entr_list)
-                logger.info('Done\n')
-            os.remove(te_file)
-        os.remove(te_ymm_file)
-        logger.info('Done for model: %s \n', model)
-        i_m = i_m + 1
+    if n_workers > 1 and modnum > 1:
+        # Models are run in parallel, the years of the LEC sequentially
+        args = [(cfg, model, input_data, flags) for model in model_names]
+        with get_context('spawn').Pool(min(n_workers, modnum)) as pool:
+            results = pool.starmap(compute_model, args)
+    else:
+        results = [
+            compute_model(cfg, model, input_data, flags, n_workers)
+            for model in model_names
+        ]
+    for i_m, (model, res) in enumerate(zip(model_names, results)):
+        for key, array in all_arrays.items():
+            if key in res:
+                array[i_m] = res[key]
+        for filen, prov_rec in res['prov']:
+            provlog.log(filen, prov_rec)
+        if res['indentr'] is not None:
+            provenance_meta.meta_indentr(cfg, model, input_data,
+                                         res['indentr'])
+        if res['direntr'] is not None:
+            provenance_meta.meta_direntr(cfg, model, input_data,
+                                         res['direntr'])
     logger.info('I will now start multi-model plots')
     logger.info('Meridional heat transports\n')
     plotsmod.plot_mm_transp(model_names, wdir_up, pdir_up)
@@ -0,0 +1,49 @@
+"""Tests for the resampled constraints of emergent constraints."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from esmvaltool.diag_scripts import emergent_constraints as ec
+
+
+def _get_input_data(n_models):
+    """Get training and prediction input data for a small ensemble."""
+    x_data = np.array([1.0, 2.3, 3.1, 4.4, 5.0])[:n_models]
+    y_data = np.array([2.0, 3.1, 5.5, 6.0, 8.1])[:n_models]
+    columns = pd.MultiIndex.from_tuples([('x', 'X'), ('y', 'Y')])
+    training_data = pd.DataFrame(np.stack([x_data, y_data], axis=-1),
+                                 columns=columns)
+    pred_input_data = pd.DataFrame(
+        [[2.0, 0.3]], columns=pd.MultiIndex.from_tuples([('mean', 'X'),
+                                                         ('error', 'X')]))
+    return (training_data, pred_input_data)
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'leave_one_out'])
+def test_constraint_distribution_small_ensemble(method):
+    """Test that degenerate resamples give missing values."""
+    (training_data, pred_input_data) = _get_input_data(3)
+    distribution = ec.get_constraint_distribution(
+        training_data, pred_input_data, 0.66, method=method, n_resamples=50,
+        random_state=1)
+    assert not np.isinf(distribution.values).any()
+
+    # Resamples with less than 3 distinct models are fitted perfectly
+    indices = ec.get_resampling_indices(3, method=method, n_resamples=50,
+                                        random_state=1)
+    n_distinct = np.array([len(set(idx)) for idx in indices])
+    degenerate = distribution.isna().all(axis=1).values
+    np.testing.assert_array_equal(degenerate, n_distinct < 3)
+    valid = distribution[~degenerate]
+    assert (valid['lower'] < valid['best_estimate']).all()
+    assert (valid['best_estimate'] < valid['upper']).all()
+
+
+def test_constraint_distribution():
+    """Test that leave-one-out constraints are valid for larger ensembles."""
+    (training_data, pred_input_data) = _get_input_data(5)
+    distribution = ec.get_constraint_distribution(
+        training_data, pred_input_data, 0.66, method='leave_one_out')
+    assert distribution.shape == (5, 3)
+    assert np.isfinite(distribution.values).all()
+    assert (distribution['lower'] < distribution['upper']).all()
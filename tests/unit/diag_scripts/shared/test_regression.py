@@ -0,0 +1,89 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.shared.regression`."""
+import numpy as np
+import pytest
+from scipy import stats
+
+from esmvaltool.diag_scripts.shared import regression
+
+X_1D = np.array([1.0, 2.0, 4.0, 5.0, 7.0])
+Y_1D = np.array([2.0, 3.5, 3.0, 6.0, 9.0])
+Y_3D = np.stack([
+    np.stack([Y_1D, -Y_1D, Y_1D**2]),
+    np.stack([X_1D, np.sin(Y_1D), Y_1D + X_1D]),
+])
+FIELDS = ('slope', 'intercept', 'rvalue', 'pvalue', 'stderr')
+
+
+def _reference(x_data, y_data):
+    """Reference regressions calculated with :func:`scipy.stats.linregress`."""
+    out = {field: np.zeros(y_data.shape[:-1]) for field in FIELDS}
+    for idx in np.ndindex(y_data.shape[:-1]):
+        reg = stats.linregress(x_data, y_data[idx])
+        for field in FIELDS:
+            out[field][idx] = getattr(reg, field)
+    return out
+
+
+@pytest.mark.parametrize('axis', [-1, 0, 1, 2])
+def test_linregress(axis):
+    """Test vectorized linear regression for various axes."""
+    ref = _reference(X_1D, Y_3D)
+    y_data = np.moveaxis(Y_3D, -1, axis)
+    reg = regression.linregress(X_1D, y_data, axis=axis)
+    assert isinstance(reg, regression.LinregressResult)
+    for field in FIELDS:
+        np.testing.assert_allclose(getattr(reg, field), ref[field])
+
+
+def test_linregress_broadcast():
+    """Test vectorized linear regression with 2D X data."""
+    x_data = np.broadcast_to(X_1D, Y_3D.shape[1:])
+    ref = _reference(X_1D, Y_3D)
+    reg = regression.linregress(x_data, Y_3D)
+    for field in FIELDS:
+        np.testing.assert_allclose(getattr(reg, field), ref[field])
+
+
+def test_linregress_missing_values():
+    """Test vectorized linear regression with masked and NaN values."""
+    y_data = np.ma.masked_invalid([
+        [np.nan, 3.5, 3.0, 6.0, 9.0],
+        [2.0, 3.5, 3.0, 6.0, 9.0],
+        [np.nan, np.nan, np.nan, np.nan, 9.0],
+        [1.0, 1.0, 1.0, 1.0, 1.0],
+        [np.nan, np.nan, np.nan, 6.0, 9.0],
+    ])
+    y_data[1, 4] = np.ma.masked
+    reg = regression.linregress(X_1D, y_data)
+    for (idx, valid) in enumerate((slice(1, 5), slice(0, 4))):
+        ref = stats.linregress(X_1D[valid], y_data.data[idx, valid])
+        for field in FIELDS:
+            np.testing.assert_allclose(getattr(reg, field)[idx],
+                                       getattr(ref, field))
+    for field in FIELDS:
+        assert np.isnan(getattr(reg, field)[2])
+    np.testing.assert_allclose(reg.slope[3], 0.0)
+    np.testing.assert_allclose(reg.intercept[3], 1.0)
+    np.testing.assert_allclose(reg.rvalue[3], 0.0)
+    np.testing.assert_allclose(reg.slope[4], 1.5)
+    np.testing.assert_allclose(reg.intercept[4], -1.5)
+    assert np.isnan(reg.pvalue[4])
+    assert np.isnan(reg.stderr[4])
+
+
+def test_linregress_constant_x():
+    """Test vectorized linear regression with constant X data."""
+    reg = regression.linregress(np.ones(5), Y_1D)
+    for field in FIELDS:
+        assert np.isnan(getattr(reg, field))
+
+
+@pytest.mark.parametrize('x_data,y_data', [
+    (X_1D, 1.0),
+    (X_1D[:3], Y_3D),
+    (np.ones((3, 3)), Y_3D),
+])
+def test_linregress_fail(x_data, y_data):
+    """Test vectorized linear regression with invalid input."""
+    with pytest.raises(ValueError):
+        regression.linregress(x_data, y_data)